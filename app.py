@@ -1,16 +1,68 @@
+import time
+_INICIO_PROCESSO = time.perf_counter()  # base do relatório de inicialização
 import os
+import re
+import queue
+import secrets
+import sys
+import bisect
+import cProfile
+import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import pstats
+import random
+import uuid
 import datetime
-import time
-from io import BytesIO
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO, StringIO
+import jinja2
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify, Response, stream_with_context
+from flask import g, has_request_context, make_response
+from flask.templating import Environment as FlaskEnvironment
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, event, exc, inspect, text
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.sql import text
-import pandas as pd
+
+# Tempo de cada etapa da inicialização, em ms (pandas, openpyxl e reportlab só
+# são importados nas rotas que os usam, para o worker subir mais rápido)
+TEMPOS_INICIALIZACAO = {}
+_ultima_marca = [_INICIO_PROCESSO]
+
+def _marcar_inicializacao(etapa):
+    agora = time.perf_counter()
+    TEMPOS_INICIALIZACAO[etapa] = round((agora - _ultima_marca[0]) * 1000, 1)
+    _ultima_marca[0] = agora
+
+_marcar_inicializacao("imports")
 
 # ------------------ Configuração Flask ------------------
 app = Flask(__name__)
-app.secret_key = 'chave-secreta-assembleia-deus-fidelidade-2024'
+app.secret_key = os.getenv("SECRET_KEY")
+if not app.secret_key:
+    app.secret_key = secrets.token_hex(32)
+    print("⚠️ SECRET_KEY não definida: usando uma chave temporária (mensagens se perdem ao reiniciar)")
+app.config.update(
+    SESSION_COOKIE_HTTPONLY=True,
+    SESSION_COOKIE_SAMESITE="Lax",
+    SESSION_COOKIE_SECURE=os.getenv("SESSION_COOKIE_SECURE", "0") == "1",
+)
+# Atrás do proxy do Render, o IP do cliente vem em X-Forwarded-For (usado no limite de login)
+PROXY_SALTOS = int(os.getenv("PROXY_SALTOS", "0"))
+if PROXY_SALTOS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_SALTOS, x_proto=PROXY_SALTOS)
 
 # ------------------ Configuração do Banco ------------------
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
@@ -19,122 +71,2531 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+psycopg2://")
 
+# Pool de conexões. DB_MAX_CONEXOES é o orçamento total do app no banco (os
+# planos pequenos do Render aceitam poucas conexões); ele é dividido entre os
+# workers do gunicorn (WEB_CONCURRENCY) e, em cada worker, metade fica fixa
+# no pool e o resto como overflow. DB_POOL_SIZE/DB_MAX_OVERFLOW sobrepõem a conta.
+DB_MAX_CONEXOES = int(os.getenv("DB_MAX_CONEXOES", "20"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+_conexoes_por_worker = max(2, DB_MAX_CONEXOES // WEB_CONCURRENCY)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(max(1, _conexoes_por_worker // 2))))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(max(0, _conexoes_por_worker - DB_POOL_SIZE))))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))          # segundos esperando conexão livre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))           # segundos; o Render derruba conexões ociosas
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))  # só PostgreSQL
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+class MetricasPool:
+    """Contadores do pool de conexões, expostos em /admin/pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.conexoes_criadas = 0
+        self.invalidacoes = 0
+        self.esgotamentos = 0  # checkouts que estouraram DB_POOL_TIMEOUT
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def registrar_espera(self, segundos, esgotou=False):
+        with self._lock:
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+            if esgotou:
+                self.esgotamentos += 1
+
+    def contar(self, campo):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "conexoes_criadas": self.conexoes_criadas,
+                "invalidacoes": self.invalidacoes,
+                "esgotamentos": self.esgotamentos,
+                "espera_total_ms": round(self.espera_total * 1000, 2),
+                "espera_media_ms": round(self.espera_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 2),
+            }
+
+metricas_pool = MetricasPool()
+
+class PoolMedido(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout esperou por uma conexão."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except exc.TimeoutError:
+            metricas_pool.registrar_espera(time.perf_counter() - inicio, esgotou=True)
+            raise
+        metricas_pool.registrar_espera(time.perf_counter() - inicio)
+        return conexao
+
 # Configuração engine dependendo do banco
+opcoes_pool = dict(
+    poolclass=PoolMedido,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    pool_use_lifo=True,  # conexões sobrando ficam ociosas e são recicladas
+)
 if "sqlite" in DATABASE_URL:
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **opcoes_pool
+    )
     print("✅ Usando SQLite para desenvolvimento local")
 else:
-    engine = create_engine(DATABASE_URL)
-    print("✅ Usando PostgreSQL")
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+        **opcoes_pool
+    )
+    print(f"✅ Usando PostgreSQL (pool {DB_POOL_SIZE}+{DB_MAX_OVERFLOW} por worker)")
+
+_marcar_inicializacao("config")
+
+IS_SQLITE = engine.dialect.name == "sqlite"
+# Chave primária autoincremental compatível com os dois bancos
+PK_AUTO = "INTEGER PRIMARY KEY AUTOINCREMENT" if IS_SQLITE else "SERIAL PRIMARY KEY"
+
+@event.listens_for(engine, "connect")
+def _ao_conectar(dbapi_conn, registro):
+    metricas_pool.contar("conexoes_criadas")
+    if IS_SQLITE:
+        # WAL: leitores não bloqueiam o escritor; busy_timeout espera o lock em vez de falhar
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+@event.listens_for(engine, "checkout")
+def _ao_retirar(dbapi_conn, registro, proxy):
+    metricas_pool.contar("checkouts")
+
+@event.listens_for(engine, "invalidate")
+def _ao_invalidar(dbapi_conn, registro, erro):
+    metricas_pool.contar("invalidacoes")
+
+def status_pool():
+    """Configuração, ocupação atual e contadores do pool deste worker."""
+    return {
+        "worker_pid": os.getpid(),
+        "config": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+            "workers": WEB_CONCURRENCY,
+            "max_conexoes": DB_MAX_CONEXOES,
+        },
+        "agora": {
+            "em_uso": engine.pool.checkedout(),
+            "ociosas": engine.pool.checkedin(),
+            "overflow": max(0, engine.pool.overflow()),
+        },
+        "contadores": metricas_pool.resumo(),
+    }
+
+# ------------------ Instrumentação ------------------
+# Latência por rota, consultas SQL por requisição, tempo de render dos templates
+# e perfis cProfile opcionais. Os números são por worker (cada worker do
+# gunicorn tem os seus); /admin/metricas e /metrics expõem o worker que atender.
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", "200"))            # consultas acima disso vão para a lista de lentas
+SQL_ALERTA_CONSULTAS = int(os.getenv("SQL_ALERTA_CONSULTAS", "25"))  # requisições acima disso são suspeitas de N+1
+PERFIL_AMOSTRAGEM = float(os.getenv("PERFIL_AMOSTRAGEM", "0"))     # fração das requisições com cProfile (0 = só sob demanda)
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")                       # Bearer aceito em /metrics, além de localhost
+
+class Histograma:
+    """Histograma cumulativo no formato do Prometheus (limites em segundos)."""
+
+    LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.contagens = [0] * (len(self.LIMITES) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, segundos):
+        self.contagens[bisect.bisect_left(self.LIMITES, segundos)] += 1
+        self.soma += segundos
+        self.total += 1
+
+    def percentil(self, p):
+        """Limite superior do balde que contém o percentil `p` (aproximado)."""
+        alvo = self.total * p / 100
+        acumulado = 0
+        for limite, contagem in zip(self.LIMITES + (float("inf"),), self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float("inf")
+
+    def resumo(self):
+        return {
+            "total": self.total,
+            "media_ms": round(self.soma * 1000 / self.total, 2) if self.total else 0.0,
+            "p50_ms": self.percentil(50) * 1000,
+            "p95_ms": self.percentil(95) * 1000,
+            "p99_ms": self.percentil(99) * 1000,
+        }
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rotas = {}        # (método, rota) -> {"latencia": Histograma, "status": {}, "consultas": n, ...}
+        self.templates = {}    # nome -> Histograma
+        self.lentas = deque(maxlen=50)
+        self.perfis = deque(maxlen=10)
+
+    def registrar_requisicao(self, metodo, rota, status, segundos, consultas, segundos_sql):
+        with self._lock:
+            dados = self.rotas.setdefault((metodo, rota), {
+                "latencia": Histograma(), "status": {}, "consultas": 0, "consultas_max": 0, "sql_segundos": 0.0,
+            })
+            dados["latencia"].observar(segundos)
+            dados["status"][status] = dados["status"].get(status, 0) + 1
+            dados["consultas"] += consultas
+            dados["consultas_max"] = max(dados["consultas_max"], consultas)
+            dados["sql_segundos"] += segundos_sql
+
+    def registrar_template(self, nome, segundos):
+        with self._lock:
+            self.templates.setdefault(nome, Histograma()).observar(segundos)
+
+    def registrar_lenta(self, sql, segundos, rota):
+        with self._lock:
+            self.lentas.append({
+                "sql": " ".join(sql.split())[:500], "ms": round(segundos * 1000, 1),
+                "rota": rota, "quando": datetime.datetime.now().isoformat(timespec="seconds"),
+            })
+
+    def resumo(self):
+        with self._lock:
+            rotas = []
+            for (metodo, rota), dados in sorted(self.rotas.items(), key=lambda i: -i[1]["latencia"].soma):
+                total = dados["latencia"].total
+                rotas.append({
+                    "metodo": metodo, "rota": rota, **dados["latencia"].resumo(),
+                    "status": dict(dados["status"]),
+                    "consultas_media": round(dados["consultas"] / total, 2) if total else 0.0,
+                    "consultas_max": dados["consultas_max"],
+                    "sql_media_ms": round(dados["sql_segundos"] * 1000 / total, 2) if total else 0.0,
+                })
+            return {
+                "rotas": rotas,
+                "templates": {nome: h.resumo() for nome, h in self.templates.items()},
+                "consultas_lentas": list(self.lentas),
+                "perfis": [{k: v for k, v in p.items() if k != "texto"} for p in self.perfis],
+            }
+
+    def prometheus(self):
+        """Texto no formato de exposição do Prometheus."""
+        def rotulos(**valores):
+            return ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                            for k, v in valores.items())
+
+        def histograma(nome, h, **valores):
+            acumulado = 0
+            for limite, contagem in zip(Histograma.LIMITES + ("+Inf",), h.contagens):
+                acumulado += contagem
+                linhas.append(f"{nome}_bucket{{{rotulos(**valores, le=limite)}}} {acumulado}")
+            linhas.append(f"{nome}_sum{{{rotulos(**valores)}}} {h.soma:.6f}")
+            linhas.append(f"{nome}_count{{{rotulos(**valores)}}} {h.total}")
+
+        linhas = []
+        with self._lock:
+            linhas += ["# HELP checkin_requisicao_segundos Latência das requisições por rota.",
+                       "# TYPE checkin_requisicao_segundos histogram"]
+            for (metodo, rota), dados in self.rotas.items():
+                histograma("checkin_requisicao_segundos", dados["latencia"], metodo=metodo, rota=rota)
+            linhas += ["# HELP checkin_requisicoes_total Requisições por rota e status HTTP.",
+                       "# TYPE checkin_requisicoes_total counter"]
+            for (metodo, rota), dados in self.rotas.items():
+                for status, n in dados["status"].items():
+                    linhas.append(f"checkin_requisicoes_total{{{rotulos(metodo=metodo, rota=rota, status=status)}}} {n}")
+            linhas += ["# HELP checkin_sql_consultas_total Consultas SQL feitas pelas requisições de cada rota.",
+                       "# TYPE checkin_sql_consultas_total counter"]
+            for (metodo, rota), dados in self.rotas.items():
+                linhas.append(f"checkin_sql_consultas_total{{{rotulos(metodo=metodo, rota=rota)}}} {dados['consultas']}")
+            linhas += ["# HELP checkin_sql_segundos_total Tempo em SQL das requisições de cada rota.",
+                       "# TYPE checkin_sql_segundos_total counter"]
+            for (metodo, rota), dados in self.rotas.items():
+                linhas.append(f"checkin_sql_segundos_total{{{rotulos(metodo=metodo, rota=rota)}}} {dados['sql_segundos']:.6f}")
+            linhas += ["# HELP checkin_template_segundos Tempo de render dos templates.",
+                       "# TYPE checkin_template_segundos histogram"]
+            for nome, h in self.templates.items():
+                histograma("checkin_template_segundos", h, template=nome)
+
+        pool = metricas_pool.resumo()
+        linhas += ["# HELP checkin_pool_eventos_total Eventos do pool de conexões.",
+                   "# TYPE checkin_pool_eventos_total counter"]
+        for chave in ("checkouts", "conexoes_criadas", "invalidacoes", "esgotamentos"):
+            linhas.append(f"checkin_pool_eventos_total{{{rotulos(evento=chave)}}} {pool[chave]}")
+        linhas += ["# HELP checkin_pool_espera_segundos_total Tempo esperando conexão livre no pool.",
+                   "# TYPE checkin_pool_espera_segundos_total counter",
+                   f"checkin_pool_espera_segundos_total {pool['espera_total_ms'] / 1000:.6f}",
+                   "# HELP checkin_pool_conexoes Conexões do pool agora.",
+                   "# TYPE checkin_pool_conexoes gauge",
+                   f"checkin_pool_conexoes{{{rotulos(estado='em_uso')}}} {engine.pool.checkedout()}",
+                   f"checkin_pool_conexoes{{{rotulos(estado='ociosa')}}} {engine.pool.checkedin()}",
+                   "# HELP checkin_inicializacao_ms Tempo de cada etapa da inicialização do worker.",
+                   "# TYPE checkin_inicializacao_ms gauge"]
+        for etapa, ms in TEMPOS_INICIALIZACAO.items():
+            linhas.append(f"checkin_inicializacao_ms{{{rotulos(etapa=etapa)}}} {ms}")
+        return "\n".join(linhas) + "\n"
+
+metricas = Metricas()
+
+@event.listens_for(engine, "before_cursor_execute")
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    context._inicio_sql = time.perf_counter()
+
+@event.listens_for(engine, "after_cursor_execute")
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    segundos = time.perf_counter() - context._inicio_sql
+    rota = None
+    if has_request_context():
+        g.sql_consultas = g.get("sql_consultas", 0) + 1
+        g.sql_segundos = g.get("sql_segundos", 0.0) + segundos
+        rota = request.url_rule.rule if request.url_rule else request.path
+    if segundos * 1000 >= SQL_LENTA_MS:
+        metricas.registrar_lenta(statement, segundos, rota)
+
+class TemplateMedido(jinja2.Template):
+    def render(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            metricas.registrar_template(self.name, time.perf_counter() - inicio)
+
+class AmbienteMedido(FlaskEnvironment):
+    template_class = TemplateMedido
+
+app.jinja_environment = AmbienteMedido
+
+@app.before_request
+def _iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+    perfil_pedido = request.args.get("_perfil") == "1" and session.get("tipo_usuario") == "lider"
+    if perfil_pedido or (PERFIL_AMOSTRAGEM and random.random() < PERFIL_AMOSTRAGEM):
+        g.perfil = cProfile.Profile()
+        g.perfil.enable()
+
+@app.after_request
+def _registrar_medicao(response):
+    if "inicio_requisicao" not in g:
+        return response
+    segundos = time.perf_counter() - g.inicio_requisicao
+    rota = request.url_rule.rule if request.url_rule else "<sem rota>"
+    consultas, segundos_sql = g.get("sql_consultas", 0), g.get("sql_segundos", 0.0)
+    metricas.registrar_requisicao(request.method, rota, response.status_code, segundos, consultas, segundos_sql)
+    response.headers["Server-Timing"] = f"app;dur={segundos * 1000:.1f}, db;dur={segundos_sql * 1000:.1f}"
+    if consultas > SQL_ALERTA_CONSULTAS:
+        print(f"⚠️ {request.method} {rota} fez {consultas} consultas SQL (possível N+1)")
+
+    perfil = g.pop("perfil", None)
+    if perfil is not None:
+        perfil.disable()
+        saida = StringIO()
+        pstats.Stats(perfil, stream=saida).sort_stats("cumulative").print_stats(30)
+        metricas.perfis.append({
+            "rota": rota, "metodo": request.method, "ms": round(segundos * 1000, 1),
+            "quando": datetime.datetime.now().isoformat(timespec="seconds"), "texto": saida.getvalue(),
+        })
+    return response
+
+# ------------------ Cache HTTP e compressão ------------------
+ESTATICOS_MAX_AGE = int(os.getenv("ESTATICOS_MAX_AGE", str(365 * 24 * 3600)))  # segundos, para URLs com ?v=
+COMPRESSAO_MIN_BYTES = int(os.getenv("COMPRESSAO_MIN_BYTES", "1024"))  # abaixo disso o cabeçalho custa mais que o ganho
+COMPRESSAO_NIVEL_GZIP = int(os.getenv("COMPRESSAO_NIVEL_GZIP", "6"))
+COMPRESSAO_NIVEL_BROTLI = int(os.getenv("COMPRESSAO_NIVEL_BROTLI", "5"))
+TIPOS_COMPRIMIVEIS = {"text/html", "text/plain", "text/csv", "text/css", "application/json", "application/javascript"}
+
+try:
+    import brotli  # opcional: sem ele as respostas saem só em gzip
+except ImportError:
+    brotli = None
+
+@functools.lru_cache(maxsize=256)
+def _hash_arquivo(caminho, mtime_ns):
+    with open(caminho, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+def versao_estatico(filename):
+    """Hash do conteúdo de static/<filename> (None se o arquivo não existir)."""
+    caminho = os.path.join(app.static_folder, filename)
+    try:
+        return _hash_arquivo(caminho, os.stat(caminho).st_mtime_ns)
+    except OSError:
+        return None
+
+@functools.lru_cache(maxsize=1)
+def versao_paginas():
+    """Hash de templates e arquivos estáticos: um deploy que muda o layout invalida os ETags das páginas."""
+    partes = []
+    for pasta in (app.template_folder, app.static_folder):
+        pasta = os.path.join(app.root_path, pasta)
+        for raiz, _, arquivos in sorted(os.walk(pasta)):
+            for nome in sorted(arquivos):
+                caminho = os.path.join(raiz, nome)
+                partes.append(f"{os.path.relpath(caminho, pasta)}:{_hash_arquivo(caminho, os.stat(caminho).st_mtime_ns)}")
+    return hashlib.sha256("\n".join(partes).encode()).hexdigest()[:12]
+
+@app.url_defaults
+def _versionar_estaticos(endpoint, values):
+    """url_for('static', ...) ganha ?v=<hash do conteúdo>, então o arquivo pode ficar em cache para sempre."""
+    if endpoint == "static" and "v" not in values:
+        versao = versao_estatico(values.get("filename", ""))
+        if versao:
+            values["v"] = versao
+
+def resposta_condicional(validador, gerar, ultima_modificacao=None):
+    """Responde 304 se o navegador já tem a versão `validador` da página; senão chama gerar().
+
+    `validador` é qualquer valor serializável que muda junto com o conteúdo (por
+    exemplo, quantidade e MAX(atualizado_em) das linhas exibidas) e deve sair de
+    uma consulta barata: as consultas e a renderização ficam dentro de `gerar`.
+    `ultima_modificacao` é um datetime em UTC.
+    """
+    if session.get("_flashes"):
+        # Há mensagem para exibir: a página desta vez não é a mesma do cache
+        return gerar()
+    etag = hashlib.sha256(
+        json.dumps([versao_paginas(), session.get("usuario_nome"), validador], default=str).encode()
+    ).hexdigest()[:20]
+    if ultima_modificacao is not None:
+        ultima_modificacao = ultima_modificacao.replace(tzinfo=datetime.timezone.utc, microsecond=0)
+
+    if "If-None-Match" in request.headers:
+        em_cache = request.if_none_match.contains_weak(etag)
+    else:
+        em_cache = bool(ultima_modificacao and request.if_modified_since
+                        and ultima_modificacao <= request.if_modified_since)
+    resposta = Response(status=304) if em_cache else make_response(gerar())
+    if resposta.status_code in (200, 304):
+        # Fraco porque a compressão muda os bytes sem mudar o conteúdo
+        resposta.set_etag(etag, weak=True)
+        if ultima_modificacao is not None:
+            resposta.last_modified = ultima_modificacao
+        resposta.cache_control.private = True
+        resposta.cache_control.no_cache = True
+    return resposta
+
+@app.after_request
+def _cache_estaticos(response):
+    if request.endpoint != "static" or response.status_code not in (200, 304):
+        return response
+    versao = request.args.get("v")
+    if versao and versao == versao_estatico(request.view_args.get("filename", "")):
+        # O hash está na URL: conteúdo novo vira URL nova, então o navegador nem revalida
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ESTATICOS_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+def _codificacao_aceita():
+    aceitas = request.accept_encodings
+    if brotli is not None and aceitas["br"]:
+        return "br"
+    if aceitas["gzip"]:
+        return "gzip"
+    return None
+
+@app.after_request
+def _comprimir_resposta(response):
+    """gzip/brotli em HTML, JSON e texto acima de COMPRESSAO_MIN_BYTES.
+
+    Arquivos (send_file) e streams (SSE, exportações) passam direto.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or response.mimetype not in TIPOS_COMPRIMIVEIS):
+        return response
+    corpo = response.get_data()
+    if len(corpo) < COMPRESSAO_MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    codificacao = _codificacao_aceita()
+    if codificacao is None:
+        return response
+    if codificacao == "br":
+        corpo = brotli.compress(corpo, quality=COMPRESSAO_NIVEL_BROTLI)
+    else:
+        corpo = gzip.compress(corpo, compresslevel=COMPRESSAO_NIVEL_GZIP)
+    response.set_data(corpo)
+    response.headers["Content-Encoding"] = codificacao
+    etag, fraca = response.get_etag()
+    if etag and not fraca:
+        response.set_etag(etag, weak=True)
+    return response
 
 # ------------------ Funções auxiliares ------------------
+_ACENTOS = re.compile(r"[\u0300-\u036f]")
+
+def normalizar_chave(valor):
+    """Normaliza nome/grupo para busca: sem acentos, minúsculo e espaços colapsados."""
+    if not valor:
+        return ""
+    valor = _ACENTOS.sub("", unicodedata.normalize("NFKD", str(valor)))
+    return " ".join(valor.lower().split())
+
+def _sql(sql, params):
+    """text() com os parâmetros do tipo lista expandidos para IN (...)."""
+    listas = [
+        bindparam(nome, expanding=True) for nome, valor in params.items()
+        if isinstance(valor, (list, tuple)) and re.search(rf":{nome}\b", sql)
+    ]
+    return text(sql).bindparams(*listas) if listas else text(sql)
+
+def _colunas(conn, tabela):
+    """Nomes das colunas de uma tabela (funciona em SQLite e PostgreSQL)."""
+    return {c["name"] for c in inspect(conn).get_columns(tabela)}
+
+def agora_utc():
+    """datetime sem fuso em UTC, como o CURRENT_TIMESTAMP do banco."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+# ------------------ Migrações do banco ------------------
+# Cada migração roda uma vez, na sua própria transação, e fica registrada em
+# schema_versao. Todas são idempotentes: bancos criados antes do controle de
+# versão passam por elas sem efeito colateral. Novas migrações entram no fim
+# de MIGRACOES com o próximo número.
+MIGRAR_AO_INICIAR = os.getenv("MIGRAR_AO_INICIAR", "1") == "1"
+CONGREGACAO_PADRAO = os.getenv("CONGREGACAO_PADRAO", "Sede")
+
+def _migracao_tabelas_base(conn):
+    """Tabelas base, usuário líder padrão e obreiros de exemplo."""
+    # Tabela de usuários (líderes)
+    conn.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id {PK_AUTO},
+        nome TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        senha TEXT NOT NULL,
+        tipo TEXT DEFAULT 'lider',
+        criado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """))
+
+    # Tabela de membros (obreiros)
+    conn.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS membros (
+        id {PK_AUTO},
+        nome TEXT NOT NULL,
+        grupo TEXT,
+        telefone TEXT,
+        email TEXT,
+        observacoes TEXT,
+        presente BOOLEAN DEFAULT FALSE,   -- legado: presença agora fica em presencas/checkins
+        data_checkin TIMESTAMP,           -- legado
+        checkin_latitude REAL,            -- legado
+        checkin_longitude REAL,           -- legado
+        nome_busca TEXT,     -- nome normalizado (sem acentos, minúsculo)
+        grupo_busca TEXT,    -- grupo normalizado
+        criado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """))
+
+    # Tabela de atas (para registros de reuniões)
+    conn.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS atas (
+        id {PK_AUTO},
+        data_reuniao DATE NOT NULL,
+        tipo TEXT,           -- Ex: Culto de Obreiros, Reunião de Líderes
+        departamento TEXT,   -- Ex: Evangelismo, Louvor, Intercessão
+        tema TEXT,
+        local TEXT,
+        observacoes TEXT,
+        lista_presentes TEXT, -- legado: presentes agora ficam em ata_presentes
+        arquivada BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """))
+
+    # Versão do cadastro de obreiros (invalida o cache entre workers)
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS roster_versao (
+        id INTEGER PRIMARY KEY,
+        versao INTEGER NOT NULL DEFAULT 0
+    );
+    """))
+    if conn.execute(text("SELECT COUNT(*) FROM roster_versao")).scalar() == 0:
+        conn.execute(text("INSERT INTO roster_versao (id, versao) VALUES (1, 0)"))
+
+    # Tarefas em segundo plano (importações, PDFs, exportações)
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pendente',  -- pendente, executando, concluido, erro
+        resultado TEXT,      -- JSON com o retorno da tarefa
+        erro TEXT,
+        arquivo TEXT,        -- caminho do arquivo gerado, se houver
+        nome_arquivo TEXT,
+        mimetype TEXT,
+        criado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        iniciado TIMESTAMP,
+        concluido TIMESTAMP
+    );
+    """))
+
+    # Usuário líder padrão
+    result = conn.execute(text("SELECT COUNT(*) FROM usuarios")).scalar()
+    if result == 0:
+        senha_hash = gerar_hash_senha("admin123")
+        conn.execute(
+            text("INSERT INTO usuarios (nome, email, senha, tipo) VALUES (:n, :e, :s, :t)"),
+            {"n": "Pastor Líder", "e": "lider@adfidelidade.com", "s": senha_hash, "t": "lider"}
+        )
+        print("✅ Usuário líder criado: lider@adfidelidade.com / admin123")
+
+    # Membros de exemplo
+    result = conn.execute(text("SELECT COUNT(*) FROM membros")).scalar()
+    if result == 0:
+        exemplos = [
+            ("Fernando Alexandre Fernandes", "Evangelismo", "(11) 99999-9999"),
+            ("Maria Silva Santos", "Louvor", "(11) 98888-8888"),
+            ("João Pereira Oliveira", "Intercessão", "(11) 97777-7777"),
+        ]
+        conn.execute(
+            text("INSERT INTO membros (nome, grupo, telefone, nome_busca, grupo_busca) VALUES (:n, :g, :t, :nb, :gb)"),
+            [{"n": n, "g": g, "t": t, "nb": normalizar_chave(n), "gb": normalizar_chave(g)} for n, g, t in exemplos]
+        )
+        print("✅ Dados de exemplo inseridos")
+
+def _migracao_colunas_geo_atas(conn):
+    """Garantir colunas de geolocalização em membros (idempotente)."""
+    col_names = _colunas(conn, "membros")
+    if "checkin_latitude" not in col_names:
+        conn.execute(text("ALTER TABLE membros ADD COLUMN checkin_latitude REAL"))
+    if "checkin_longitude" not in col_names:
+        conn.execute(text("ALTER TABLE membros ADD COLUMN checkin_longitude REAL"))
+
+    # Migração para coluna lista_presentes e arquivada
+    col_names_ata = _colunas(conn, "atas")
+    if "lista_presentes" not in col_names_ata:
+        conn.execute(text("ALTER TABLE atas ADD COLUMN lista_presentes TEXT"))
+    if "arquivada" not in col_names_ata:
+        conn.execute(text("ALTER TABLE atas ADD COLUMN arquivada BOOLEAN DEFAULT FALSE"))
+
+def _migracao_chave_busca(conn):
+    """Chave de busca normalizada + índice para o check-in."""
+    col_names = _colunas(conn, "membros")
+    if "nome_busca" not in col_names:
+        conn.execute(text("ALTER TABLE membros ADD COLUMN nome_busca TEXT"))
+    if "grupo_busca" not in col_names:
+        conn.execute(text("ALTER TABLE membros ADD COLUMN grupo_busca TEXT"))
+
+    pendentes = conn.execute(
+        text("SELECT id, nome, grupo FROM membros WHERE nome_busca IS NULL OR grupo_busca IS NULL")
+    ).fetchall()
+    if pendentes:
+        conn.execute(
+            text("UPDATE membros SET nome_busca = :n, grupo_busca = :g WHERE id = :id"),
+            [{"id": r.id, "n": normalizar_chave(r.nome), "g": normalizar_chave(r.grupo)} for r in pendentes]
+        )
+        print(f"✅ Chave de busca preenchida para {len(pendentes)} obreiros")
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_membros_busca ON membros (nome_busca, grupo_busca)"))
+    # Índices da listagem paginada do painel (ordem por nome + filtros)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_membros_nome ON membros (nome_busca, id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_membros_grupo ON membros (grupo_busca, nome_busca, id)"))
+
+def _migracao_historico_checkins(conn):
+    """Histórico de check-ins por evento (substitui membros.presente/data_checkin)."""
+    conn.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS eventos (
+        id {PK_AUTO},
+        nome TEXT NOT NULL,
+        iniciado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        encerrado_em TIMESTAMP
+    );
+    """))
+    # Histórico append-only: cada check-in (ou desmarcação do líder) vira uma linha
+    conn.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS checkins (
+        id {PK_AUTO},
+        membro_id INTEGER NOT NULL,
+        evento_id INTEGER NOT NULL,
+        data_checkin TIMESTAMP NOT NULL,
+        latitude REAL,
+        longitude REAL,
+        origem TEXT NOT NULL,            -- self, lider ou migracao
+        presente BOOLEAN NOT NULL DEFAULT TRUE
+    );
+    """))
+    # Presença atual por evento: só contém quem está presente
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS presencas (
+        evento_id INTEGER NOT NULL,
+        membro_id INTEGER NOT NULL,
+        data_checkin TIMESTAMP NOT NULL,
+        latitude REAL,
+        longitude REAL,
+        origem TEXT NOT NULL,
+        PRIMARY KEY (evento_id, membro_id)
+    );
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_checkins_evento ON checkins (evento_id, membro_id, data_checkin)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_checkins_membro ON checkins (membro_id, data_checkin)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_presencas_membro ON presencas (membro_id)"))
+    conn.execute(text("DROP INDEX IF EXISTS idx_membros_presente"))
+
+    if conn.execute(text("SELECT COUNT(*) FROM eventos")).scalar() == 0:
+        conn.execute(
+            text("INSERT INTO eventos (nome, iniciado_em) VALUES (:n, :d)"),
+            {"n": "Evento inicial", "d": datetime.datetime.now()}
+        )
+        evento_id = conn.execute(text("SELECT MAX(id) FROM eventos")).scalar()
+        # Backfill a partir das colunas antigas de membros
+        conn.execute(text("""
+            INSERT INTO checkins (membro_id, evento_id, data_checkin, latitude, longitude, origem, presente)
+            SELECT id, :e, data_checkin, checkin_latitude, checkin_longitude, 'migracao', COALESCE(presente, FALSE)
+              FROM membros WHERE data_checkin IS NOT NULL
+        """), {"e": evento_id})
+        migrados = conn.execute(text("""
+            INSERT INTO presencas (evento_id, membro_id, data_checkin, latitude, longitude, origem)
+            SELECT :e, id, COALESCE(data_checkin, :d), checkin_latitude, checkin_longitude, 'migracao'
+              FROM membros WHERE presente = TRUE
+        """), {"e": evento_id, "d": datetime.datetime.now()}).rowcount
+        print(f"✅ Histórico de check-ins criado ({migrados} presenças migradas)")
+
+def _migracao_sessoes(conn):
+    """Sessões de líderes guardadas no servidor."""
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS sessoes (
+        id TEXT PRIMARY KEY,
+        dados TEXT NOT NULL,
+        expira TIMESTAMP NOT NULL
+    );
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_sessoes_expira ON sessoes (expira)"))
+
+def _migracao_versao_sessoes(conn):
+    """Versão de cada sessão: os workers conferem se a cópia em memória está atual."""
+    if "versao" not in _colunas(conn, "sessoes"):
+        conn.execute(text("ALTER TABLE sessoes ADD COLUMN versao INTEGER NOT NULL DEFAULT 0"))
+
+def _migracao_id_cliente_checkins(conn):
+    """Identificador do check-in no quiosque (reenvio offline idempotente)."""
+    if "id_cliente" not in _colunas(conn, "checkins"):
+        conn.execute(text("ALTER TABLE checkins ADD COLUMN id_cliente TEXT"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_checkins_cliente ON checkins (id_cliente, membro_id)"
+    ))
+
+def _migracao_ata_presentes(conn):
+    """Presentes das atas em tabela própria (substitui o JSON em atas.lista_presentes)."""
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS ata_presentes (
+        ata_id INTEGER NOT NULL,
+        membro_id INTEGER NOT NULL,
+        nome TEXT,               -- cópia do nome/grupo na data da ata
+        grupo TEXT,
+        grupo_busca TEXT,
+        PRIMARY KEY (ata_id, membro_id)
+    );
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_ata_presentes_membro ON ata_presentes (membro_id, ata_id)"))
+
+    pendentes = conn.execute(
+        text("SELECT id, lista_presentes FROM atas WHERE lista_presentes IS NOT NULL")
+    ).fetchall()
+    linhas = []
+    ignorados = 0
+    for ata in pendentes:
+        try:
+            presentes = json.loads(ata.lista_presentes or "[]")
+        except ValueError:
+            presentes = None
+        if not isinstance(presentes, list):
+            print(f"⚠️ Ata {ata.id}: lista_presentes ilegível, presentes não migrados")
+            continue
+        vistos = set()
+        for p in presentes:
+            try:
+                membro_id = int(p["id"])
+            except (KeyError, TypeError, ValueError):
+                ignorados += 1
+                print(f"⚠️ Ata {ata.id}: presente sem id válido ignorado: {p!r}")
+                continue
+            if membro_id not in vistos:
+                vistos.add(membro_id)
+                linhas.append({"a": ata.id, "m": membro_id, "n": p.get("nome"), "g": p.get("grupo"),
+                               "gb": normalizar_chave(p.get("grupo"))})
+    if linhas:
+        conn.execute(
+            text("""
+                INSERT INTO ata_presentes (ata_id, membro_id, nome, grupo, grupo_busca)
+                VALUES (:a, :m, :n, :g, :gb)
+                ON CONFLICT (ata_id, membro_id) DO NOTHING
+            """),
+            linhas
+        )
+    # atas.lista_presentes fica intacta como cópia do original; a coluna só
+    # deve ser removida em migração própria, depois de conferido o resultado.
+    if pendentes:
+        print(f"✅ Presentes de {len(pendentes)} atas migrados para ata_presentes"
+              + (f" ({ignorados} entradas inválidas ignoradas)" if ignorados else ""))
+
+def _migracao_frequencia(conn):
+    """Agregados de frequência (por obreiro/mês e por grupo/dia)."""
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS freq_membro_mes (
+        mes TEXT NOT NULL,              -- AAAA-MM
+        membro_id INTEGER NOT NULL,
+        presencas INTEGER NOT NULL DEFAULT 0,
+        presencas_ata INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (mes, membro_id)
+    );
+    """))
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS freq_grupo_dia (
+        dia TEXT NOT NULL,              -- AAAA-MM-DD
+        grupo_busca TEXT NOT NULL,
+        grupo TEXT,
+        presencas INTEGER NOT NULL DEFAULT 0,
+        presencas_ata INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, grupo_busca)
+    );
+    """))
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS freq_mes (
+        mes TEXT PRIMARY KEY,
+        eventos INTEGER NOT NULL DEFAULT 0,
+        atas INTEGER NOT NULL DEFAULT 0
+    );
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_freq_membro ON freq_membro_mes (membro_id, mes)"))
+    # O cálculo inicial fica na migração 14, que recria as tabelas por congregação
+
+def _migracao_congregacoes(conn):
+    """Congregação de cada evento: cultos simultâneos em congregações diferentes."""
+    if "congregacao" not in _colunas(conn, "eventos"):
+        conn.execute(text("ALTER TABLE eventos ADD COLUMN congregacao TEXT"))
+    conn.execute(text("UPDATE eventos SET congregacao = :c WHERE congregacao IS NULL"), {"c": CONGREGACAO_PADRAO})
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_eventos_abertos ON eventos (congregacao, encerrado_em, id)"
+    ))
+
+def _migracao_busca_atas(conn):
+    """Índice de texto das atas: FTS5 no SQLite, tsvector com GIN no PostgreSQL."""
+    if IS_SQLITE:
+        conn.execute(text("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS atas_busca USING fts5(
+            tema, observacoes, local, departamento, presentes
+        );
+        """))
+    else:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS atas_busca (
+            ata_id INTEGER PRIMARY KEY,
+            documento TSVECTOR NOT NULL
+        );
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_atas_busca ON atas_busca USING GIN (documento)"))
+    # Listagem sem termo de busca: arquivadas em ordem de data, paginadas
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_atas_arquivada_data ON atas (arquivada, data_reuniao, id)"))
+    ids = conn.execute(text("SELECT id FROM atas")).scalars().all()
+    indexar_atas(conn, ids)
+    if ids:
+        print(f"✅ {len(ids)} atas indexadas para busca")
+
+def _migracao_avisos_painel(conn):
+    """Fila de avisos do painel ao vivo (mudanças de presença lidas por todos os workers)."""
+    conn.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS avisos_painel (
+        id {PK_AUTO},
+        evento_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL,              -- presenca ou evento_encerrado
+        membro_id INTEGER,
+        grupo_busca TEXT,
+        presente BOOLEAN,
+        data_checkin TIMESTAMP,
+        criado_em TIMESTAMP NOT NULL
+    );
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_avisos_painel_evento ON avisos_painel (evento_id, id)"))
+
+def _migracao_atualizacao_atas(conn):
+    """Momento (UTC) da última alteração de cada ata: base dos ETags das atas e dos PDFs."""
+    if "atualizado_em" not in _colunas(conn, "atas"):
+        conn.execute(text("ALTER TABLE atas ADD COLUMN atualizado_em TIMESTAMP"))
+    conn.execute(text(
+        "UPDATE atas SET atualizado_em = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE atualizado_em IS NULL"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_atas_atualizacao ON atas (arquivada, atualizado_em)"))
+
+def _migracao_frequencia_congregacao(conn):
+    """Agregados de frequência por congregação: cada congregação tem seus próprios cultos.
+
+    As tabelas são só agregados, então são recriadas com a coluna na chave e
+    recalculadas. Presenças em atas, que não têm congregação, ficam em
+    congregacao = ''.
+    """
+    if "congregacao" in _colunas(conn, "freq_mes"):
+        return
+    for tabela in ("freq_membro_mes", "freq_grupo_dia", "freq_mes"):
+        conn.execute(text(f"DROP TABLE IF EXISTS {tabela}"))
+    conn.execute(text("""
+    CREATE TABLE freq_membro_mes (
+        mes TEXT NOT NULL,              -- AAAA-MM
+        congregacao TEXT NOT NULL,      -- '' nas presenças em atas
+        membro_id INTEGER NOT NULL,
+        presencas INTEGER NOT NULL DEFAULT 0,
+        presencas_ata INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (mes, congregacao, membro_id)
+    );
+    """))
+    conn.execute(text("""
+    CREATE TABLE freq_grupo_dia (
+        dia TEXT NOT NULL,              -- AAAA-MM-DD
+        congregacao TEXT NOT NULL,
+        grupo_busca TEXT NOT NULL,
+        grupo TEXT,
+        presencas INTEGER NOT NULL DEFAULT 0,
+        presencas_ata INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, congregacao, grupo_busca)
+    );
+    """))
+    conn.execute(text("""
+    CREATE TABLE freq_mes (
+        mes TEXT NOT NULL,
+        congregacao TEXT NOT NULL,      -- '' guarda a contagem de atas
+        eventos INTEGER NOT NULL DEFAULT 0,
+        atas INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (mes, congregacao)
+    );
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_freq_membro ON freq_membro_mes (membro_id, mes)"))
+    reconstruir_frequencia(conn)
+    print("✅ Agregados de frequência calculados por congregação")
+
+MIGRACOES = [
+    (1, "tabelas base", _migracao_tabelas_base),
+    (2, "colunas de geolocalização e de atas", _migracao_colunas_geo_atas),
+    (3, "chave de busca normalizada", _migracao_chave_busca),
+    (4, "histórico de check-ins por evento", _migracao_historico_checkins),
+    (5, "sessões no servidor", _migracao_sessoes),
+    (6, "id_cliente dos check-ins", _migracao_id_cliente_checkins),
+    (7, "presentes das atas em ata_presentes", _migracao_ata_presentes),
+    (8, "agregados de frequência", _migracao_frequencia),
+    (9, "congregação dos eventos", _migracao_congregacoes),
+    (10, "busca de texto nas atas", _migracao_busca_atas),
+    (11, "avisos do painel ao vivo", _migracao_avisos_painel),
+    (12, "data de alteração das atas", _migracao_atualizacao_atas),
+    (13, "versão das sessões", _migracao_versao_sessoes),
+    (14, "frequência por congregação", _migracao_frequencia_congregacao),
+]
+VERSAO_SCHEMA = MIGRACOES[-1][0]
+
+def versao_schema():
+    """Última migração aplicada (0 em banco novo ou anterior ao controle de versão)."""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table("schema_versao"):
+            return 0
+        return conn.execute(text("SELECT MAX(versao) FROM schema_versao")).scalar() or 0
+
+def migrar():
+    """Aplica as migrações pendentes em ordem. Retorna a versão final."""
+    with engine.begin() as conn:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_versao (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT,
+            aplicada_em TIMESTAMP
+        );
+        """))
+    atual = versao_schema()
+    for versao, descricao, migracao in MIGRACOES:
+        if versao <= atual:
+            continue
+        inicio = time.perf_counter()
+        with engine.begin() as conn:
+            migracao(conn)
+            conn.execute(
+                text("INSERT INTO schema_versao (versao, descricao, aplicada_em) VALUES (:v, :d, :a)"),
+                {"v": versao, "d": descricao, "a": datetime.datetime.now()}
+            )
+        print(f"✅ Migração {versao} ({descricao}) aplicada em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        atual = versao
+    return atual
+
 def init_db():
-    """Cria as tabelas necessárias."""
+    """Confere a versão do schema na inicialização; só migra se estiver atrasado.
+
+    Num boot normal isso é uma consulta. Com MIGRAR_AO_INICIAR=0 as migrações
+    ficam só para o comando `flask migrar` (rodar uma vez a cada deploy).
+    """
     max_retries = 3
     retry_delay = 2  # segundos
-    
+
     for attempt in range(max_retries):
         try:
-            with engine.begin() as conn:
-                # Tabela de usuários (líderes)
-                conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    senha TEXT NOT NULL,
-                    tipo TEXT DEFAULT 'lider',
-                    criado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                """))
-                
-                # Tabela de membros (obreiros)
-                conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS membros (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    grupo TEXT,
-                    telefone TEXT,
-                    email TEXT,
-                    observacoes TEXT,
-                    presente BOOLEAN DEFAULT FALSE,
-                    data_checkin TIMESTAMP,
-                    checkin_latitude REAL,
-                    checkin_longitude REAL,
-                    criado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                """))
-
-                # Tabela de atas (para registros de reuniões)
-                conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS atas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    data_reuniao DATE NOT NULL,
-                    tipo TEXT,           -- Ex: Culto de Obreiros, Reunião de Líderes
-                    departamento TEXT,   -- Ex: Evangelismo, Louvor, Intercessão
-                    tema TEXT,
-                    local TEXT,
-                    observacoes TEXT,
-                    lista_presentes TEXT, -- JSON com lista de presentes
-                    arquivada BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                """))
-                
-                # Usuário líder padrão
-                result = conn.execute(text("SELECT COUNT(*) FROM usuarios")).scalar()
-                if result == 0:
-                    senha_hash = generate_password_hash("admin123")
-                    conn.execute(
-                        text("INSERT INTO usuarios (nome, email, senha, tipo) VALUES (:n, :e, :s, :t)"),
-                        {"n": "Pastor Líder", "e": "lider@adfidelidade.com", "s": senha_hash, "t": "lider"}
-                    )
-                    print("✅ Usuário líder criado: lider@adfidelidade.com / admin123")
-                
-                # Membros de exemplo
-                result = conn.execute(text("SELECT COUNT(*) FROM membros")).scalar()
-                if result == 0:
-                    conn.execute(text("""
-                    INSERT INTO membros (nome, grupo, telefone) VALUES 
-                    ('Fernando Alexandre Fernandes', 'Evangelismo', '(11) 99999-9999'),
-                    ('Maria Silva Santos', 'Louvor', '(11) 98888-8888'),
-                    ('João Pereira Oliveira', 'Intercessão', '(11) 97777-7777')
-                    """))
-                    print("✅ Dados de exemplo inseridos")
-                    
-            print("✅ Banco de dados inicializado com sucesso!")
+            atual = versao_schema()
             break
-            
         except Exception as e:
             print(f"❌ Tentativa {attempt + 1} falhou: {e}")
             if attempt < max_retries - 1:
                 time.sleep(retry_delay)
             else:
                 print("❌ Falha ao inicializar banco de dados após várias tentativas")
+                return
+
+    if atual >= VERSAO_SCHEMA:
+        return
+    if not MIGRAR_AO_INICIAR:
+        print(f"⚠️ Banco na versão {atual}, o código espera a {VERSAO_SCHEMA}: rode `flask migrar`")
+        return
+    try:
+        migrar()
+        print("✅ Banco de dados inicializado com sucesso!")
+    except Exception as e:
+        print(f"❌ Falha ao migrar o banco de dados: {e}")
+
+@app.cli.command("migrar")
+def migrar_cli():
+    """Aplica as migrações pendentes do banco."""
+    print(f"✅ Banco na versão {migrar()} (código: {VERSAO_SCHEMA})")
+
+# ------------------ Check-in e presença ------------------
+def evento_atual(conn, congregacao=None):
+    """Id do evento (culto) em andamento na congregação: o mais recente ainda não encerrado.
+
+    Sem `congregacao`, vale a CONGREGACAO_PADRAO (o quiosque em / sem
+    ?congregacao=), nunca o culto de outra congregação.
+    """
+    return conn.execute(
+        text("""
+            SELECT id FROM eventos WHERE congregacao = :c AND encerrado_em IS NULL
+             ORDER BY id DESC LIMIT 1
+        """),
+        {"c": congregacao or CONGREGACAO_PADRAO}
+    ).scalar()
+
+def evento_em(conn, quando, congregacao=None):
+    """Id do evento da congregação aberto em `quando` (check-ins reenviados pelos quiosques)."""
+    return conn.execute(
+        text("""
+            SELECT id FROM eventos
+             WHERE congregacao = :c AND iniciado_em <= :d AND (encerrado_em IS NULL OR encerrado_em >= :d)
+             ORDER BY iniciado_em DESC LIMIT 1
+        """),
+        {"d": quando, "c": congregacao or CONGREGACAO_PADRAO}
+    ).scalar()
+
+def abrir_evento(conn, nome, congregacao=None, quando=None):
+    """Abre um evento (culto) e encerra o anterior da mesma congregação. Retorna o id.
+
+    Zerar a presença para o próximo culto é só isto: as presenças ficam
+    presas ao id do evento, então o evento novo começa vazio sem reescrever
+    nenhuma linha de `membros` ou `presencas`.
+    """
+    congregacao = congregacao or CONGREGACAO_PADRAO
+    quando = quando or datetime.datetime.now()
+    encerrados = conn.execute(
+        text("UPDATE eventos SET encerrado_em = :d WHERE congregacao = :c AND encerrado_em IS NULL RETURNING id"),
+        {"d": quando, "c": congregacao}
+    ).scalars().all()
+    for anterior in encerrados:
+        avisar_encerramento(conn, anterior)
+    evento_id = conn.execute(
+        text("INSERT INTO eventos (nome, congregacao, iniciado_em) VALUES (:n, :c, :d) RETURNING id"),
+        {"n": nome, "c": congregacao, "d": quando}
+    ).scalar()
+    acumular_mes(conn, quando, eventos=1, congregacao=congregacao)
+    return evento_id
+
+def encerrar_evento(conn, evento_id):
+    """Encerra o evento. Retorna False se ele não existe ou já estava encerrado."""
+    encerrado = conn.execute(
+        text("UPDATE eventos SET encerrado_em = :d WHERE id = :id AND encerrado_em IS NULL"),
+        {"d": datetime.datetime.now(), "id": evento_id}
+    ).rowcount > 0
+    if encerrado:
+        avisar_encerramento(conn, evento_id)
+    return encerrado
+
+def eventos_abertos(conn):
+    """Eventos em andamento, um ou mais por congregação."""
+    return conn.execute(text("""
+        SELECT id, nome, congregacao, iniciado_em FROM eventos
+         WHERE encerrado_em IS NULL
+         ORDER BY congregacao, id DESC
+    """)).mappings().all()
+
+def evento_lider(conn):
+    """Evento que o líder está acompanhando no painel.
+
+    É o escolhido em /eventos/<id>/selecionar enquanto estiver aberto; depois
+    que ele é encerrado, passa ao evento aberto da mesma congregação (o culto
+    seguinte) e, sem escolha, ao evento aberto da CONGREGACAO_PADRAO.
+    """
+    escolhido = session.get("evento_id")
+    if escolhido and conn.execute(
+        text("SELECT 1 FROM eventos WHERE id = :id AND encerrado_em IS NULL"), {"id": escolhido}
+    ).first():
+        return escolhido
+    return evento_atual(conn, session.get("congregacao"))
+
+def registrar_checkin(conn, nome, grupo, lat=None, lon=None, quando=None, evento_id=None, origem="self",
+                      id_cliente=None):
+    """Registra o check-in pelo índice nome/grupo normalizado.
+
+    Acrescenta a linha no histórico (`checkins`) e marca a presença no evento
+    (`presencas`); cada passo é um único INSERT ... SELECT. Retorna True se
+    algum obreiro foi encontrado. `id_cliente` identifica o check-in no
+    quiosque e torna o reenvio idempotente.
+    """
+    params = {
+        "n": normalizar_chave(nome),
+        "g": normalizar_chave(grupo),
+        "d": quando or datetime.datetime.now(),
+        "lat": float(lat) if lat not in (None, "") else None,
+        "lon": float(lon) if lon not in (None, "") else None,
+        "e": evento_id or evento_atual(conn),
+        "o": origem,
+        "c": id_cliente,
+    }
+    result = conn.execute(
+        text("""
+            INSERT INTO checkins (membro_id, evento_id, data_checkin, latitude, longitude, origem, presente, id_cliente)
+            SELECT id, :e, :d, :lat, :lon, :o, TRUE, :c
+              FROM membros WHERE nome_busca = :n AND grupo_busca = :g
+            ON CONFLICT (id_cliente, membro_id) DO NOTHING
+        """),
+        params
+    )
+    if result.rowcount == 0:
+        return False
+    novas = conn.execute(
+        text("""
+            INSERT INTO presencas (evento_id, membro_id, data_checkin, latitude, longitude, origem)
+            SELECT :e, id, :d, :lat, :lon, :o
+              FROM membros WHERE nome_busca = :n AND grupo_busca = :g
+            ON CONFLICT (evento_id, membro_id) DO NOTHING
+        """),
+        params
+    ).rowcount
+    if novas:
+        acumular_frequencia(conn, "m.nome_busca = :n AND m.grupo_busca = :g", params, params["d"], presencas=1,
+                            evento_id=params["e"])
+        avisar_presenca(conn, "m.nome_busca = :n AND m.grupo_busca = :g", params, params["e"], True, params["d"])
+    return True
+
+def alterar_presenca(conn, membro_id, presente, evento_id=None, origem="lider", quando=None):
+    """Marca ou desmarca a presença de um obreiro no evento (usado pelo líder)."""
+    params = {
+        "m": membro_id,
+        "e": evento_id or evento_atual(conn),
+        "d": quando or datetime.datetime.now(),
+        "o": origem,
+        "p": presente,
+    }
+    conn.execute(
+        text("""
+            INSERT INTO checkins (membro_id, evento_id, data_checkin, origem, presente)
+            VALUES (:m, :e, :d, :o, :p)
+        """),
+        params
+    )
+    if presente:
+        novas = conn.execute(
+            text("""
+                INSERT INTO presencas (evento_id, membro_id, data_checkin, origem)
+                VALUES (:e, :m, :d, :o)
+                ON CONFLICT (evento_id, membro_id) DO NOTHING
+            """),
+            params
+        ).rowcount
+        if novas:
+            acumular_frequencia(conn, "m.id = :m", params, params["d"], presencas=1, evento_id=params["e"])
+            avisar_presenca(conn, "m.id = :m", params, params["e"], True, params["d"])
+    else:
+        anterior = conn.execute(
+            text("SELECT data_checkin FROM presencas WHERE evento_id = :e AND membro_id = :m"), params
+        ).scalar()
+        if anterior is not None:
+            conn.execute(text("DELETE FROM presencas WHERE evento_id = :e AND membro_id = :m"), params)
+            acumular_frequencia(conn, "m.id = :m", params, anterior, presencas=-1, evento_id=params["e"])
+            avisar_presenca(conn, "m.id = :m", params, params["e"], False)
+
+# Obreiros com a situação de presença no evento :evento (alias m = membros, p = presencas)
+SQL_MEMBROS_PRESENCA = """
+    SELECT m.id, m.nome, m.grupo, m.telefone, m.email, m.nome_busca, m.grupo_busca,
+           CASE WHEN p.membro_id IS NULL THEN FALSE ELSE TRUE END AS presente,
+           p.data_checkin, p.latitude AS checkin_latitude, p.longitude AS checkin_longitude
+      FROM membros m
+      LEFT JOIN presencas p ON p.membro_id = m.id AND p.evento_id = :evento
+"""
+
+# ------------------ Painel ao vivo (avisos de presença) ------------------
+PAINEL_AO_VIVO_INTERVALO_MS = float(os.getenv("PAINEL_AO_VIVO_INTERVALO_MS", "500"))  # leitura da fila de avisos
+PAINEL_AO_VIVO_MAX_CONEXOES = int(os.getenv("PAINEL_AO_VIVO_MAX_CONEXOES", "8"))     # streams por worker
+PAINEL_AO_VIVO_DURACAO_S = float(os.getenv("PAINEL_AO_VIVO_DURACAO_S", "300"))       # o navegador reconecta sozinho
+AVISOS_RETENCAO_MIN = float(os.getenv("AVISOS_RETENCAO_MIN", "10"))
+
+def avisar_presenca(conn, filtro_membros, params, evento_id, presente, quando=None):
+    """Publica a mudança de presença dos obreiros filtrados (mesma transação da escrita).
+
+    `filtro_membros` segue a convenção de acumular_frequencia: condição sobre
+    `membros m` com os parâmetros em `params`.
+    """
+    valores = {**params, "av_e": evento_id, "av_p": presente, "av_d": quando if presente else None,
+               "av_agora": datetime.datetime.now()}
+    sql = f"""
+        INSERT INTO avisos_painel (evento_id, tipo, membro_id, grupo_busca, presente, data_checkin, criado_em)
+        SELECT :av_e, 'presenca', m.id, m.grupo_busca, :av_p, :av_d, :av_agora FROM membros m WHERE {filtro_membros}
+    """
+    conn.execute(_sql(sql, valores), valores)
+
+def avisar_encerramento(conn, evento_id):
+    conn.execute(
+        text("INSERT INTO avisos_painel (evento_id, tipo, criado_em) VALUES (:e, 'evento_encerrado', :d)"),
+        {"e": evento_id, "d": datetime.datetime.now()}
+    )
+
+def _aviso_json(linha):
+    return {
+        "id": linha["id"],
+        "tipo": linha["tipo"],
+        "evento_id": linha["evento_id"],
+        "membro_id": linha["membro_id"],
+        "grupo": linha["grupo_busca"],
+        "presente": None if linha["presente"] is None else bool(linha["presente"]),
+        "data_checkin": _formatar_data(linha["data_checkin"]) or None,
+    }
+
+class CanalPainel:
+    """Entrega os avisos de presença às conexões SSE do painel abertas neste worker.
+
+    Os avisos entram em `avisos_painel` na mesma transação da mudança, então
+    só o que foi confirmado é publicado, venha de qualquer worker do
+    gunicorn. Uma thread por worker lê os avisos novos a cada `intervalo`
+    segundos, só enquanto houver painel conectado, e os distribui às filas
+    dos assinantes do evento: cada aba aberta custa uma conexão parada, não
+    recargas do painel. No PostgreSQL um id menor pode ser confirmado depois
+    de um maior, por isso a leitura repassa uma pequena janela de ids já
+    vistos e descarta os repetidos.
+    """
+
+    JANELA_IDS = 200
+
+    def __init__(self, intervalo, max_conexoes, retencao_min):
+        self.intervalo = intervalo
+        self.max_conexoes = max_conexoes
+        self.retencao_min = retencao_min
+        self._lock = threading.Lock()
+        self._assinantes = {}          # evento_id -> {filas}
+        self._thread = None
+        self._ultimo = None
+        self._entregues = deque(maxlen=self.JANELA_IDS * 5)
+        self._limpo_em = 0.0
+
+    def conexoes(self):
+        with self._lock:
+            return sum(len(filas) for filas in self._assinantes.values())
+
+    def assinar(self, evento_id):
+        """Fila que recebe os avisos do evento, ou None se o worker já está no limite de conexões."""
+        with self._lock:
+            if sum(len(filas) for filas in self._assinantes.values()) >= self.max_conexoes:
+                return None
+            fila = queue.Queue(maxsize=1000)
+            self._assinantes.setdefault(evento_id, set()).add(fila)
+            # Criada no primeiro assinante: threads não sobrevivem ao fork dos workers do gunicorn
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="canal-painel", daemon=True)
+                self._thread.start()
+            return fila
+
+    def cancelar(self, evento_id, fila):
+        with self._lock:
+            filas = self._assinantes.get(evento_id)
+            if filas:
+                filas.discard(fila)
+                if not filas:
+                    del self._assinantes[evento_id]
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                ativo = bool(self._assinantes)
+            if not ativo:
+                # Sem ninguém ouvindo não lê o banco; quem reconectar recupera o atraso pelo Last-Event-ID
+                self._ultimo = None
+                continue
+            try:
+                self._ler()
+            except Exception as e:
+                print(f"⚠️ Falha ao ler avisos do painel: {e}")
+
+    def _ler(self):
+        with engine.begin() as conn:
+            if self._ultimo is None:
+                self._ultimo = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM avisos_painel")).scalar()
+            linhas = conn.execute(
+                text("SELECT * FROM avisos_painel WHERE id > :u ORDER BY id LIMIT 1000"),
+                {"u": self._ultimo - self.JANELA_IDS}
+            ).mappings().all()
+            if time.monotonic() - self._limpo_em > 60:
+                corte = datetime.datetime.now() - datetime.timedelta(minutes=self.retencao_min)
+                conn.execute(text("DELETE FROM avisos_painel WHERE criado_em < :c"), {"c": corte})
+                self._limpo_em = time.monotonic()
+        vistos = set(self._entregues)
+        for linha in linhas:
+            if linha["id"] in vistos:
+                continue
+            self._entregues.append(linha["id"])
+            self._ultimo = max(self._ultimo, linha["id"])
+            aviso = _aviso_json(linha)
+            with self._lock:
+                filas = list(self._assinantes.get(aviso["evento_id"], ()))
+            for fila in filas:
+                try:
+                    fila.put_nowait(aviso)
+                except queue.Full:
+                    pass  # aba parada (sem ler): perde o aviso e se acerta ao recarregar
+
+canal_painel = CanalPainel(PAINEL_AO_VIVO_INTERVALO_MS / 1000, PAINEL_AO_VIVO_MAX_CONEXOES, AVISOS_RETENCAO_MIN)
+
+# ------------------ Frequência: agregados incrementais ------------------
+def _sql_data(coluna, formato):
+    """Expressão SQL que formata `coluna` como texto AAAA-MM-DD ou AAAA-MM no banco atual."""
+    if IS_SQLITE:
+        return f"strftime('{'%Y-%m-%d' if formato == 'dia' else '%Y-%m'}', {coluna})"
+    return f"to_char({coluna}, '{'YYYY-MM-DD' if formato == 'dia' else 'YYYY-MM'}')"
+
+def acumular_frequencia(conn, filtro_membros, params, quando, presencas=0, presencas_ata=0, evento_id=None):
+    """Soma presenças nos agregados por obreiro/mês e grupo/dia.
+
+    `filtro_membros` é uma condição sobre `membros m` (com seus parâmetros em
+    `params`) que seleciona os obreiros afetados; `quando` pode ser date,
+    datetime ou texto ISO. Valores negativos desfazem uma presença. Presenças
+    em eventos informam `evento_id` e contam na congregação do evento; as de
+    atas ficam em congregacao = ''.
+    """
+    dia = str(quando)[:10]
+    valores = {**params, "dia": dia, "mes": dia[:7], "dp": presencas, "da": presencas_ata, "ev_freq": evento_id}
+    congregacao = "COALESCE((SELECT congregacao FROM eventos WHERE id = :ev_freq), '')"
+    sql = f"""
+        INSERT INTO freq_membro_mes (mes, congregacao, membro_id, presencas, presencas_ata)
+        SELECT :mes, {congregacao}, m.id, :dp, :da FROM membros m WHERE {filtro_membros}
+        ON CONFLICT (mes, congregacao, membro_id) DO UPDATE
+           SET presencas = freq_membro_mes.presencas + excluded.presencas,
+               presencas_ata = freq_membro_mes.presencas_ata + excluded.presencas_ata
+    """
+    conn.execute(_sql(sql, valores), valores)
+    sql = f"""
+        INSERT INTO freq_grupo_dia (dia, congregacao, grupo_busca, grupo, presencas, presencas_ata)
+        SELECT :dia, {congregacao}, m.grupo_busca, MAX(m.grupo), COUNT(*) * :dp, COUNT(*) * :da
+          FROM membros m WHERE {filtro_membros}
+         GROUP BY m.grupo_busca
+        ON CONFLICT (dia, congregacao, grupo_busca) DO UPDATE
+           SET presencas = freq_grupo_dia.presencas + excluded.presencas,
+               presencas_ata = freq_grupo_dia.presencas_ata + excluded.presencas_ata
+    """
+    conn.execute(_sql(sql, valores), valores)
+
+def acumular_mes(conn, quando, eventos=0, atas=0, congregacao=""):
+    """Conta eventos (da congregação) e atas do mês: denominadores das taxas de frequência."""
+    conn.execute(
+        text("""
+            INSERT INTO freq_mes (mes, congregacao, eventos, atas) VALUES (:mes, :c, :e, :a)
+            ON CONFLICT (mes, congregacao) DO UPDATE
+               SET eventos = freq_mes.eventos + excluded.eventos, atas = freq_mes.atas + excluded.atas
+        """),
+        {"mes": str(quando)[:7], "c": congregacao, "e": eventos, "a": atas}
+    )
+
+def descontar_frequencia_membro(conn, membro_id):
+    """Retira dos agregados as presenças de um obreiro (antes de removê-lo do cadastro)."""
+    params = {"m": membro_id}
+    # Por dia e evento (a congregação vem do evento)
+    por_dia = {}
+    for data_checkin, evento_id in conn.execute(
+        text("SELECT data_checkin, evento_id FROM presencas WHERE membro_id = :m"), params
+    ):
+        chave = (str(data_checkin)[:10], evento_id)
+        por_dia[chave] = por_dia.get(chave, 0) + 1
+    for (dia, evento_id), quantidade in por_dia.items():
+        acumular_frequencia(conn, "m.id = :m", params, dia, presencas=-quantidade, evento_id=evento_id)
+    por_dia_ata = {}
+    for (data_reuniao,) in conn.execute(
+        text("SELECT a.data_reuniao FROM ata_presentes ap JOIN atas a ON a.id = ap.ata_id WHERE ap.membro_id = :m"),
+        params
+    ):
+        dia = str(data_reuniao)[:10]
+        por_dia_ata[dia] = por_dia_ata.get(dia, 0) + 1
+    for dia, quantidade in por_dia_ata.items():
+        acumular_frequencia(conn, "m.id = :m", params, dia, presencas_ata=-quantidade)
+    conn.execute(text("DELETE FROM freq_membro_mes WHERE membro_id = :m"), params)
+
+def reconstruir_frequencia(conn):
+    """Recalcula todos os agregados de frequência a partir de presencas, eventos e atas."""
+    for tabela in ("freq_membro_mes", "freq_grupo_dia", "freq_mes"):
+        conn.execute(text(f"DELETE FROM {tabela}"))
+
+    mes_presenca = _sql_data("p.data_checkin", "mes")
+    dia_presenca = _sql_data("p.data_checkin", "dia")
+    congregacao = "COALESCE(e.congregacao, '')"
+    conn.execute(text(f"""
+        INSERT INTO freq_membro_mes (mes, congregacao, membro_id, presencas, presencas_ata)
+        SELECT {mes_presenca}, {congregacao}, p.membro_id, COUNT(*), 0
+          FROM presencas p
+          JOIN membros m ON m.id = p.membro_id
+          LEFT JOIN eventos e ON e.id = p.evento_id
+         GROUP BY {mes_presenca}, {congregacao}, p.membro_id
+    """))
+    conn.execute(text(f"""
+        INSERT INTO freq_grupo_dia (dia, congregacao, grupo_busca, grupo, presencas, presencas_ata)
+        SELECT {dia_presenca}, {congregacao}, m.grupo_busca, MAX(m.grupo), COUNT(*), 0
+          FROM presencas p
+          JOIN membros m ON m.id = p.membro_id
+          LEFT JOIN eventos e ON e.id = p.evento_id
+         GROUP BY {dia_presenca}, {congregacao}, m.grupo_busca
+    """))
+    mes_evento = _sql_data("e.iniciado_em", "mes")
+    conn.execute(text(f"""
+        INSERT INTO freq_mes (mes, congregacao, eventos, atas)
+        SELECT {mes_evento}, {congregacao}, COUNT(*), 0 FROM eventos e GROUP BY {mes_evento}, {congregacao}
+    """))
+
+    # Presenças em atas
+    mes_ata = _sql_data("a.data_reuniao", "mes")
+    dia_ata = _sql_data("a.data_reuniao", "dia")
+    conn.execute(text(f"""
+        INSERT INTO freq_membro_mes (mes, congregacao, membro_id, presencas, presencas_ata)
+        SELECT {mes_ata}, '', ap.membro_id, 0, COUNT(*)
+          FROM ata_presentes ap
+          JOIN atas a ON a.id = ap.ata_id
+          JOIN membros m ON m.id = ap.membro_id
+         WHERE a.data_reuniao IS NOT NULL
+         GROUP BY {mes_ata}, ap.membro_id
+        ON CONFLICT (mes, congregacao, membro_id) DO UPDATE SET presencas_ata = excluded.presencas_ata
+    """))
+    conn.execute(text(f"""
+        INSERT INTO freq_grupo_dia (dia, congregacao, grupo_busca, grupo, presencas, presencas_ata)
+        SELECT {dia_ata}, '', m.grupo_busca, MAX(m.grupo), 0, COUNT(*)
+          FROM ata_presentes ap
+          JOIN atas a ON a.id = ap.ata_id
+          JOIN membros m ON m.id = ap.membro_id
+         WHERE a.data_reuniao IS NOT NULL
+         GROUP BY {dia_ata}, m.grupo_busca
+        ON CONFLICT (dia, congregacao, grupo_busca) DO UPDATE SET presencas_ata = excluded.presencas_ata
+    """))
+    conn.execute(text(f"""
+        INSERT INTO freq_mes (mes, congregacao, eventos, atas)
+        SELECT {mes_ata}, '', 0, COUNT(*) FROM atas a
+         WHERE a.data_reuniao IS NOT NULL
+         GROUP BY {mes_ata}
+        ON CONFLICT (mes, congregacao) DO UPDATE SET atas = excluded.atas
+    """))
+
+# ------------------ Busca de texto nas atas ------------------
+# O texto é normalizado (sem acentos, minúsculo) antes de indexar e de buscar,
+# então "intercessao" acha "Intercessão" nos dois bancos.
+BUSCA_ATAS_IDIOMA = os.getenv("BUSCA_ATAS_IDIOMA", "portuguese")  # configuração de texto do PostgreSQL
+ATAS_POR_PAGINA = int(os.getenv("ATAS_POR_PAGINA", "20"))
+
+def indexar_atas(conn, ids):
+    """Refaz a entrada das atas `ids` no índice de texto (na mesma transação da escrita)."""
+    ids = list(ids)
+    for inicio in range(0, len(ids), 500):
+        lote = {"ids": ids[inicio:inicio + 500]}
+        atas = conn.execute(
+            _sql("SELECT id, tema, observacoes, local, departamento FROM atas WHERE id IN :ids", lote), lote
+        ).mappings().all()
+        nomes = {}
+        for ata_id, nome in conn.execute(
+            _sql("SELECT ata_id, nome FROM ata_presentes WHERE ata_id IN :ids", lote), lote
+        ):
+            nomes.setdefault(ata_id, []).append(nome or "")
+        linhas = [
+            {"id": a["id"], "tema": normalizar_chave(a["tema"]), "observacoes": normalizar_chave(a["observacoes"]),
+             "local": normalizar_chave(a["local"]), "departamento": normalizar_chave(a["departamento"]),
+             "presentes": normalizar_chave(" ".join(nomes.get(a["id"], [])))}
+            for a in atas
+        ]
+        if IS_SQLITE:
+            conn.execute(_sql("DELETE FROM atas_busca WHERE rowid IN :ids", lote), lote)
+            sql = """
+                INSERT INTO atas_busca (rowid, tema, observacoes, local, departamento, presentes)
+                VALUES (:id, :tema, :observacoes, :local, :departamento, :presentes)
+            """
+        else:
+            conn.execute(_sql("DELETE FROM atas_busca WHERE ata_id IN :ids", lote), lote)
+            # Pesos: tema (A) > departamento e local (B) > observações (C) > presentes (D)
+            sql = f"""
+                INSERT INTO atas_busca (ata_id, documento)
+                VALUES (:id,
+                        setweight(to_tsvector('{BUSCA_ATAS_IDIOMA}', :tema), 'A') ||
+                        setweight(to_tsvector('{BUSCA_ATAS_IDIOMA}', :departamento || ' ' || :local), 'B') ||
+                        setweight(to_tsvector('{BUSCA_ATAS_IDIOMA}', :observacoes), 'C') ||
+                        setweight(to_tsvector('{BUSCA_ATAS_IDIOMA}', :presentes), 'D'))
+            """
+        if linhas:
+            conn.execute(text(sql), linhas)
+
+def buscar_atas(conn, termo, filtros, params, pagina=1, por_pagina=ATAS_POR_PAGINA):
+    """Uma página de atas (alias a), em ordem de relevância se houver termo, senão por data.
+
+    `filtros`/`params` são condições extras sobre `atas a`. Cada palavra do
+    termo precisa aparecer (como prefixo) em tema, observações, local,
+    departamento ou nome de presente. Retorna (atas, tem_proxima_pagina).
+    """
+    params = {**params, "lim": por_pagina + 1, "off": (max(pagina, 1) - 1) * por_pagina}
+    filtros = list(filtros)
+    palavras = re.findall(r"\w+", normalizar_chave(termo))
+    if not palavras:
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        sql = f"SELECT a.* FROM atas a {where} ORDER BY a.data_reuniao DESC, a.id DESC LIMIT :lim OFFSET :off"
+    elif IS_SQLITE:
+        params["q"] = " ".join(f'"{p}"*' for p in palavras)
+        filtros.insert(0, "atas_busca MATCH :q")
+        sql = f"""
+            SELECT a.* FROM atas_busca JOIN atas a ON a.id = atas_busca.rowid
+             WHERE {' AND '.join(filtros)}
+             ORDER BY bm25(atas_busca, 4.0, 1.0, 2.0, 2.0, 0.5), a.data_reuniao DESC
+             LIMIT :lim OFFSET :off
+        """
+    else:
+        params["q"] = " & ".join(f"{p}:*" for p in palavras)
+        filtros.insert(0, f"b.documento @@ to_tsquery('{BUSCA_ATAS_IDIOMA}', :q)")
+        sql = f"""
+            SELECT a.* FROM atas_busca b JOIN atas a ON a.id = b.ata_id
+             WHERE {' AND '.join(filtros)}
+             ORDER BY ts_rank(b.documento, to_tsquery('{BUSCA_ATAS_IDIOMA}', :q)) DESC, a.data_reuniao DESC
+             LIMIT :lim OFFSET :off
+        """
+    atas = conn.execute(_sql(sql, params), params).mappings().all()
+    return atas[:por_pagina], len(atas) > por_pagina
+
+# ------------------ Busca aproximada de nomes ------------------
+BUSCA_NOMES_MINIMO = float(os.getenv("BUSCA_NOMES_MINIMO", "0.6"))    # nota mínima (0 a 1) de uma sugestão
+BUSCA_NOMES_PALAVRA_MINIMO = float(os.getenv("BUSCA_NOMES_PALAVRA_MINIMO", "0.4"))  # semelhança entre palavras
+BUSCA_NOMES_SUGESTOES = int(os.getenv("BUSCA_NOMES_SUGESTOES", "5"))
+BUSCA_NOMES_CANDIDATOS_MAX = int(os.getenv("BUSCA_NOMES_CANDIDATOS_MAX", "500"))  # obreiros pontuados por busca
+
+def _trigramas(palavra):
+    """Trigramas de uma palavra normalizada, com as bordas marcadas (como o pg_trgm)."""
+    texto = f"  {palavra} "
+    return frozenset(sys.intern(texto[i:i + 3]) for i in range(len(texto) - 2))
+
+class IndiceNomes:
+    """Índice de palavras dos nomes, para achar "Joao Perera" em "João Pereira Oliveira".
+
+    Dois níveis: cada palavra do cadastro aponta para os obreiros que a têm, e
+    o vocabulário (algumas milhares de palavras, mesmo com dezenas de
+    milhares de obreiros) tem um índice de trigramas. Uma busca acha as
+    palavras parecidas com cada palavra digitada no vocabulário e cruza os
+    conjuntos de obreiros por interseção; só os que sobram são pontuados.
+    Inserir ou remover um obreiro mexe apenas nas palavras dele.
+    """
+
+    def __init__(self):
+        self._por_palavra = {}    # palavra -> {ids}
+        self._palavras = {}       # id -> palavras do nome
+        self._grupos = {}         # id -> grupo_busca
+        self._por_grupo = {}      # grupo_busca -> {ids}
+        self._por_trigrama = {}   # trigrama -> {palavras do vocabulário}
+        self._vocabulario = []    # palavras em ordem alfabética (busca por prefixo)
+
+    def __len__(self):
+        return len(self._palavras)
+
+    def adicionar(self, membro_id, nome_busca, grupo_busca):
+        self.remover(membro_id)
+        palavras = tuple(dict.fromkeys(nome_busca.split()))
+        self._palavras[membro_id] = palavras
+        self._grupos[membro_id] = grupo_busca
+        self._por_grupo.setdefault(grupo_busca, set()).add(membro_id)
+        for palavra in palavras:
+            ids = self._por_palavra.get(palavra)
+            if ids is None:
+                ids = self._por_palavra[palavra] = set()
+                for t in _trigramas(palavra):
+                    self._por_trigrama.setdefault(t, set()).add(palavra)
+                bisect.insort(self._vocabulario, palavra)
+            ids.add(membro_id)
+
+    def remover(self, membro_id):
+        palavras = self._palavras.pop(membro_id, None)
+        if palavras is None:
+            return
+        grupo = self._grupos.pop(membro_id)
+        self._por_grupo[grupo].discard(membro_id)
+        if not self._por_grupo[grupo]:
+            del self._por_grupo[grupo]
+        for palavra in palavras:
+            ids = self._por_palavra[palavra]
+            ids.discard(membro_id)
+            if ids:
+                continue
+            # Última ocorrência: a palavra sai do vocabulário
+            del self._por_palavra[palavra]
+            for t in _trigramas(palavra):
+                parecidas = self._por_trigrama[t]
+                parecidas.discard(palavra)
+                if not parecidas:
+                    del self._por_trigrama[t]
+            del self._vocabulario[bisect.bisect_left(self._vocabulario, palavra)]
+
+    def limpar(self):
+        self._por_palavra.clear()
+        self._palavras.clear()
+        self._grupos.clear()
+        self._por_grupo.clear()
+        self._por_trigrama.clear()
+        self._vocabulario.clear()
+
+    def _palavras_parecidas(self, palavra):
+        """Palavras do vocabulário parecidas com `palavra` -> semelhança (0 a 1)."""
+        alvo = _trigramas(palavra)
+        comuns = {}
+        for t in alvo:
+            for outra in self._por_trigrama.get(t, ()):
+                comuns[outra] = comuns.get(outra, 0) + 1
+        parecidas = {}
+        for outra, n in comuns.items():
+            # Coeficiente de Dice; len(outra) + 2 é o número de trigramas da palavra
+            nota = 2 * n / (len(alvo) + len(outra) + 2)
+            if nota >= BUSCA_NOMES_PALAVRA_MINIMO:
+                parecidas[outra] = nota
+        if len(palavra) >= 3:
+            # Palavra digitada pela metade ("Fern" -> "Fernandes")
+            i = bisect.bisect_left(self._vocabulario, palavra)
+            while i < len(self._vocabulario) and self._vocabulario[i].startswith(palavra):
+                outra = self._vocabulario[i]
+                parecidas[outra] = max(parecidas.get(outra, 0.0), 1.0 if outra == palavra else 0.9)
+                i += 1
+        return parecidas
+
+    def _obreiros_com(self, parecidas):
+        """Obreiros que têm alguma das palavras, das mais às menos parecidas.
+
+        Para de juntar palavras menos parecidas quando já há candidatos
+        demais: uma palavra digitada errada não arrasta metade do cadastro.
+        """
+        conjuntos, total, anterior = [], 0, None
+        for palavra, nota in sorted(parecidas.items(), key=lambda p: -p[1]):
+            if total >= BUSCA_NOMES_CANDIDATOS_MAX and nota < anterior:
+                break
+            conjuntos.append(self._por_palavra[palavra])
+            total += len(conjuntos[-1])
+            anterior = nota
+        # Uma palavra só (o caso comum): o próprio conjunto do índice, sem cópia (não alterar!)
+        return conjuntos[0] if len(conjuntos) == 1 else set().union(*conjuntos)
+
+    def buscar(self, nome, grupo="", limite=BUSCA_NOMES_SUGESTOES, minimo=BUSCA_NOMES_MINIMO):
+        """Lista de (nota, id) em ordem decrescente de nota (0 a 1).
+
+        A nota é a média da semelhança de cada palavra digitada com a melhor
+        palavra do nome, com um peso pequeno para nomes sem palavras sobrando;
+        o grupo igual ao informado desempata homônimos.
+        """
+        palavras = list(dict.fromkeys(normalizar_chave(nome).split()))
+        if not palavras:
+            return []
+        parecidas = [self._palavras_parecidas(p) for p in palavras]
+        conjuntos = sorted((self._obreiros_com(d) for d in parecidas), key=len)
+        candidatos = conjuntos[0].intersection(*conjuntos[1:])
+        if not candidatos and len(conjuntos) > 1:
+            # Uma palavra sem correspondência (apelido, sobrenome trocado): aceita que falte uma
+            for i in range(len(conjuntos)):
+                restantes = conjuntos[:i] + conjuntos[i + 1:]
+                parcial = restantes[0].intersection(*restantes[1:])
+                if len(parcial) <= BUSCA_NOMES_CANDIDATOS_MAX:
+                    candidatos |= parcial
+
+        grupo = normalizar_chave(grupo)
+        if len(candidatos) > BUSCA_NOMES_CANDIDATOS_MAX:
+            # Busca vaga ("Silva"): fica com os do grupo informado e corta o excedente
+            if grupo and candidatos & self._por_grupo.get(grupo, set()):
+                candidatos &= self._por_grupo[grupo]
+            candidatos = set(itertools.islice(candidatos, BUSCA_NOMES_CANDIDATOS_MAX))
+        achados = []
+        for membro_id in candidatos:
+            do_nome = self._palavras[membro_id]
+            soma = sum(max(d.get(w, 0.0) for w in do_nome) for d in parecidas)
+            nota = 0.85 * soma / len(palavras) + 0.15 * min(1.0, len(palavras) / len(do_nome))
+            if grupo:
+                nota = nota * 0.9 + (0.1 if self._grupos[membro_id] == grupo else 0.0)
+            if nota >= minimo:
+                achados.append((round(nota, 3), membro_id))
+        return heapq.nlargest(limite, achados)
+
+# ------------------ Cache do cadastro de obreiros ------------------
+ROSTER_CACHE_MAX = int(os.getenv("ROSTER_CACHE_MAX", "20000"))
+ROSTER_CACHE_TTL = float(os.getenv("ROSTER_CACHE_TTL", "2"))  # segundos entre checagens de versão
+
+def publicar_alteracao_roster(conn):
+    """Incrementa a versão do cadastro na mesma transação da escrita e devolve a nova versão."""
+    conn.execute(text("UPDATE roster_versao SET versao = versao + 1 WHERE id = 1"))
+    return conn.execute(text("SELECT versao FROM roster_versao WHERE id = 1")).scalar()
+
+class CacheRoster:
+    """Cache em memória dos obreiros (id, nome, grupo, telefone).
+
+    Indexado por id, pelo par nome/grupo normalizado e por trigramas do nome
+    (busca aproximada), carregado sob demanda e limitado a `max_itens` (LRU).
+    A versão em `roster_versao` é consultada no máximo a cada `ttl` segundos
+    para detectar alterações feitas por outros workers do gunicorn.
+    """
+
+    def __init__(self, max_itens=ROSTER_CACHE_MAX, ttl=ROSTER_CACHE_TTL):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._por_id = OrderedDict()   # id -> membro (ordem = uso recente)
+        self._por_chave = {}           # (nome_busca, grupo_busca) -> {ids}
+        self._indice = IndiceNomes()   # trigramas do nome -> ids
+        self._versao = None
+        self._verificado_em = 0.0
+        self._carregado = False
+        self.completo = False          # True quando todo o cadastro cabe no cache
+
+    # --- manutenção interna ---
+    def _guardar(self, membro):
+        self._por_id[membro["id"]] = membro
+        self._por_id.move_to_end(membro["id"])
+        self._por_chave.setdefault((membro["nome_busca"], membro["grupo_busca"]), set()).add(membro["id"])
+        self._indice.adicionar(membro["id"], membro["nome_busca"], membro["grupo_busca"])
+        while len(self._por_id) > self.max_itens:
+            _, antigo = self._por_id.popitem(last=False)
+            self._descartar_chave(antigo)
+            self.completo = False
+
+    def _descartar_chave(self, membro):
+        self._indice.remover(membro["id"])
+        chave = (membro["nome_busca"], membro["grupo_busca"])
+        ids = self._por_chave.get(chave)
+        if ids:
+            ids.discard(membro["id"])
+            if not ids:
+                del self._por_chave[chave]
+
+    def _carregar(self):
+        with engine.connect() as conn:
+            versao = conn.execute(text("SELECT versao FROM roster_versao WHERE id = 1")).scalar()
+            linhas = conn.execute(
+                text("SELECT id, nome, grupo, telefone, nome_busca, grupo_busca FROM membros ORDER BY id LIMIT :lim"),
+                {"lim": self.max_itens + 1}
+            ).mappings().all()
+        self._por_id.clear()
+        self._por_chave.clear()
+        self._indice.limpar()
+        self.completo = len(linhas) <= self.max_itens
+        for linha in linhas[:self.max_itens]:
+            self._guardar(dict(linha))
+        self._versao = versao
+        self._verificado_em = time.monotonic()
+        self._carregado = True
+
+    def _garantir_atual(self):
+        if not self._carregado:
+            self._carregar()
+            return
+        if time.monotonic() - self._verificado_em < self.ttl:
+            return
+        with engine.connect() as conn:
+            versao = conn.execute(text("SELECT versao FROM roster_versao WHERE id = 1")).scalar()
+        if versao != self._versao:
+            self._carregar()
+        else:
+            self._verificado_em = time.monotonic()
+
+    # --- consultas ---
+    def buscar(self, nome, grupo):
+        """Obreiros com o nome/grupo informados.
+
+        Retorna [] quando o cache está completo e o nome não existe (dispensa o
+        banco) e None quando o cache não sabe responder.
+        """
+        chave = (normalizar_chave(nome), normalizar_chave(grupo))
+        with self._lock:
+            self._garantir_atual()
+            ids = self._por_chave.get(chave)
+            if ids:
+                for membro_id in ids:
+                    self._por_id.move_to_end(membro_id)
+                return [self._por_id[i] for i in ids]
+            return [] if self.completo else None
+
+    def sugerir(self, nome, grupo="", limite=BUSCA_NOMES_SUGESTOES):
+        """Obreiros com nome parecido, do mais ao menos provável, com a nota em "semelhanca".
+
+        Com o cadastro maior que o cache, só os obreiros em memória entram.
+        """
+        with self._lock:
+            self._garantir_atual()
+            return [
+                {**self._por_id[membro_id], "semelhanca": nota}
+                for nota, membro_id in self._indice.buscar(nome, grupo, limite)
+            ]
+
+    def obter_varios(self, ids):
+        """Dicionário id -> obreiro; busca no banco (uma consulta) só o que faltar."""
+        ids = {int(i) for i in ids}
+        with self._lock:
+            self._garantir_atual()
+            achados = {i: self._por_id[i] for i in ids if i in self._por_id}
+            faltando = ids - achados.keys()
+            if faltando and not self.completo:
+                with engine.connect() as conn:
+                    linhas = conn.execute(
+                        text("SELECT id, nome, grupo, telefone, nome_busca, grupo_busca FROM membros WHERE id IN :ids")
+                        .bindparams(bindparam("ids", expanding=True)),
+                        {"ids": list(faltando)}
+                    ).mappings().all()
+                for linha in linhas:
+                    membro = dict(linha)
+                    self._guardar(membro)
+                    achados[membro["id"]] = membro
+            return achados
+
+    # --- escrita (write-through) ---
+    def _aplicar(self, versao, alteracao):
+        with self._lock:
+            if not self._carregado:
+                return
+            if self._versao is not None and versao == self._versao + 1:
+                alteracao()
+                self._versao = versao
+            else:
+                # Outro worker alterou o cadastro no meio tempo: recarregar na próxima consulta
+                self._carregado = False
+
+    def adicionar(self, versao, membro):
+        self._aplicar(versao, lambda: self._guardar(dict(membro)))
+
+    def remover(self, versao, membro_id):
+        def _remover():
+            membro = self._por_id.pop(membro_id, None)
+            if membro:
+                self._descartar_chave(membro)
+        self._aplicar(versao, _remover)
+
+    def invalidar(self):
+        with self._lock:
+            self._carregado = False
+
+roster = CacheRoster()
+
+# ------------------ Snapshot do painel de liderança ------------------
+PAINEL_SNAPSHOT_TTL = float(os.getenv("PAINEL_SNAPSHOT_TTL", "3"))  # segundos
+
+class SnapshotPainel:
+    """Contadores do painel (totais e por grupo) e atas abertas, por evento.
+
+    Os contadores saem de uma única agregação sobre `membros` e o resultado é
+    reaproveitado por `ttl` segundos, então atualizações seguidas do painel não
+    voltam a varrer a tabela. Cada evento (congregação) tem o seu snapshot.
+    `ultimo_aviso` é o último aviso do painel ao vivo já refletido nos
+    contadores: o stream repete tudo depois dele.
+    """
+
+    def __init__(self, ttl=PAINEL_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._dados = {}
+
+    def _calcular(self, evento_id):
+        with engine.connect() as conn:
+            # O último aviso sai na mesma instrução da agregação (mesma visão do banco)
+            grupos = conn.execute(text("""
+                SELECT MAX(m.grupo) AS grupo,
+                       m.grupo_busca,
+                       COUNT(*) AS total,
+                       COUNT(p.membro_id) AS presentes,
+                       (SELECT COALESCE(MAX(id), 0) FROM avisos_painel) AS ultimo_aviso
+                  FROM membros m
+                  LEFT JOIN presencas p ON p.membro_id = m.id AND p.evento_id = :evento
+                 GROUP BY m.grupo_busca
+                 ORDER BY m.grupo_busca
+            """), {"evento": evento_id}).mappings().all()
+            if grupos:
+                ultimo_aviso = grupos[0]["ultimo_aviso"]
+            else:
+                ultimo_aviso = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM avisos_painel")).scalar()
+            atas = conn.execute(
+                text("SELECT * FROM atas WHERE arquivada = FALSE ORDER BY data_reuniao DESC")
+            ).mappings().all()
+
+        por_grupo = [
+            {"grupo": g["grupo"] or "Sem grupo", "grupo_busca": g["grupo_busca"], "total": g["total"],
+             "presentes": g["presentes"] or 0, "ausentes": g["total"] - (g["presentes"] or 0)}
+            for g in grupos
+        ]
+        total_membros = sum(g["total"] for g in por_grupo)
+        total_presentes = sum(g["presentes"] for g in por_grupo)
+        return {
+            "total_membros": total_membros,
+            "total_presentes": total_presentes,
+            "total_ausentes": total_membros - total_presentes,
+            "por_grupo": por_grupo,
+            "atas": atas,
+            "ultimo_aviso": ultimo_aviso,
+        }
+
+    def obter(self, evento_id=None):
+        with self._lock:
+            dados, gerado_em = self._dados.get(evento_id, (None, 0.0))
+            if dados is None or time.monotonic() - gerado_em >= self.ttl:
+                dados = self._calcular(evento_id)
+                # Eventos encerrados deixam de ser consultados: descarta snapshots vencidos
+                agora = time.monotonic()
+                self._dados = {e: v for e, v in self._dados.items() if agora - v[1] < self.ttl}
+                self._dados[evento_id] = (dados, agora)
+            return dados
+
+    def invalidar(self):
+        with self._lock:
+            self._dados = {}
+
+painel_snapshot = SnapshotPainel()
+
+# ------------------ Listagem paginada de obreiros ------------------
+PAINEL_LIMITE_COMPLETO = int(os.getenv("PAINEL_LIMITE_COMPLETO", "300"))  # até aqui renderiza tudo
+PAGINA_MEMBROS = int(os.getenv("PAGINA_MEMBROS", "100"))
+SEM_GRUPO = "__sem__"  # valor do filtro de grupo para obreiros sem grupo
+
+def _filtros_membros(params, prefixo="", grupo="", status=""):
+    """Cláusulas WHERE (e parâmetros em `params`) dos filtros de obreiros por nome, grupo e presença.
+
+    As cláusulas usam os aliases de SQL_MEMBROS_PRESENCA.
+    """
+    filtros = []
+    if prefixo:
+        params["pi"] = normalizar_chave(prefixo)
+        params["pf"] = params["pi"] + "\uffff"
+        filtros.append("m.nome_busca >= :pi AND m.nome_busca < :pf")
+    if grupo == SEM_GRUPO:
+        filtros.append("COALESCE(m.grupo_busca, '') = ''")
+    elif grupo:
+        params["g"] = normalizar_chave(grupo)
+        filtros.append("m.grupo_busca = :g")
+    if status == "presente":
+        filtros.append("p.membro_id IS NOT NULL")
+    elif status == "ausente":
+        filtros.append("p.membro_id IS NULL")
+    return filtros
+
+def listar_membros(conn, prefixo="", grupo="", status="", apos=None, limite=PAGINA_MEMBROS, evento_id=None):
+    """Uma página de obreiros em ordem de nome, paginada por chave (nome_busca, id).
+
+    `apos` é o cursor devolvido pela página anterior. Retorna (membros, proximo_cursor).
+    """
+    params = {"lim": limite + 1, "evento": evento_id or evento_atual(conn)}
+    filtros = _filtros_membros(params, prefixo, grupo, status)
+    if apos:
+        apos_id, _, apos_nome = apos.partition(":")
+        params["an"], params["aid"] = apos_nome, int(apos_id)
+        filtros.append("(m.nome_busca > :an OR (m.nome_busca = :an AND m.id > :aid))")
+
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    linhas = conn.execute(
+        text(f"{SQL_MEMBROS_PRESENCA} {where} ORDER BY m.nome_busca, m.id LIMIT :lim"), params
+    ).mappings().all()
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = f"{linhas[-1]['id']}:{linhas[-1]['nome_busca']}"
+    return linhas, proximo
+
+def _membro_json(membro):
+    # Mesmo formato das linhas renderizadas no servidor (no SQLite a data chega como texto ISO)
+    data_checkin = _formatar_data(membro["data_checkin"]) if membro["data_checkin"] else None
+    return {
+        "id": membro["id"],
+        "nome": membro["nome"],
+        "grupo": membro["grupo"],
+        "telefone": membro["telefone"],
+        "email": membro["email"],
+        "presente": bool(membro["presente"]),
+        "data_checkin": data_checkin,
+    }
+
+# ------------------ Tarefas em segundo plano ------------------
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "checkin_jobs"))
+JOBS_RETENCAO_HORAS = float(os.getenv("JOBS_RETENCAO_HORAS", "24"))
+
+_jobs_executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix="job")
+
+def enfileirar_job(tipo, funcao, *args):
+    """Registra a tarefa na tabela `jobs` e a executa no pool local. Retorna o id.
+
+    `funcao` devolve um dict serializável em JSON; a chave opcional "arquivo"
+    com (bytes, nome, mimetype) vira um arquivo para download em JOBS_DIR.
+    """
+    job_id = uuid.uuid4().hex
+    with engine.begin() as conn:
+        _limpar_jobs_antigos(conn)
+        conn.execute(
+            text("INSERT INTO jobs (id, tipo, status, criado) VALUES (:id, :t, 'pendente', :c)"),
+            {"id": job_id, "t": tipo, "c": datetime.datetime.now()}
+        )
+    _jobs_executor.submit(_executar_job, job_id, funcao, args)
+    return job_id
+
+def _executar_job(job_id, funcao, args):
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE jobs SET status = 'executando', iniciado = :d WHERE id = :id"),
+            {"id": job_id, "d": datetime.datetime.now()}
+        )
+    try:
+        saida = dict(funcao(*args) or {})
+        caminho = nome_arquivo = mimetype = None
+        if saida.get("arquivo"):
+            dados, nome_arquivo, mimetype = saida.pop("arquivo")
+            os.makedirs(JOBS_DIR, exist_ok=True)
+            caminho = os.path.join(JOBS_DIR, job_id)
+            with open(caminho, "wb") as f:
+                f.write(dados)
+        with engine.begin() as conn:
+            conn.execute(
+                text("""
+                    UPDATE jobs SET status = 'concluido', resultado = :r, arquivo = :a,
+                                    nome_arquivo = :n, mimetype = :m, concluido = :d
+                     WHERE id = :id
+                """),
+                {"id": job_id, "r": json.dumps(saida, ensure_ascii=False, default=str),
+                 "a": caminho, "n": nome_arquivo, "m": mimetype, "d": datetime.datetime.now()}
+            )
+    except Exception as e:
+        print(f"❌ Tarefa {job_id} falhou: {e}")
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE jobs SET status = 'erro', erro = :e, concluido = :d WHERE id = :id"),
+                {"id": job_id, "e": str(e), "d": datetime.datetime.now()}
+            )
+
+def _limpar_jobs_antigos(conn):
+    limite = datetime.datetime.now() - datetime.timedelta(hours=JOBS_RETENCAO_HORAS)
+    antigos = conn.execute(
+        text("SELECT id, arquivo FROM jobs WHERE criado < :l AND status IN ('concluido', 'erro')"),
+        {"l": limite}
+    ).fetchall()
+    for job in antigos:
+        if job.arquivo and os.path.exists(job.arquivo):
+            os.remove(job.arquivo)
+    if antigos:
+        conn.execute(
+            text("DELETE FROM jobs WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": [j.id for j in antigos]}
+        )
+
+def _resposta_job(job_id):
+    """Resposta 202 padrão das rotas que delegam trabalho pesado para a fila."""
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("status_job", job_id=job_id),
+        "download_url": url_for("download_job", job_id=job_id),
+    }), 202
+
+# ------------------ Geocercas (local do culto) ------------------
+# GEOCERCAS (ou o arquivo em GEOCERCAS_ARQUIVO) é uma lista JSON de locais, cada um
+# com um círculo ou um polígono:
+#   [{"nome": "Templo Sede", "circulo": {"lat": -23.55, "lon": -46.63, "raio_m": 120}},
+#    {"nome": "Anexo", "poligono": [[-23.551, -46.634], [-23.552, -46.633], [-23.553, -46.635]]}]
+# Sem geocercas configuradas, as coordenadas do check-in não são verificadas.
+GEOCERCAS_ARQUIVO = os.getenv("GEOCERCAS_ARQUIVO")
+GEOCERCA_TOLERANCIA_M = float(os.getenv("GEOCERCA_TOLERANCIA_M", "30"))  # imprecisão do GPS do celular
+GEOCERCA_EXIGIR_GPS = os.getenv("GEOCERCA_EXIGIR_GPS", "0") == "1"
+RAIO_TERRA_M = 6371008.8
+
+class Geocerca:
+    """Área de um local, pré-calculada para testes baratos por check-in.
+
+    As coordenadas são projetadas num plano local (equiretangular, centrado no
+    local), onde distâncias de algumas centenas de metros têm erro desprezível.
+    A caixa envolvente em graus descarta de imediato quem está longe.
+    """
+
+    def __init__(self, nome, circulo=None, poligono=None):
+        self.nome = nome
+        if circulo:
+            self.lat0, self.lon0 = float(circulo["lat"]), float(circulo["lon"])
+            self.raio = float(circulo["raio_m"])
+            self.vertices = None
+        elif poligono and len(poligono) >= 3:
+            self.lat0 = sum(float(p[0]) for p in poligono) / len(poligono)
+            self.lon0 = sum(float(p[1]) for p in poligono) / len(poligono)
+            self.raio = None
+        else:
+            raise ValueError(f"Geocerca '{nome}' precisa de um círculo ou de um polígono com 3+ pontos")
+
+        # Metros por grau no centro do local
+        self.m_lat = math.pi / 180 * RAIO_TERRA_M
+        self.m_lon = self.m_lat * math.cos(math.radians(self.lat0))
+        if poligono and not circulo:
+            self.vertices = [self._projetar(float(p[0]), float(p[1])) for p in poligono]
+            alcance = max(math.hypot(x, y) for x, y in self.vertices)
+        else:
+            alcance = self.raio
+        alcance += GEOCERCA_TOLERANCIA_M
+        self.caixa = (self.lat0 - alcance / self.m_lat, self.lat0 + alcance / self.m_lat,
+                      self.lon0 - alcance / self.m_lon, self.lon0 + alcance / self.m_lon)
+
+    def _projetar(self, lat, lon):
+        return (lon - self.lon0) * self.m_lon, (lat - self.lat0) * self.m_lat
+
+    def distancia(self, lat, lon):
+        """Metros até a borda da área (0 dentro dela)."""
+        x, y = self._projetar(lat, lon)
+        if self.vertices is None:
+            return max(0.0, math.hypot(x, y) - self.raio)
+        if _ponto_no_poligono(x, y, self.vertices):
+            return 0.0
+        return min(_distancia_segmento(x, y, a, b) for a, b in zip(self.vertices, self.vertices[1:] + self.vertices[:1]))
+
+    def contem(self, lat, lon):
+        lat_min, lat_max, lon_min, lon_max = self.caixa
+        if not (lat_min <= lat <= lat_max and lon_min <= lon <= lon_max):
+            return False
+        return self.distancia(lat, lon) <= GEOCERCA_TOLERANCIA_M
+
+    def distancias(self, lats, lons):
+        """Versão vetorizada de distancia() para arrays NumPy de coordenadas."""
+        import numpy as np
+
+        x = (lons - self.lon0) * self.m_lon
+        y = (lats - self.lat0) * self.m_lat
+        if self.vertices is None:
+            return np.maximum(0.0, np.hypot(x, y) - self.raio)
+        v = np.array(self.vertices)
+        a, b = v, np.roll(v, -1, axis=0)
+        # Ray casting para todos os pontos x todas as arestas de uma vez
+        cruza = ((a[:, 1] > y[:, None]) != (b[:, 1] > y[:, None])) & (
+            x[:, None] < (b[:, 0] - a[:, 0]) * (y[:, None] - a[:, 1]) / (b[:, 1] - a[:, 1] + 1e-12) + a[:, 0]
+        )
+        dentro = cruza.sum(axis=1) % 2 == 1
+        # Distância de cada ponto a cada aresta
+        d = b - a
+        comprimento = np.maximum((d ** 2).sum(axis=1), 1e-12)
+        t = np.clip(((x[:, None] - a[:, 0]) * d[:, 0] + (y[:, None] - a[:, 1]) * d[:, 1]) / comprimento, 0, 1)
+        px = a[:, 0] + t * d[:, 0]
+        py = a[:, 1] + t * d[:, 1]
+        borda = np.hypot(x[:, None] - px, y[:, None] - py).min(axis=1)
+        return np.where(dentro, 0.0, borda)
+
+def _ponto_no_poligono(x, y, vertices):
+    dentro = False
+    for (x1, y1), (x2, y2) in zip(vertices, vertices[1:] + vertices[:1]):
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            dentro = not dentro
+    return dentro
+
+def _distancia_segmento(x, y, a, b):
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    comprimento = dx * dx + dy * dy
+    t = 0.0 if comprimento == 0 else max(0.0, min(1.0, ((x - a[0]) * dx + (y - a[1]) * dy) / comprimento))
+    return math.hypot(x - (a[0] + t * dx), y - (a[1] + t * dy))
+
+def carregar_geocercas():
+    bruto = os.getenv("GEOCERCAS")
+    if GEOCERCAS_ARQUIVO:
+        with open(GEOCERCAS_ARQUIVO, encoding="utf-8") as f:
+            bruto = f.read()
+    if not bruto:
+        return []
+    geocercas = [Geocerca(g["nome"], g.get("circulo"), g.get("poligono")) for g in json.loads(bruto)]
+    print(f"✅ {len(geocercas)} geocerca(s) carregada(s): {', '.join(g.nome for g in geocercas)}")
+    return geocercas
+
+GEOCERCAS = carregar_geocercas()
+
+def validar_local(lat, lon):
+    """None se o check-in pode ser aceito; senão, o motivo da recusa."""
+    if not GEOCERCAS:
+        return None
+    if lat in (None, "") or lon in (None, ""):
+        return "localização obrigatória para o check-in" if GEOCERCA_EXIGIR_GPS else None
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return "coordenadas inválidas"
+    if any(g.contem(lat, lon) for g in GEOCERCAS):
+        return None
+    return "fora da área do culto"
+
+def auditar_coordenadas(linhas, fator=5.0):
+    """Marca, numa passada vetorizada, check-ins com coordenadas suspeitas.
+
+    Com geocercas, suspeito é quem ficou além da tolerância do local mais
+    próximo. Sem geocercas, a referência é a mediana das coordenadas e o corte
+    é `fator` vezes o desvio absoluto mediano das distâncias (mínimo de
+    GEOCERCA_TOLERANCIA_M).
+    """
+    import numpy as np
+    import pandas as pd
+
+    dados = pd.DataFrame(linhas, columns=["checkin_id", "membro_id", "nome", "grupo", "data_checkin", "latitude", "longitude"])
+    if dados.empty:
+        return {"total": 0, "suspeitos": 0, "referencia": None, "lista": []}
+    lats = dados["latitude"].to_numpy(dtype=float)
+    lons = dados["longitude"].to_numpy(dtype=float)
+
+    if GEOCERCAS:
+        distancias = np.vstack([g.distancias(lats, lons) for g in GEOCERCAS])
+        mais_proximo = distancias.argmin(axis=0)
+        dados["distancia_m"] = distancias.min(axis=0)
+        dados["local"] = [GEOCERCAS[i].nome for i in mais_proximo]
+        corte = GEOCERCA_TOLERANCIA_M
+        referencia = "geocercas"
+    else:
+        lat0, lon0 = float(np.median(lats)), float(np.median(lons))
+        m_lat = math.pi / 180 * RAIO_TERRA_M
+        dx = (lons - lon0) * m_lat * math.cos(math.radians(lat0))
+        dy = (lats - lat0) * m_lat
+        dados["distancia_m"] = np.hypot(dx, dy)
+        dados["local"] = None
+        mad = float(np.median(np.abs(dados["distancia_m"] - np.median(dados["distancia_m"]))))
+        corte = max(GEOCERCA_TOLERANCIA_M, fator * mad)
+        referencia = {"latitude": lat0, "longitude": lon0, "corte_m": round(corte, 1)}
+
+    suspeitos = dados[dados["distancia_m"] > corte].sort_values("distancia_m", ascending=False)
+    suspeitos = suspeitos.assign(distancia_m=suspeitos["distancia_m"].round(1), data_checkin=suspeitos["data_checkin"].astype(str))
+    return {
+        "total": int(len(dados)),
+        "suspeitos": int(len(suspeitos)),
+        "referencia": referencia,
+        "lista": suspeitos.to_dict(orient="records"),
+    }
+
+# ------------------ Check-in em lote (quiosques) ------------------
+CHECKIN_JANELA_MS = float(os.getenv("CHECKIN_JANELA_MS", "5"))   # espera para juntar check-ins simultâneos
+CHECKIN_LOTE_MAX = int(os.getenv("CHECKIN_LOTE_MAX", "200"))     # check-ins por transação
+CHECKIN_REQUISICAO_MAX = int(os.getenv("CHECKIN_REQUISICAO_MAX", "1000"))  # itens por POST em /api/checkins
+
+def gravar_checkin(conn, item, evento_padrao=None):
+    """Grava um check-in vindo do formulário ou de um quiosque. Retorna o status do item.
+
+    `evento_padrao` é o evento aberto da congregação do item; check-ins
+    reenviados (com `quando`) vão para o evento que estava aberto na hora.
+    """
+    if item.get("id_cliente") and conn.execute(
+        text("SELECT 1 FROM checkins WHERE id_cliente = :c LIMIT 1"), {"c": item["id_cliente"]}
+    ).first():
+        return "duplicado"
+    evento_id = evento_padrao
+    if item.get("quando"):
+        evento_id = evento_em(conn, item["quando"], item.get("congregacao")) or evento_padrao
+    if evento_id is None:
+        return "sem_evento"
+    encontrado = registrar_checkin(
+        conn, item["nome"], item["grupo"], item.get("latitude"), item.get("longitude"),
+        quando=item.get("quando"), evento_id=evento_id, origem=item.get("origem", "self"),
+        id_cliente=item.get("id_cliente")
+    )
+    return "registrado" if encontrado else "nao_encontrado"
+
+class AgrupadorCheckins:
+    """Junta os check-ins de requisições simultâneas numa única transação.
+
+    Cada requisição entrega seus itens e espera o resultado; uma thread
+    escritora por worker recolhe o que chegar dentro de `janela` segundos (até
+    `lote_max` itens) e grava tudo com um só commit. Na entrada do culto, um
+    commit atende dezenas de check-ins.
+    """
+
+    def __init__(self, janela, lote_max):
+        self.janela = janela
+        self.lote_max = lote_max
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enviar(self, itens, timeout=30):
+        """Grava os itens e devolve a lista de status, na mesma ordem."""
+        self._garantir_thread()
+        futuros = []
+        for item in itens:
+            futuro = Future()
+            self._fila.put((item, futuro))
+            futuros.append(futuro)
+        return [futuro.result(timeout) for futuro in futuros]
+
+    def _garantir_thread(self):
+        # Criada na primeira requisição: threads não sobrevivem ao fork dos workers do gunicorn
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="agrupador-checkins", daemon=True)
+                self._thread.start()
+
+    def _executar(self):
+        while True:
+            lote = [self._fila.get()]
+            limite = time.monotonic() + self.janela
+            while len(lote) < self.lote_max:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self._gravar(lote)
+
+    def _gravar(self, lote):
+        try:
+            with engine.begin() as conn:
+                # Um evento aberto por congregação: resolvido uma vez por lote
+                atuais = {}
+                resultados = []
+                for item, _ in lote:
+                    congregacao = item.get("congregacao")
+                    if congregacao not in atuais:
+                        atuais[congregacao] = evento_atual(conn, congregacao)
+                    resultados.append(gravar_checkin(conn, item, atuais[congregacao]))
+        except Exception as e:
+            if len(lote) > 1:
+                # Um item com problema derrubou o lote: regrava um a um para isolar a falha
+                for unico in lote:
+                    self._gravar([unico])
+            else:
+                lote[0][1].set_exception(e)
+            return
+        for (_, futuro), resultado in zip(lote, resultados):
+            futuro.set_result(resultado)
+
+agrupador_checkins = AgrupadorCheckins(CHECKIN_JANELA_MS / 1000, CHECKIN_LOTE_MAX)
+
+def _item_checkin(dados, reenvio):
+    """Valida um item do JSON dos quiosques. Retorna (item, None) ou (None, motivo)."""
+    if not isinstance(dados, dict):
+        return None, "item inválido"
+    nome, grupo = dados.get("nome"), dados.get("grupo")
+    if not nome or not grupo:
+        return None, "nome e grupo são obrigatórios"
+    item = {"nome": str(nome), "grupo": str(grupo), "origem": "quiosque",
+            "id_cliente": str(dados["id_cliente"]) if dados.get("id_cliente") else None,
+            "congregacao": str(dados["congregacao"]).strip() if dados.get("congregacao") else None}
+    try:
+        item["latitude"] = float(dados["latitude"]) if dados.get("latitude") not in (None, "") else None
+        item["longitude"] = float(dados["longitude"]) if dados.get("longitude") not in (None, "") else None
+    except (TypeError, ValueError):
+        return None, "coordenadas inválidas"
+    motivo = validar_local(item["latitude"], item["longitude"])
+    if motivo:
+        return None, motivo
+    if dados.get("quando"):
+        try:
+            quando = datetime.datetime.fromisoformat(str(dados["quando"]).replace("Z", "+00:00"))
+        except ValueError:
+            return None, "data/hora inválida"
+        if quando.tzinfo:
+            quando = quando.astimezone().replace(tzinfo=None)
+        if quando > datetime.datetime.now() + datetime.timedelta(minutes=5):
+            return None, "data/hora no futuro"
+        item["quando"] = quando
+    if reenvio and not (item["id_cliente"] and item.get("quando")):
+        return None, "no reenvio, id_cliente e quando são obrigatórios"
+    return item, None
+
+# ------------------ Autenticação e sessões ------------------
+SESSAO_DURACAO_HORAS = float(os.getenv("SESSAO_DURACAO_HORAS", "12"))
+SESSAO_CACHE_MAX = int(os.getenv("SESSAO_CACHE_MAX", "1000"))
+# Método do werkzeug para as senhas; hashes em outro formato são refeitos no próximo login
+SENHA_HASH_METODO = os.getenv("SENHA_HASH_METODO", "pbkdf2:sha256:260000")
+LOGIN_TENTATIVAS = int(os.getenv("LOGIN_TENTATIVAS", "5"))                        # rajada permitida
+LOGIN_TENTATIVAS_POR_MINUTO = float(os.getenv("LOGIN_TENTATIVAS_POR_MINUTO", "5"))  # reposição
+
+def gerar_hash_senha(senha):
+    return generate_password_hash(senha, method=SENHA_HASH_METODO)
+
+@functools.lru_cache(maxsize=1)
+def _hash_ficticio():
+    """Hash de referência para e-mails inexistentes: o login custa o mesmo com ou sem usuário."""
+    return gerar_hash_senha(secrets.token_hex(8))
+
+class SessaoLider(SecureCookieSession):
+    """Sessão guardada no servidor; o cookie leva só o id."""
+    sid = None
+    expira = None
+
+class SessaoServidor(SecureCookieSessionInterface):
+    """Sessões de líderes na tabela `sessoes`, com cache em memória.
+
+    Só sessões autenticadas (com usuario_id) vão para o banco, e o id é
+    trocado a cada login (renovar_id). Visitantes anônimos, como os quiosques
+    de check-in que só recebem mensagens flash, continuam com o cookie
+    assinado do Flask e não custam escrita. Cada gravação incrementa
+    `sessoes.versao`; a leitura confere só a versão e a expiração pela chave
+    primária e reaproveita os dados em memória se a versão não mudou, então
+    alterações e logouts feitos em outro worker valem já na próxima requisição.
+    """
+
+    cookie_id = "sessao_id"
+
+    def __init__(self):
+        self._cache = OrderedDict()  # sid -> (dados, versao)
+        self._lock = threading.Lock()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.cookie_id)
+        if sid:
+            carregada = self._carregar(sid)
+            if carregada is not None:
+                dados, expira = carregada
+                sessao = SessaoLider(dados)
+                sessao.sid, sessao.expira = sid, expira
+                return sessao
+        return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        sid = getattr(session, "sid", None)
+        if "usuario_id" not in session:
+            if sid:
+                # Logout: a sessão do servidor acaba; o que sobrou (flash) vai no cookie assinado
+                self._apagar(sid)
+                response.delete_cookie(self.cookie_id, path=self.get_cookie_path(app))
+            return super().save_session(app, session, response)
+
+        agora = datetime.datetime.now()
+        duracao = datetime.timedelta(hours=SESSAO_DURACAO_HORAS)
+        if sid is None:
+            sid = secrets.token_urlsafe(32)
+            self._gravar(sid, dict(session), agora + duracao, nova=True)
+            response.set_cookie(
+                self.cookie_id, sid, httponly=True, path=self.get_cookie_path(app),
+                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app)
+            )
+            # O cookie assinado de antes do login não serve mais
+            response.delete_cookie(app.config["SESSION_COOKIE_NAME"], path=self.get_cookie_path(app))
+        elif session.modified or session.expira - agora < duracao / 2:
+            # Expiração deslizante, renovada no máximo uma vez a cada meia duração
+            self._gravar(sid, dict(session), agora + duracao)
 
-    # Migração simples: garantir colunas de geolocalização em membros (idempotente)
-    try:
+    def renovar_id(self, sessao):
+        """Descarta o id da sessão atual (login): ao salvar, ela ganha um id novo."""
+        sid = getattr(sessao, "sid", None)
+        if sid:
+            self._apagar(sid)
+            sessao.sid = None
+
+    def _carregar(self, sid):
+        with engine.connect() as conn:
+            linha = conn.execute(
+                text("SELECT versao, expira FROM sessoes WHERE id = :id"), {"id": sid}
+            ).fetchone()
+            if linha is None:
+                with self._lock:
+                    self._cache.pop(sid, None)
+                return None
+            expira = linha.expira
+            if isinstance(expira, str):
+                expira = datetime.datetime.fromisoformat(expira)
+            if expira <= datetime.datetime.now():
+                return None
+            with self._lock:
+                em_cache = self._cache.get(sid)
+                if em_cache and em_cache[1] == linha.versao:
+                    self._cache.move_to_end(sid)
+                    return dict(em_cache[0]), expira
+            # Gravada por outro worker (ou ainda não lida neste): relê os dados
+            dados = self.serializer.loads(conn.execute(
+                text("SELECT dados FROM sessoes WHERE id = :id"), {"id": sid}
+            ).scalar())
+        self._lembrar(sid, dados, linha.versao)
+        return dict(dados), expira
+
+    def _gravar(self, sid, dados, expira, nova=False):
+        with engine.begin() as conn:
+            if nova:
+                conn.execute(text("DELETE FROM sessoes WHERE expira < :agora"), {"agora": datetime.datetime.now()})
+            versao = conn.execute(
+                text("""
+                    INSERT INTO sessoes (id, dados, expira, versao) VALUES (:id, :d, :x, 1)
+                    ON CONFLICT (id) DO UPDATE SET dados = excluded.dados, expira = excluded.expira,
+                                                   versao = sessoes.versao + 1
+                    RETURNING versao
+                """),
+                {"id": sid, "d": self.serializer.dumps(dados), "x": expira}
+            ).scalar()
+        self._lembrar(sid, dados, versao)
+
+    def _apagar(self, sid):
         with engine.begin() as conn:
-            cols = conn.execute(text("PRAGMA table_info(membros)")).fetchall()
-            col_names = {c[1] for c in cols}
-            if "checkin_latitude" not in col_names:
-                conn.execute(text("ALTER TABLE membros ADD COLUMN checkin_latitude REAL"))
-            if "checkin_longitude" not in col_names:
-                conn.execute(text("ALTER TABLE membros ADD COLUMN checkin_longitude REAL"))
-            
-            # Migração para coluna lista_presentes e arquivada
-            cols_ata = conn.execute(text("PRAGMA table_info(atas)")).fetchall()
-            col_names_ata = {c[1] for c in cols_ata}
-            if "lista_presentes" not in col_names_ata:
-                conn.execute(text("ALTER TABLE atas ADD COLUMN lista_presentes TEXT"))
-            if "arquivada" not in col_names_ata:
-                conn.execute(text("ALTER TABLE atas ADD COLUMN arquivada BOOLEAN DEFAULT FALSE"))
-    except Exception:
-        # Ignorar falhas de migração silenciosamente para compatibilidade
-        pass
+            conn.execute(text("DELETE FROM sessoes WHERE id = :id"), {"id": sid})
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def _lembrar(self, sid, dados, versao):
+        with self._lock:
+            self._cache[sid] = (dados, versao)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > SESSAO_CACHE_MAX:
+                self._cache.popitem(last=False)
+
+app.session_interface = SessaoServidor()
+
+class BaldeTokens:
+    """Limite de taxa em memória (por worker): `capacidade` fichas por chave,
+    repostas a `por_segundo`. Cada tentativa consome uma ficha."""
+
+    def __init__(self, capacidade, por_segundo):
+        self.capacidade = capacidade
+        self.por_segundo = por_segundo
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            fichas, ultimo = self._baldes.get(chave, (self.capacidade, agora))
+            fichas = min(self.capacidade, fichas + (agora - ultimo) * self.por_segundo)
+            permitido = fichas >= 1
+            self._baldes[chave] = (fichas - 1 if permitido else fichas, agora)
+            if len(self._baldes) > 10000:
+                # Descarta baldes já cheios de novo; não guardam informação útil
+                cheio = self.capacidade / self.por_segundo
+                self._baldes = {c: (f, t) for c, (f, t) in self._baldes.items() if agora - t < cheio}
+            return permitido
+
+limite_login = BaldeTokens(LOGIN_TENTATIVAS, LOGIN_TENTATIVAS_POR_MINUTO / 60)
+
+def requer_papel(papel, api=False):
+    """Decorator de rota: exige `session["tipo_usuario"] == papel`.
+
+    Rotas de página redirecionam para o login; rotas de API (api=True)
+    respondem 401 em JSON.
+    """
+    def decorador(view):
+        @functools.wraps(view)
+        def protegida(*args, **kwargs):
+            if session.get("tipo_usuario") != papel:
+                if api:
+                    return jsonify({"erro": "Acesso não autorizado"}), 401
+                flash("Acesso não autorizado", "danger")
+                return redirect(url_for("login_lider"))
+            return view(*args, **kwargs)
+        return protegida
+    return decorador
+
+requer_lider = requer_papel("lider")
+requer_lider_api = requer_papel("lider", api=True)
 
 # ------------------ FORÇAR INICIALIZAÇÃO DO BANCO ------------------
+_marcar_inicializacao("modulo")
 init_db()
+_marcar_inicializacao("banco")
 
 # ------------------ Rotas Públicas (Obreiros) ------------------
 @app.route("/checkin_obreiro", methods=["POST"])
@@ -143,30 +2604,106 @@ def checkin_obreiro():
     grupo = request.form["grupo"]
     lat = request.form.get("latitude")
     lon = request.form.get("longitude")
+    # Quiosque de uma congregação: /?congregacao=<nome> mantém o campo no formulário
+    congregacao = request.form.get("congregacao", "").strip() or None
+    destino = url_for("index", congregacao=congregacao)
     
+    motivo = validar_local(lat, lon)
+    if motivo:
+        flash(f"Check-in não realizado: {motivo}. Faça o check-in no local do culto.", "warning")
+        return redirect(destino)
+
     try:
-        with engine.begin() as conn:
-            result = conn.execute(
-                text("SELECT id FROM membros WHERE nome = :n AND grupo = :g"),
-                {"n": nome, "g": grupo}
-            ).fetchone()
-            
-            if result:
-                conn.execute(
-                    text("UPDATE membros SET presente = TRUE, data_checkin = :d, checkin_latitude = :lat, checkin_longitude = :lon WHERE id = :id"),
-                    {"d": datetime.datetime.now(), "id": result.id, "lat": float(lat) if lat else None, "lon": float(lon) if lon else None}
-                )
-                flash("Check-in realizado com sucesso! Deus te abençoe!", "success")
-            else:
-                flash("Obreiro não encontrado. Verifique nome e grupo.", "warning")
+        # Nome inexistente com cache completo: responde sem tocar no banco
+        status = "nao_encontrado"
+        if roster.buscar(nome, grupo) != []:
+            item = {"nome": nome, "grupo": grupo, "latitude": lat, "longitude": lon, "congregacao": congregacao}
+            status = agrupador_checkins.enviar([item])[0]
+        if status == "registrado":
+            flash("Check-in realizado com sucesso! Deus te abençoe!", "success")
+        elif status == "sem_evento":
+            flash("Nenhum culto aberto no momento. Procure a liderança.", "warning")
+        else:
+            sugestoes = roster.sugerir(nome, grupo)
+            if sugestoes:
+                # Nome digitado diferente do cadastro: oferece os parecidos para confirmar
+                flash("Obreiro não encontrado. Você quis dizer:", "warning")
+                return render_template("index.html", congregacao=congregacao or "", sugestoes=sugestoes,
+                                       latitude=lat or "", longitude=lon or "")
+            flash("Obreiro não encontrado. Verifique nome e grupo.", "warning")
     except Exception as e:
         flash(f"Erro ao realizar check-in: {e}", "danger")
     
-    return redirect(url_for("index"))
+    return redirect(destino)
+
+@app.route("/api/checkins", methods=["POST"])
+def api_checkins():
+    """Check-ins em lote dos quiosques da entrada.
+
+    Corpo: {"checkins": [{"nome", "grupo", "latitude", "longitude", "id_cliente", "quando"}],
+    "reenvio": false, "congregacao": "Sede"}. Com "reenvio": true o quiosque
+    descarrega a fila que acumulou offline; cada item precisa de id_cliente e
+    quando (ISO 8601), e itens já recebidos voltam como "duplicado". A
+    congregação (no corpo ou em cada item) escolhe o evento aberto; sem ela,
+    vale o evento aberto de CONGREGACAO_PADRAO, e não o de outra congregação.
+    A resposta traz o status de cada item na ordem enviada ("sem_evento"
+    quando não há culto aberto na congregação).
+    """
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict) or not isinstance(dados.get("checkins"), list):
+        return jsonify({"erro": "Envie um objeto JSON com a lista 'checkins'"}), 400
+    if len(dados["checkins"]) > CHECKIN_REQUISICAO_MAX:
+        return jsonify({"erro": f"Máximo de {CHECKIN_REQUISICAO_MAX} check-ins por requisição"}), 413
+    reenvio = bool(dados.get("reenvio"))
+
+    resultados = [None] * len(dados["checkins"])
+    pendentes = []
+    for i, bruto in enumerate(dados["checkins"]):
+        if isinstance(bruto, dict) and dados.get("congregacao") and not bruto.get("congregacao"):
+            bruto = {**bruto, "congregacao": dados["congregacao"]}
+        item, motivo = _item_checkin(bruto, reenvio)
+        id_cliente = bruto.get("id_cliente") if isinstance(bruto, dict) else None
+        if item is None:
+            resultados[i] = {"id_cliente": id_cliente, "status": "invalido", "motivo": motivo}
+        elif roster.buscar(item["nome"], item["grupo"]) == []:
+            # Nome inexistente com cache completo: responde sem tocar no banco
+            resultados[i] = {"id_cliente": id_cliente, "status": "nao_encontrado",
+                             "sugestoes": _sugestoes_json(item["nome"], item["grupo"])}
+        else:
+            pendentes.append((i, item))
+
+    try:
+        status = agrupador_checkins.enviar([item for _, item in pendentes])
+    except Exception as e:
+        return jsonify({"erro": f"Erro ao registrar check-ins: {e}"}), 500
+    for (i, item), s in zip(pendentes, status):
+        resultados[i] = {"id_cliente": item["id_cliente"], "status": s}
+        if s == "nao_encontrado":
+            resultados[i]["sugestoes"] = _sugestoes_json(item["nome"], item["grupo"])
+
+    return jsonify({
+        "resultados": resultados,
+        "registrados": sum(1 for r in resultados if r["status"] == "registrado"),
+    })
+
+def _sugestoes_json(nome, grupo=""):
+    return [{"nome": m["nome"], "grupo": m["grupo"], "semelhanca": m["semelhanca"]}
+            for m in roster.sugerir(nome, grupo)]
+
+@app.route("/api/obreiros/sugestoes")
+def api_sugestoes_obreiros():
+    """Nomes do cadastro parecidos com o digitado (autocompletar dos quiosques).
+
+    Devolve só nome e grupo, e exige ao menos 3 letras.
+    """
+    nome = request.args.get("nome", "")
+    if len(normalizar_chave(nome)) < 3:
+        return jsonify({"erro": "Informe ao menos 3 letras do nome"}), 400
+    return jsonify({"sugestoes": _sugestoes_json(nome, request.args.get("grupo", ""))})
 
 @app.route("/")
 def index():
-    return render_template("index.html")
+    return render_template("index.html", congregacao=request.args.get("congregacao", "").strip())
 
 # ------------------ Rotas de Liderança (Protegidas) ------------------
 @app.route("/login_lider")
@@ -178,14 +2715,29 @@ def auth_lider():
     email = request.form["email"]
     senha = request.form["senha"]
 
+    # Limite antes do hash: força bruta não consome CPU com PBKDF2
+    if not (limite_login.consumir(f"ip:{request.remote_addr}") and limite_login.consumir(f"email:{email.lower()}")):
+        flash("Muitas tentativas de login. Aguarde um minuto e tente novamente.", "warning")
+        return render_template("login_lider.html"), 429
+
     try:
         with engine.connect() as conn:
             result = conn.execute(
-                text("SELECT * FROM usuarios WHERE email = :e AND tipo = 'lider'"), 
+                text("SELECT id, nome, senha FROM usuarios WHERE email = :e AND tipo = 'lider'"), 
                 {"e": email}
             ).mappings().fetchone()
 
-        if result and check_password_hash(result["senha"], senha):
+        senha_ok = check_password_hash(result["senha"] if result else _hash_ficticio(), senha)
+        if result and senha_ok:
+            if not result["senha"].startswith(f"{SENHA_HASH_METODO}$"):
+                # Custo do hash mudou (SENHA_HASH_METODO): refaz com a senha recebida
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("UPDATE usuarios SET senha = :s WHERE id = :id"),
+                        {"s": gerar_hash_senha(senha), "id": result["id"]}
+                    )
+            # Id de sessão novo a cada login (o de antes pode ter vazado)
+            app.session_interface.renovar_id(session)
             session["usuario_id"] = result["id"]
             session["usuario_nome"] = result["nome"]
             session["tipo_usuario"] = "lider"
@@ -199,71 +2751,177 @@ def auth_lider():
         return redirect(url_for("login_lider"))
 
 @app.route("/painel_lider")
+@requer_lider
 def painel_lider():
-    if "tipo_usuario" not in session or session["tipo_usuario"] != "lider":
-        flash("Acesso restrito para líderes. Faça login primeiro.", "warning")
-        return redirect(url_for("login_lider"))
+    filtros = {
+        "prefixo": request.args.get("q", "").strip(),
+        "grupo": request.args.get("grupo", "").strip(),
+        "status": request.args.get("status", ""),
+    }
 
     try:
+        proximo = None
         with engine.connect() as conn:
-            membros = conn.execute(
-                text("SELECT * FROM membros ORDER BY nome")
-            ).mappings().all()
-            
-            total_presentes = conn.execute(
-                text("SELECT COUNT(*) FROM membros WHERE presente = TRUE")
-            ).scalar() or 0
-            
-            total_ausentes = conn.execute(
-                text("SELECT COUNT(*) FROM membros WHERE presente = FALSE")
-            ).scalar() or 0
-            
-            total_membros = conn.execute(
-                text("SELECT COUNT(*) FROM membros")
-            ).scalar() or 0
-            
-            # Buscar atas não arquivadas
-            atas = conn.execute(
-                text("SELECT * FROM atas WHERE arquivada = FALSE ORDER BY data_reuniao DESC")
-            ).mappings().all()
-            
+            evento_id = evento_lider(conn)
+            eventos = eventos_abertos(conn)
+            # Contadores e atas abertas vêm do snapshot (uma agregação a cada poucos segundos)
+            resumo = painel_snapshot.obter(evento_id)
+            if resumo["total_membros"] <= PAINEL_LIMITE_COMPLETO and not any(filtros.values()):
+                # Cadastro pequeno: renderiza todos de uma vez
+                membros = conn.execute(
+                    text(f"{SQL_MEMBROS_PRESENCA} ORDER BY m.nome"), {"evento": evento_id}
+                ).mappings().all()
+            else:
+                membros, proximo = listar_membros(conn, evento_id=evento_id, **filtros)
+
         return render_template("painel_lider.html", 
                              membros=membros,
-                             total_presentes=total_presentes,
-                             total_ausentes=total_ausentes,
-                             total_membros=total_membros,
-                             atas=atas)
+                             proximo=proximo,
+                             filtros=filtros,
+                             total_presentes=resumo["total_presentes"],
+                             total_ausentes=resumo["total_ausentes"],
+                             total_membros=resumo["total_membros"],
+                             por_grupo=resumo["por_grupo"],
+                             atas=resumo["atas"],
+                             eventos=eventos,
+                             evento_id=evento_id,
+                             # O stream repete os avisos posteriores ao snapshot dos contadores
+                             ultimo_aviso=resumo["ultimo_aviso"],
+                             congregacao_padrao=CONGREGACAO_PADRAO,
+                             sem_grupo=SEM_GRUPO)
     except Exception as e:
         flash(f"Erro ao carregar painel: {e}", "danger")
         return redirect(url_for("login_lider"))
 
+@app.route("/api/membros")
+@requer_lider_api
+def api_membros():
+    try:
+        limite = min(int(request.args.get("limite", PAGINA_MEMBROS)), 500)
+        with engine.connect() as conn:
+            membros, proximo = listar_membros(
+                conn,
+                prefixo=request.args.get("q", "").strip(),
+                grupo=request.args.get("grupo", "").strip(),
+                status=request.args.get("status", ""),
+                apos=request.args.get("apos") or None,
+                limite=limite,
+                evento_id=evento_lider(conn),
+            )
+        return jsonify({"membros": [_membro_json(m) for m in membros], "proximo": proximo})
+    except ValueError:
+        return jsonify({"erro": "Parâmetros inválidos"}), 400
+
 @app.route("/checkin_lider", methods=["POST"])
+@requer_lider
 def checkin_lider():
-    if "tipo_usuario" not in session or session["tipo_usuario"] != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
-    
     membro_id = request.form["membro_id"]
     presente = request.form.get("presente") == "on"
 
     try:
         with engine.begin() as conn:
-            conn.execute(
-                text("UPDATE membros SET presente = :p, data_checkin = :d WHERE id = :id"),
-                {"p": presente, "d": datetime.datetime.now() if presente else None, "id": membro_id}
-            )
+            evento_id = evento_lider(conn)
+            if evento_id is None:
+                flash("Nenhum evento aberto. Abra um evento antes de marcar presenças.", "warning")
+                return redirect(url_for("painel_lider"))
+            alterar_presenca(conn, int(membro_id), presente, evento_id=evento_id)
+        painel_snapshot.invalidar()
         flash("Check-in atualizado com sucesso!", "success")
     except Exception as e:
         flash(f"Erro ao atualizar check-in: {e}", "danger")
     
     return redirect(url_for("painel_lider"))
 
+@app.route("/api/presenca", methods=["POST"])
+@requer_lider_api
+def api_presenca():
+    """Marca ou desmarca a presença sem recarregar o painel.
+
+    Corpo: {"membro_id": 12, "presente": true}. Os outros painéis abertos
+    recebem a mudança pelo stream de /painel_lider/ao_vivo.
+    """
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict) or not isinstance(dados.get("presente"), bool):
+        return jsonify({"erro": "Envie membro_id e presente (true/false)"}), 400
+    try:
+        membro_id = int(dados.get("membro_id"))
+    except (TypeError, ValueError):
+        return jsonify({"erro": "membro_id inválido"}), 400
+
+    with engine.begin() as conn:
+        evento_id = evento_lider(conn)
+        if evento_id is None:
+            return jsonify({"erro": "Nenhum evento aberto"}), 409
+        if not conn.execute(text("SELECT 1 FROM membros WHERE id = :id"), {"id": membro_id}).first():
+            return jsonify({"erro": "Obreiro não encontrado"}), 404
+        alterar_presenca(conn, membro_id, dados["presente"], evento_id=evento_id)
+        data_checkin = conn.execute(
+            text("SELECT data_checkin FROM presencas WHERE evento_id = :e AND membro_id = :m"),
+            {"e": evento_id, "m": membro_id}
+        ).scalar()
+    painel_snapshot.invalidar()
+    return jsonify({"membro_id": membro_id, "evento_id": evento_id, "presente": data_checkin is not None,
+                    "data_checkin": _formatar_data(data_checkin) or None})
+
+@app.route("/painel_lider/ao_vivo")
+@requer_lider_api
+def painel_ao_vivo():
+    """Stream SSE com as mudanças de presença do evento acompanhado pelo líder.
+
+    Cada aviso leva o id da fila em `id:`; ao reconectar, o navegador manda o
+    Last-Event-ID (ou a página manda ?desde=) e os avisos perdidos no
+    intervalo são reenviados antes dos novos.
+    """
+    with engine.connect() as conn:
+        evento_id = evento_lider(conn)
+    if evento_id is None:
+        return jsonify({"erro": "Nenhum evento aberto"}), 409
+    try:
+        desde = int(request.headers.get("Last-Event-ID") or request.args.get("desde") or 0)
+    except ValueError:
+        desde = 0
+
+    fila = canal_painel.assinar(evento_id)
+    if fila is None:
+        return jsonify({"erro": "Muitos painéis conectados; tente em instantes"}), 503, {"Retry-After": "10"}
+
+    def formatar(aviso):
+        return f"id: {aviso['id']}\nevent: {aviso['tipo']}\ndata: {json.dumps(aviso)}\n\n"
+
+    def gerar():
+        try:
+            yield f"retry: 3000\nevent: conectado\ndata: {json.dumps({'evento_id': evento_id})}\n\n"
+            enviados = set()
+            if desde:
+                # Assinado antes de ler o atraso: nada se perde entre uma coisa e outra
+                with engine.connect() as conn:
+                    atrasados = conn.execute(
+                        text("SELECT * FROM avisos_painel WHERE evento_id = :e AND id > :d ORDER BY id"),
+                        {"e": evento_id, "d": desde}
+                    ).mappings().all()
+                for linha in atrasados:
+                    enviados.add(linha["id"])
+                    yield formatar(_aviso_json(linha))
+            limite = time.monotonic() + PAINEL_AO_VIVO_DURACAO_S
+            while time.monotonic() < limite:
+                try:
+                    aviso = fila.get(timeout=15)
+                except queue.Empty:
+                    yield ": ping\n\n"  # mantém a conexão viva em proxies
+                    continue
+                if aviso["id"] not in enviados:
+                    yield formatar(aviso)
+                if aviso["tipo"] == "evento_encerrado":
+                    break
+        finally:
+            canal_painel.cancelar(evento_id, fila)
+
+    return Response(stream_with_context(gerar()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/cadastrar_obreiro", methods=["POST"])
+@requer_lider
 def cadastrar_obreiro():
-    if "tipo_usuario" not in session or session["tipo_usuario"] != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
-    
     nome = request.form["nome"]
     grupo = request.form["grupo"]
     telefone = request.form.get("telefone", "")
@@ -271,10 +2929,16 @@ def cadastrar_obreiro():
 
     try:
         with engine.begin() as conn:
-            conn.execute(
-                text("INSERT INTO membros (nome, grupo, telefone, email) VALUES (:n, :g, :t, :e)"),
-                {"n": nome, "g": grupo, "t": telefone, "e": email}
-            )
+            membro = {"nome": nome, "grupo": grupo, "telefone": telefone,
+                      "nome_busca": normalizar_chave(nome), "grupo_busca": normalizar_chave(grupo)}
+            membro["id"] = conn.execute(
+                text("INSERT INTO membros (nome, grupo, telefone, email, nome_busca, grupo_busca) VALUES (:n, :g, :t, :e, :nb, :gb) RETURNING id"),
+                {"n": nome, "g": grupo, "t": telefone, "e": email,
+                 "nb": membro["nome_busca"], "gb": membro["grupo_busca"]}
+            ).scalar()
+            versao = publicar_alteracao_roster(conn)
+        roster.adicionar(versao, membro)
+        painel_snapshot.invalidar()
         flash("Obreiro cadastrado com sucesso!", "success")
     except Exception as e:
         flash(f"Erro ao cadastrar obreiro: {e}", "danger")
@@ -282,11 +2946,19 @@ def cadastrar_obreiro():
     return redirect(url_for("painel_lider"))
 
 # ------------------ Excel: Download modelo e Upload em lote ------------------
+MIMETYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 @app.route("/download_modelo_obreiro")
+@requer_lider
 def download_modelo_obreiro():
-    if "tipo_usuario" not in session or session.get("tipo_usuario") != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
+    if request.args.get("async"):
+        return _resposta_job(enfileirar_job("modelo_obreiros", _job_modelo_obreiros))
+
+    return send_file(BytesIO(gerar_modelo_obreiros()), as_attachment=True, download_name="modelo_obreiros.xlsx", mimetype=MIMETYPE_XLSX)
+
+def gerar_modelo_obreiros():
+    """Planilha modelo para o upload em lote (bytes do .xlsx)."""
+    import pandas as pd
 
     df = pd.DataFrame({
         "nome": ["Ex: João da Silva"],
@@ -297,62 +2969,210 @@ def download_modelo_obreiro():
     output = BytesIO()
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
         df.to_excel(writer, index=False, sheet_name="obreiros")
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name="modelo_obreiros.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    return output.getvalue()
+
+def _job_modelo_obreiros():
+    return {"arquivo": (gerar_modelo_obreiros(), "modelo_obreiros.xlsx", MIMETYPE_XLSX)}
+
+IMPORTACAO_LOTE = int(os.getenv("IMPORTACAO_LOTE", "1000"))  # linhas por INSERT em lote
+COLUNAS_MODELO = ["nome", "grupo", "telefone", "email"]
+
+def _normalizar_serie(serie):
+    """Versão vetorizada de normalizar_chave para uma coluna inteira."""
+    return (serie.str.normalize("NFKD")
+                 .str.replace(_ACENTOS.pattern, "", regex=True)
+                 .str.lower()
+                 .str.replace(r"\s+", " ", regex=True)
+                 .str.strip())
+
+def importar_obreiros(arquivo):
+    """Importa a planilha modelo em lote e devolve um relatório por linha.
+
+    Normalização e validação são vetorizadas no pandas, a deduplicação contra
+    `membros` é feita de uma vez pela chave nome/grupo normalizada e os INSERTs
+    saem em lotes de IMPORTACAO_LOTE linhas (executemany).
+    """
+    import pandas as pd
+
+    inicio = time.perf_counter()
+    df = pd.read_excel(arquivo, dtype=str)
+    df = df.rename(columns={c: str(c).strip().lower() for c in df.columns})
+    if not set(COLUNAS_MODELO).issubset(df.columns):
+        raise ValueError("Modelo inválido. Certifique-se de usar o arquivo modelo.")
+
+    df = df[COLUNAS_MODELO].fillna("")
+    for col in COLUNAS_MODELO:
+        df[col] = df[col].str.strip()
+    df["linha"] = df.index + 2  # linha 1 é o cabeçalho da planilha
+    df["nome_busca"] = _normalizar_serie(df["nome"])
+    df["grupo_busca"] = _normalizar_serie(df["grupo"])
+
+    # Validação
+    df["motivo"] = ""
+    df.loc[df["grupo_busca"] == "", "motivo"] = "grupo vazio"
+    df.loc[df["nome_busca"] == "", "motivo"] = "nome vazio"
+    validos = df["motivo"] == ""
+
+    # Duplicados dentro da própria planilha
+    repetidos = validos & df.duplicated(["nome_busca", "grupo_busca"], keep="first")
+    df.loc[repetidos, "motivo"] = "duplicado na planilha"
+
+    # Duplicados já cadastrados (uma única consulta)
+    with engine.connect() as conn:
+        existentes = pd.DataFrame(
+            conn.execute(text("SELECT DISTINCT nome_busca, grupo_busca FROM membros")).fetchall(),
+            columns=["nome_busca", "grupo_busca"]
+        )
+    existentes["_cadastrado"] = True
+    df = df.merge(existentes, on=["nome_busca", "grupo_busca"], how="left")
+    df.loc[(df["motivo"] == "") & df["_cadastrado"].eq(True), "motivo"] = "já cadastrado"
+
+    novos = df[df["motivo"] == ""]
+    registros = novos[["nome", "grupo", "telefone", "email", "nome_busca", "grupo_busca"]].to_dict(orient="records")
+    if registros:
+        with engine.begin() as conn:
+            for i in range(0, len(registros), IMPORTACAO_LOTE):
+                conn.execute(
+                    text("INSERT INTO membros (nome, grupo, telefone, email, nome_busca, grupo_busca) "
+                         "VALUES (:nome, :grupo, :telefone, :email, :nome_busca, :grupo_busca)"),
+                    registros[i:i + IMPORTACAO_LOTE]
+                )
+            publicar_alteracao_roster(conn)
+
+    rejeitados = df[df["motivo"] != ""]
+    segundos = time.perf_counter() - inicio
+    return {
+        "total_linhas": len(df),
+        "inseridos": len(registros),
+        "duplicados": int(rejeitados["motivo"].isin(["duplicado na planilha", "já cadastrado"]).sum()),
+        "invalidos": int(rejeitados["motivo"].isin(["nome vazio", "grupo vazio"]).sum()),
+        "erros": rejeitados[["linha", "nome", "motivo"]].to_dict(orient="records"),
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(len(df) / segundos, 1) if segundos else None,
+    }
+
+def _job_importar_obreiros(dados):
+    relatorio = importar_obreiros(BytesIO(dados))
+    roster.invalidar()
+    painel_snapshot.invalidar()
+    return relatorio
 
 @app.route("/upload_obreiros", methods=["POST"])
+@requer_lider
 def upload_obreiros():
-    if "tipo_usuario" not in session or session.get("tipo_usuario") != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
-
     file = request.files.get("arquivo")
     if not file:
         flash("Nenhum arquivo enviado", "warning")
         return redirect(url_for("painel_lider"))
 
+    if request.args.get("async") or request.form.get("assincrono"):
+        return _resposta_job(enfileirar_job("importar_obreiros", _job_importar_obreiros, file.read()))
+
     try:
-        df = pd.read_excel(file)
-        # Normalizar colunas esperadas
-        expected_cols = {"nome", "grupo", "telefone", "email"}
-        df_cols = {c.strip().lower() for c in df.columns}
-        if not expected_cols.issubset(df_cols):
-            flash("Modelo inválido. Certifique-se de usar o arquivo modelo.", "danger")
-            return redirect(url_for("painel_lider"))
+        relatorio = importar_obreiros(file)
+        roster.invalidar()
+        painel_snapshot.invalidar()
+        if request.accept_mimetypes.best == "application/json":
+            return jsonify(relatorio)
+
+        flash(
+            f"Upload concluído. {relatorio['inseridos']} obreiros adicionados, "
+            f"{relatorio['duplicados']} duplicados e {relatorio['invalidos']} inválidos ignorados "
+            f"({relatorio['linhas_por_segundo']} linhas/s).",
+            "success"
+        )
+        for erro in relatorio["erros"][:10]:
+            flash(f"Linha {erro['linha']}: {erro['motivo']} ({erro['nome'] or 'sem nome'})", "warning")
+        if len(relatorio["erros"]) > 10:
+            flash(f"... e mais {len(relatorio['erros']) - 10} linhas com problema.", "warning")
+    except ValueError as e:
+        flash(str(e), "danger")
+    except Exception as e:
+        flash(f"Erro ao processar arquivo: {e}", "danger")
+    return redirect(url_for("painel_lider"))
 
-        # Renomear para padrão
-        rename_map = {c: c.strip().lower() for c in df.columns}
-        df = df.rename(columns=rename_map)
-        df = df[list(expected_cols)]
+# ------------------ Eventos (cultos) ------------------
+@app.route("/eventos", methods=["POST"])
+@requer_lider
+def abrir_evento_route():
+    nome = request.form.get("nome", "").strip()
+    congregacao = request.form.get("congregacao", "").strip() or CONGREGACAO_PADRAO
+    if not nome:
+        flash("Informe o nome do evento", "warning")
+        return redirect(url_for("painel_lider"))
 
-        registros = df.fillna("").to_dict(orient="records")
-        inseridos = 0
+    try:
         with engine.begin() as conn:
-            for r in registros:
-                if not r.get("nome"):
-                    continue
-                conn.execute(
-                    text("INSERT INTO membros (nome, grupo, telefone, email) VALUES (:n, :g, :t, :e)"),
-                    {"n": r.get("nome"), "g": r.get("grupo"), "t": r.get("telefone"), "e": r.get("email")}
-                )
-                inseridos += 1
-        flash(f"Upload concluído. {inseridos} obreiros adicionados.", "success")
+            evento_id = abrir_evento(conn, nome, congregacao)
+        session["evento_id"] = evento_id
+        session["congregacao"] = congregacao
+        painel_snapshot.invalidar()
+        flash(f"Evento \"{nome}\" aberto em {congregacao}. A presença começa zerada.", "success")
     except Exception as e:
-        flash(f"Erro ao processar arquivo: {e}", "danger")
+        flash(f"Erro ao abrir evento: {e}", "danger")
+    return redirect(url_for("painel_lider"))
+
+@app.route("/eventos/<int:evento_id>/encerrar", methods=["POST"])
+@requer_lider
+def encerrar_evento_route(evento_id):
+    try:
+        with engine.begin() as conn:
+            encerrado = encerrar_evento(conn, evento_id)
+        painel_snapshot.invalidar()
+        if encerrado:
+            flash("Evento encerrado.", "success")
+        else:
+            flash("Evento não encontrado ou já encerrado.", "warning")
+    except Exception as e:
+        flash(f"Erro ao encerrar evento: {e}", "danger")
+    return redirect(url_for("painel_lider"))
+
+@app.route("/eventos/<int:evento_id>/selecionar", methods=["POST"])
+@requer_lider
+def selecionar_evento(evento_id):
+    with engine.connect() as conn:
+        evento = conn.execute(
+            text("SELECT id, nome, congregacao FROM eventos WHERE id = :id AND encerrado_em IS NULL"),
+            {"id": evento_id}
+        ).mappings().fetchone()
+    if not evento:
+        flash("Evento não encontrado ou já encerrado.", "warning")
+    else:
+        session["evento_id"] = evento["id"]
+        session["congregacao"] = evento["congregacao"]
+        flash(f"Acompanhando {evento['nome']} ({evento['congregacao']}).", "success")
     return redirect(url_for("painel_lider"))
 
+@app.route("/api/eventos")
+@requer_lider_api
+def api_eventos():
+    with engine.connect() as conn:
+        eventos = eventos_abertos(conn)
+        selecionado = evento_lider(conn)
+    return jsonify({
+        "selecionado": selecionado,
+        "eventos": [
+            {"id": e["id"], "nome": e["nome"], "congregacao": e["congregacao"],
+             "iniciado_em": _formatar_data(e["iniciado_em"])}
+            for e in eventos
+        ],
+    })
+
 # ------------------ Rotas da Ata ------------------
 @app.route("/ata", methods=["GET"]) 
+@requer_lider
 def form_ata():
-    if "tipo_usuario" not in session or session.get("tipo_usuario") != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
-    
     # Buscar lista de presentes atuais
     try:
         with engine.connect() as conn:
             presentes = conn.execute(
-                text("SELECT id, nome, grupo FROM membros WHERE presente = TRUE ORDER BY nome")
+                text("""
+                    SELECT m.id, m.nome, m.grupo
+                      FROM presencas p JOIN membros m ON m.id = p.membro_id
+                     WHERE p.evento_id = :evento
+                     ORDER BY m.nome
+                """),
+                {"evento": evento_lider(conn)}
             ).mappings().all()
     except Exception as e:
         flash(f"Erro ao carregar lista de presentes: {e}", "danger")
@@ -368,11 +3188,8 @@ def form_ata():
                          presentes=presentes)
 
 @app.route("/ata", methods=["POST"]) 
+@requer_lider
 def salvar_ata():
-    if "tipo_usuario" not in session or session.get("tipo_usuario") != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
-
     data_reuniao = request.form.get("data_reuniao")
     tipo = request.form.get("tipo")
     departamento = request.form.get("departamento")
@@ -385,29 +3202,15 @@ def salvar_ata():
     
     try:
         with engine.begin() as conn:
-            # Buscar informações dos presentes selecionados
-            lista_presentes = []
-            if presentes_selecionados:
-                for membro_id in presentes_selecionados:
-                    membro = conn.execute(
-                        text("SELECT nome, grupo FROM membros WHERE id = :id"),
-                        {"id": membro_id}
-                    ).mappings().fetchone()
-                    if membro:
-                        lista_presentes.append({
-                            "id": membro_id,
-                            "nome": membro["nome"],
-                            "grupo": membro["grupo"]
-                        })
-            
-            # Converter lista para JSON string
-            import json
-            lista_presentes_json = json.dumps(lista_presentes, ensure_ascii=False)
-            
-            conn.execute(
+            # Nomes dos presentes: cache do cadastro, com no máximo um SELECT ... IN para o que faltar
+            membros = roster.obter_varios(presentes_selecionados) if presentes_selecionados else {}
+            ids = list(dict.fromkeys(int(m) for m in presentes_selecionados if int(m) in membros))
+
+            ata_id = conn.execute(
                 text("""
-                    INSERT INTO atas (data_reuniao, tipo, departamento, tema, local, observacoes, lista_presentes)
-                    VALUES (:data_reuniao, :tipo, :departamento, :tema, :local, :observacoes, :lista_presentes)
+                    INSERT INTO atas (data_reuniao, tipo, departamento, tema, local, observacoes, atualizado_em)
+                    VALUES (:data_reuniao, :tipo, :departamento, :tema, :local, :observacoes, :agora)
+                    RETURNING id
                 """),
                 {
                     "data_reuniao": data_reuniao,
@@ -416,129 +3219,315 @@ def salvar_ata():
                     "tema": tema,
                     "local": local,
                     "observacoes": observacoes,
-                    "lista_presentes": lista_presentes_json
+                    "agora": agora_utc(),
                 }
-            )
+            ).scalar()
+            if ids:
+                conn.execute(
+                    text("""
+                        INSERT INTO ata_presentes (ata_id, membro_id, nome, grupo, grupo_busca)
+                        VALUES (:a, :m, :n, :g, :gb)
+                    """),
+                    [{"a": ata_id, "m": i, "n": membros[i]["nome"], "g": membros[i]["grupo"],
+                      "gb": membros[i]["grupo_busca"]} for i in ids]
+                )
+            if data_reuniao:
+                acumular_mes(conn, data_reuniao, atas=1)
+                if ids:
+                    acumular_frequencia(conn, "m.id IN :ids", {"ids": ids}, data_reuniao, presencas_ata=1)
+            indexar_atas(conn, [ata_id])
+        painel_snapshot.invalidar()
         flash("Ata registrada com sucesso!", "success")
         return redirect(url_for("painel_lider"))
     except Exception as e:
         flash(f"Erro ao salvar ata: {e}", "danger")
         return redirect(url_for("form_ata"))
 
+# ------------------ PDF das atas ------------------
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "checkin_pdfs"))
+PDF_CACHE_MAX_MB = float(os.getenv("PDF_CACHE_MAX_MB", "200"))
+PDF_LAYOUT_VERSAO = 2  # incrementar quando o desenho mudar, para invalidar o cache
+
+class CachePdf:
+    """PDFs já gerados, em disco, endereçados por chave (ata) + hash do conteúdo.
+
+    O diretório é compartilhado pelos workers. A ordem de uso (LRU) é o mtime
+    dos arquivos, renovado a cada acerto; ao gravar, os mais antigos saem até
+    o total caber em `limite_bytes`.
+    """
+
+    def __init__(self, diretorio, limite_bytes):
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+
+    def _caminho(self, chave, hash_conteudo):
+        return os.path.join(self.diretorio, f"{chave}_{hash_conteudo}.pdf")
+
+    def abrir(self, chave, hash_conteudo):
+        """Arquivo aberto para leitura, ou None se não estiver no cache."""
+        caminho = self._caminho(chave, hash_conteudo)
+        try:
+            arquivo = open(caminho, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        return arquivo
+
+    def guardar(self, chave, hash_conteudo, dados):
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(chave, hash_conteudo)
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(dados)
+        os.replace(temporario, caminho)
+        self._podar(chave, caminho)
+
+    def _podar(self, chave, atual):
+        arquivos = []
+        for entrada in os.scandir(self.diretorio):
+            if not entrada.name.endswith(".pdf") or entrada.path == atual:
+                continue
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            # Versões antigas da mesma ata nunca mais serão pedidas
+            if entrada.name.startswith(f"{chave}_"):
+                self._remover(entrada.path)
+            else:
+                arquivos.append((info.st_mtime, info.st_size, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in arquivos) + os.path.getsize(atual)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_bytes:
+                break
+            self._remover(caminho)
+            total -= tamanho
+
+    @staticmethod
+    def _remover(caminho):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+pdf_cache = CachePdf(PDF_CACHE_DIR, int(PDF_CACHE_MAX_MB * 1024 * 1024))
+
+def _carregar_atas(conn, ids):
+    """Lista de (ata, presentes) na ordem da reunião, com duas consultas no total."""
+    if not ids:
+        return []
+    atas = conn.execute(
+        _sql("SELECT * FROM atas WHERE id IN :ids ORDER BY data_reuniao, id", {"ids": ids}),
+        {"ids": ids}
+    ).mappings().all()
+    presentes = {ata["id"]: [] for ata in atas}
+    linhas = conn.execute(
+        _sql("SELECT ata_id, nome, grupo FROM ata_presentes WHERE ata_id IN :ids ORDER BY nome", {"ids": ids}),
+        {"ids": ids}
+    ).mappings()
+    for linha in linhas:
+        presentes[linha["ata_id"]].append(linha)
+    return [(ata, presentes[ata["id"]]) for ata in atas]
+
+def versao_atas(conn, filtro, params=None):
+    """(quantidade, última alteração em UTC) das atas do filtro: o validador dos ETags.
+
+    Uma consulta agregada no índice (arquivada, atualizado_em), bem mais barata
+    que carregar as atas e os presentes.
+    """
+    params = params or {}
+    quantidade, ultima = conn.execute(
+        _sql(f"SELECT COUNT(*), MAX(COALESCE(atualizado_em, created_at)) FROM atas WHERE {filtro}", params), params
+    ).one()
+    if isinstance(ultima, str):
+        # SQLite devolve TIMESTAMP como texto ISO
+        ultima = datetime.datetime.fromisoformat(ultima)
+    return quantidade, ultima
+
+def _hash_atas(atas):
+    """Hash do que aparece no PDF: muda quando a ata ou seus presentes mudam."""
+    conteudo = [PDF_LAYOUT_VERSAO] + [
+        [[ata[c] for c in ("id", "data_reuniao", "tipo", "departamento", "tema", "local", "observacoes")],
+         [(p["nome"], p["grupo"]) for p in presentes]]
+        for ata, presentes in atas
+    ]
+    return hashlib.sha256(json.dumps(conteudo, default=str).encode()).hexdigest()[:16]
+
+def _renderizar_pdf(atas):
+    """Desenha uma ou mais atas num único documento e devolve os bytes."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    largura_pagina = letter[0]
+
+    for n, (ata, presentes) in enumerate(atas):
+        if n:
+            c.showPage()
+        y = 750
+
+        def escrever(texto, x, fonte="Helvetica", tamanho=10, entrelinha=15):
+            """Quebra `texto` pela largura real da fonte e avança o cursor."""
+            nonlocal y
+            for linha in simpleSplit(texto, fonte, tamanho, largura_pagina - x - 72) or [""]:
+                if y < 100:  # Nova página se necessário
+                    c.showPage()
+                    y = 750
+                c.setFont(fonte, tamanho)
+                c.drawString(x, y, linha)
+                y -= entrelinha
+
+        # Cabeçalho
+        escrever("ASSEMBLEIA DE DEUS - FIDELIDADE", 100, "Helvetica-Bold", 16, 20)
+        escrever(f"ATA DE {ata['tipo'] or 'REUNIÃO'}", 100, tamanho=12, entrelinha=30)
+
+        # Informações da reunião
+        escrever(f"Data: {ata['data_reuniao']}", 100, tamanho=12, entrelinha=20)
+        escrever(f"Tipo: {ata['tipo']}", 100, tamanho=12, entrelinha=20)
+        escrever(f"Departamento: {ata['departamento']}", 100, tamanho=12, entrelinha=20)
+        escrever(f"Tema: {ata['tema']}", 100, tamanho=12, entrelinha=20)
+        escrever(f"Local: {ata['local']}", 100, tamanho=12, entrelinha=20)
+        y -= 10
+
+        # Lista de presentes
+        escrever("LISTA DE PRESENTES:", 100, "Helvetica-Bold", 12, 20)
+        for i, presente in enumerate(presentes):
+            escrever(f"{i+1}. {presente['nome']} - {presente['grupo']}", 120)
+
+        # Observações
+        if ata["observacoes"]:
+            y -= 30
+            escrever("OBSERVAÇÕES:", 100, "Helvetica-Bold", 12, 20)
+            for paragrafo in ata["observacoes"].splitlines():
+                escrever(paragrafo.strip(), 100)
+
+    c.save()
+    return buffer.getvalue()
+
+def pdf_atas(ids, chave, nome_arquivo=None):
+    """PDF com as atas `ids`, do cache ou gerado agora.
+
+    Retorna (arquivo aberto, nome_arquivo) ou None se nenhuma ata existir.
+    """
+    with engine.connect() as conn:
+        atas = _carregar_atas(conn, ids)
+    if not atas:
+        return None
+    if nome_arquivo is None:
+        nome_arquivo = f"ata_{atas[0][0]['data_reuniao']}.pdf"
+
+    hash_conteudo = _hash_atas(atas)
+    arquivo = pdf_cache.abrir(chave, hash_conteudo)
+    if arquivo is not None:
+        return arquivo, nome_arquivo
+
+    pdf = _renderizar_pdf(atas)
+    try:
+        pdf_cache.guardar(chave, hash_conteudo, pdf)
+    except OSError as e:
+        print(f"⚠️ Não foi possível gravar o PDF no cache: {e}")
+    return BytesIO(pdf), nome_arquivo
+
+def pdf_ata(ata_id):
+    return pdf_atas([ata_id], f"ata_{ata_id}")
+
+def _ids_lote_pdf():
+    """Atas do lote: ?ids=1&ids=2 ou um período (data_inicio/data_fim)."""
+    ids = [int(i) for i in request.args.getlist("ids")]
+    if ids:
+        return ids
+    params, filtros = {}, []
+    _periodo(params, "data_reuniao", filtros, com_hora=False)
+    if not filtros:
+        raise ValueError("Informe as atas (ids) ou um período")
+    with engine.connect() as conn:
+        return list(conn.execute(
+            text(f"SELECT id FROM atas WHERE {' AND '.join(filtros)}"), params
+        ).scalars())
+
+def _job_pdf_atas(ids, chave, nome_arquivo=None):
+    resultado = pdf_atas(ids, chave, nome_arquivo)
+    if resultado is None:
+        raise ValueError("Ata não encontrada")
+    arquivo, nome_arquivo = resultado
+    with arquivo:
+        return {"atas": ids, "arquivo": (arquivo.read(), nome_arquivo, "application/pdf")}
+
+def _job_pre_renderizar_pdf(ata_id):
+    resultado = pdf_ata(ata_id)
+    if resultado is not None:
+        resultado[0].close()
+    return {"ata_id": ata_id}
+
+def _enviar_pdf(resultado):
+    arquivo, nome_arquivo = resultado
+    return send_file(arquivo, as_attachment=True, download_name=nome_arquivo, mimetype='application/pdf')
+
 @app.route("/gerar_ata_pdf/<int:ata_id>")
+@requer_lider
 def gerar_ata_pdf(ata_id):
-    if "tipo_usuario" not in session or session.get("tipo_usuario") != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
+    if request.args.get("async"):
+        return _resposta_job(enfileirar_job("pdf_ata", _job_pdf_atas, [ata_id], f"ata_{ata_id}"))
     
     try:
         with engine.connect() as conn:
-            ata = conn.execute(
-                text("SELECT * FROM atas WHERE id = :id"),
-                {"id": ata_id}
-            ).mappings().fetchone()
-            
-            if not ata:
-                flash("Ata não encontrada", "danger")
-                return redirect(url_for("painel_lider"))
-            
-            # Converter lista de presentes de volta para objeto
-            import json
-            lista_presentes = json.loads(ata["lista_presentes"]) if ata["lista_presentes"] else []
-            
-            # Criar PDF simples (pode ser substituído por uma biblioteca mais robusta)
-            from reportlab.lib.pagesizes import letter
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.utils import ImageReader
-            import io
-            
-            buffer = io.BytesIO()
-            c = canvas.Canvas(buffer, pagesize=letter)
-            
-            # Cabeçalho
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(100, 750, "ASSEMBLEIA DE DEUS - FIDELIDADE")
-            c.setFont("Helvetica", 12)
-            c.drawString(100, 730, f"ATA DE {ata['tipo'] or 'REUNIÃO'}")
-            
-            # Informações da reunião
-            y = 700
-            c.drawString(100, y, f"Data: {ata['data_reuniao']}")
-            y -= 20
-            c.drawString(100, y, f"Tipo: {ata['tipo']}")
-            y -= 20
-            c.drawString(100, y, f"Departamento: {ata['departamento']}")
-            y -= 20
-            c.drawString(100, y, f"Tema: {ata['tema']}")
-            y -= 20
-            c.drawString(100, y, f"Local: {ata['local']}")
-            y -= 30
-            
-            # Lista de presentes
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(100, y, "LISTA DE PRESENTES:")
-            y -= 20
-            c.setFont("Helvetica", 10)
-            
-            for i, presente in enumerate(lista_presentes):
-                if y < 100:  # Nova página se necessário
-                    c.showPage()
-                    y = 750
-                    c.setFont("Helvetica", 10)
-                
-                c.drawString(120, y, f"{i+1}. {presente['nome']} - {presente['grupo']}")
-                y -= 15
-            
-            # Observações
-            if ata['observacoes'] and y > 150:
-                y -= 30
-                c.setFont("Helvetica-Bold", 12)
-                c.drawString(100, y, "OBSERVAÇÕES:")
-                y -= 20
-                c.setFont("Helvetica", 10)
-                # Quebrar texto longo
-                observacoes = ata['observacoes']
-                lines = []
-                words = observacoes.split()
-                line = ""
-                for word in words:
-                    if len(line + " " + word) <= 80:
-                        line += " " + word
-                    else:
-                        lines.append(line)
-                        line = word
-                if line:
-                    lines.append(line)
-                
-                for line in lines:
-                    if y < 100:
-                        c.showPage()
-                        y = 750
-                        c.setFont("Helvetica", 10)
-                    c.drawString(100, y, line.strip())
-                    y -= 15
-            
-            c.save()
-            buffer.seek(0)
-            
-            return send_file(buffer, as_attachment=True, download_name=f"ata_{ata['data_reuniao']}.pdf", mimetype='application/pdf')
-            
+            versao = versao_atas(conn, "id = :id", {"id": ata_id})
+        if versao[0] == 0:
+            flash("Ata não encontrada", "danger")
+            return redirect(url_for("painel_lider"))
+
+        # Quem já baixou esta versão da ata recebe 304 sem abrir o cache de PDFs
+        return resposta_condicional(["pdf", ata_id, PDF_LAYOUT_VERSAO, versao],
+                                    lambda: _enviar_pdf(pdf_ata(ata_id)), versao[1])
     except Exception as e:
         flash(f"Erro ao gerar PDF: {e}", "danger")
         return redirect(url_for("painel_lider"))
 
+@app.route("/gerar_atas_pdf")
+@requer_lider
+def gerar_atas_pdf():
+    """Várias atas num único PDF (uma por página)."""
+    try:
+        ids = _ids_lote_pdf()
+    except ValueError as e:
+        flash(f"Lote de atas inválido: {e}", "warning")
+        return redirect(url_for("visualizar_atas_arquivadas"))
+
+    chave = f"lote_{hashlib.sha256(','.join(map(str, sorted(ids))).encode()).hexdigest()[:12]}"
+    nome_arquivo = f"atas_{datetime.date.today():%Y%m%d}.pdf"
+    if request.args.get("async"):
+        return _resposta_job(enfileirar_job("pdf_atas", _job_pdf_atas, ids, chave, nome_arquivo))
+
+    try:
+        with engine.connect() as conn:
+            versao = versao_atas(conn, "id IN :ids", {"ids": ids})
+        if versao[0] == 0:
+            flash("Nenhuma ata encontrada", "warning")
+            return redirect(url_for("visualizar_atas_arquivadas"))
+
+        return resposta_condicional(["pdf", chave, nome_arquivo, PDF_LAYOUT_VERSAO, versao],
+                                    lambda: _enviar_pdf(pdf_atas(ids, chave, nome_arquivo)), versao[1])
+    except Exception as e:
+        flash(f"Erro ao gerar PDF: {e}", "danger")
+        return redirect(url_for("visualizar_atas_arquivadas"))
+
 @app.route("/arquivar_ata/<int:ata_id>", methods=["POST"])
+@requer_lider
 def arquivar_ata(ata_id):
-    if "tipo_usuario" not in session or session.get("tipo_usuario") != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
-    
     try:
         with engine.begin() as conn:
             conn.execute(
-                text("UPDATE atas SET arquivada = TRUE WHERE id = :id"),
-                {"id": ata_id}
+                text("UPDATE atas SET arquivada = TRUE, atualizado_em = :agora WHERE id = :id"),
+                {"id": ata_id, "agora": agora_utc()}
             )
+        painel_snapshot.invalidar()
+        # Ata arquivada não muda mais: deixa o PDF pronto para os downloads
+        enfileirar_job("pdf_ata", _job_pre_renderizar_pdf, ata_id)
         flash("Ata arquivada com sucesso!", "success")
     except Exception as e:
         flash(f"Erro ao arquivar ata: {e}", "danger")
@@ -546,40 +3535,454 @@ def arquivar_ata(ata_id):
     return redirect(url_for("painel_lider"))
 
 @app.route("/visualizar_atas_arquivadas")
+@requer_lider
 def visualizar_atas_arquivadas():
-    if "tipo_usuario" not in session or session.get("tipo_usuario") != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
-    
+    busca = {campo: request.args.get(campo, "").strip() for campo in ("q", "tipo", "departamento")}
+    params = {}
+    filtros = ["a.arquivada = TRUE"]
+    for campo in ("tipo", "departamento"):
+        if busca[campo]:
+            params[campo] = busca[campo]
+            filtros.append(f"a.{campo} = :{campo}")
+    try:
+        pagina = max(int(request.args.get("pagina", 1)), 1)
+        _periodo(params, "a.data_reuniao", filtros, com_hora=False)
+    except ValueError:
+        flash("Filtro inválido na busca de atas", "warning")
+        return redirect(url_for("visualizar_atas_arquivadas"))
+
+    def renderizar():
+        try:
+            with engine.connect() as conn:
+                # Só a página pedida sai do banco; a busca usa o índice de texto (FTS5/tsvector)
+                atas_arquivadas, tem_proxima = buscar_atas(conn, busca["q"], filtros, params, pagina)
+                # Presentes de todas as atas exibidas numa única consulta
+                presentes_por_ata = {ata["id"]: [] for ata in atas_arquivadas}
+                if presentes_por_ata:
+                    presentes = conn.execute(
+                        _sql("SELECT ata_id, nome, grupo FROM ata_presentes WHERE ata_id IN :ids ORDER BY nome",
+                             {"ids": list(presentes_por_ata)}),
+                        {"ids": list(presentes_por_ata)}
+                    ).mappings()
+                    for presente in presentes:
+                        presentes_por_ata[presente["ata_id"]].append(presente)
+
+            return render_template("atas_arquivadas.html", atas=atas_arquivadas, presentes_por_ata=presentes_por_ata,
+                                   pagina=pagina, tem_proxima=tem_proxima, busca=busca,
+                                   args_pagina={k: v for k, v in request.args.items() if k != "pagina"})
+        except Exception as e:
+            flash(f"Erro ao carregar atas arquivadas: {e}", "danger")
+            return redirect(url_for("painel_lider"))
+
     try:
         with engine.connect() as conn:
-            atas_arquivadas = conn.execute(
-                text("SELECT * FROM atas WHERE arquivada = TRUE ORDER BY data_reuniao DESC")
-            ).mappings().all()
-            
-        return render_template("atas_arquivadas.html", atas=atas_arquivadas)
+            versao = versao_atas(conn, "arquivada = TRUE")
     except Exception as e:
         flash(f"Erro ao carregar atas arquivadas: {e}", "danger")
         return redirect(url_for("painel_lider"))
+    # Nada arquivado mudou desde a última visita a esta mesma busca/página: 304
+    # sem buscar nem renderizar. A busca normalizada entra na chave do ETag.
+    consulta = [busca["q"], busca["tipo"], busca["departamento"], pagina,
+                *(str(params.get(chave, "")) for chave in ("di", "df"))]
+    return resposta_condicional(["atas_arquivadas", consulta, versao], renderizar, versao[1])
 
 @app.route("/remover_obreiro/<int:id>", methods=["POST"])
+@requer_lider
 def remover_obreiro(id):
-    if "tipo_usuario" not in session or session["tipo_usuario"] != "lider":
-        flash("Acesso não autorizado", "danger")
-        return redirect(url_for("login_lider"))
-    
     try:
         with engine.begin() as conn:
+            descontar_frequencia_membro(conn, id)
             conn.execute(
                 text("DELETE FROM membros WHERE id = :id"),
                 {"id": id}
             )
+            # O histórico em checkins é preservado; só a presença atual sai
+            conn.execute(text("DELETE FROM presencas WHERE membro_id = :id"), {"id": id})
+            versao = publicar_alteracao_roster(conn)
+        roster.remover(versao, id)
+        painel_snapshot.invalidar()
         flash("Obreiro removido com sucesso!", "success")
     except Exception as e:
         flash(f"Erro ao remover obreiro: {e}", "danger")
     
     return redirect(url_for("painel_lider"))
 
+# ------------------ Tarefas em segundo plano (status e download) ------------------
+@app.route("/jobs/<job_id>")
+@requer_lider_api
+def status_job(job_id):
+    with engine.connect() as conn:
+        job = conn.execute(
+            text("SELECT * FROM jobs WHERE id = :id"), {"id": job_id}
+        ).mappings().fetchone()
+    if not job:
+        return jsonify({"erro": "Tarefa não encontrada"}), 404
+
+    resposta = {
+        "job_id": job["id"],
+        "tipo": job["tipo"],
+        "status": job["status"],
+        "erro": job["erro"],
+        "resultado": json.loads(job["resultado"]) if job["resultado"] else None,
+        "criado": str(job["criado"]) if job["criado"] else None,
+        "concluido": str(job["concluido"]) if job["concluido"] else None,
+    }
+    if job["arquivo"]:
+        resposta["download_url"] = url_for("download_job", job_id=job_id)
+    return jsonify(resposta)
+
+@app.route("/jobs/<job_id>/download")
+@requer_lider
+def download_job(job_id):
+    with engine.connect() as conn:
+        job = conn.execute(
+            text("SELECT status, arquivo, nome_arquivo, mimetype FROM jobs WHERE id = :id"), {"id": job_id}
+        ).mappings().fetchone()
+    if not job or job["status"] != "concluido" or not job["arquivo"] or not os.path.exists(job["arquivo"]):
+        flash("Arquivo ainda não disponível.", "warning")
+        return redirect(url_for("painel_lider"))
+    return send_file(job["arquivo"], as_attachment=True, download_name=job["nome_arquivo"], mimetype=job["mimetype"])
+
+# ------------------ Administração ------------------
+@app.route("/admin/pool")
+@requer_lider_api
+def admin_pool():
+    """Saúde do pool de conexões deste worker (cada worker do gunicorn tem o seu)."""
+    return jsonify(status_pool())
+
+@app.route("/admin/metricas")
+@requer_lider_api
+def admin_metricas():
+    """Latência por rota, consultas por requisição, templates, SQL lento e perfis (deste worker)."""
+    return jsonify({"worker_pid": os.getpid(), **metricas.resumo()})
+
+@app.route("/admin/perfis/<int:indice>")
+@requer_lider
+def admin_perfil(indice):
+    """Saída do cProfile de uma requisição amostrada (ou pedida com ?_perfil=1)."""
+    perfis = list(metricas.perfis)
+    if not 0 <= indice < len(perfis):
+        return Response("Perfil não encontrado\n", status=404, mimetype="text/plain")
+    return Response(perfis[indice]["texto"], mimetype="text/plain")
+
+@app.route("/metrics")
+def metrics_prometheus():
+    """Métricas no formato do Prometheus, para um coletor local (ou com METRICAS_TOKEN)."""
+    local = request.remote_addr in ("127.0.0.1", "::1")
+    token_ok = METRICAS_TOKEN and secrets.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {METRICAS_TOKEN}"
+    )
+    if not (local or token_ok or session.get("tipo_usuario") == "lider"):
+        return jsonify({"erro": "Acesso não autorizado"}), 401
+    return Response(metricas.prometheus(), mimetype="text/plain; version=0.0.4")
+
+# ------------------ Exportação de presença (CSV/XLSX) ------------------
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "1000"))  # linhas por ida ao cursor
+FORMATOS_EXPORTACAO = {"csv": "text/csv; charset=utf-8", "xlsx": MIMETYPE_XLSX}
+
+def _stream_consulta(sql, params):
+    """Itera o resultado com cursor do lado do servidor, buscando EXPORTACAO_LOTE linhas por vez."""
+    with engine.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=EXPORTACAO_LOTE).execute(text(sql), params)
+        for linha in resultado.mappings():
+            yield linha
+
+def _gerar_csv(cabecalho, linhas):
+    # BOM + ";" para o Excel em português abrir o arquivo corretamente
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(cabecalho)
+    yield "\ufeff" + buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for i, linha in enumerate(linhas, 1):
+        writer.writerow(linha)
+        if i % EXPORTACAO_LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _gerar_xlsx(cabecalho, linhas, titulo):
+    # Modo write-only: as linhas vão para arquivos temporários, não ficam na memória
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    ws.append(cabecalho)
+    for linha in linhas:
+        ws.append(list(linha))
+    with tempfile.TemporaryFile() as arquivo:
+        wb.save(arquivo)
+        arquivo.seek(0)
+        while True:
+            bloco = arquivo.read(64 * 1024)
+            if not bloco:
+                break
+            yield bloco
+
+def _resposta_exportacao(nome_base, formato, cabecalho, linhas):
+    if formato == "csv":
+        corpo = _gerar_csv(cabecalho, linhas)
+    else:
+        corpo = _gerar_xlsx(cabecalho, linhas, nome_base[:31])
+    return Response(
+        stream_with_context(corpo),
+        mimetype=FORMATOS_EXPORTACAO[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_base}.{formato}"'}
+    )
+
+@app.template_filter("data_br")
+def _formatar_data(valor, formato="%d/%m/%Y %H:%M"):
+    if isinstance(valor, str):
+        # SQLite devolve DATE/TIMESTAMP como texto ISO
+        try:
+            valor = datetime.datetime.fromisoformat(valor)
+        except ValueError:
+            return valor
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.strftime(formato)
+    return valor or ""
+
+def _periodo(params, coluna, filtros, com_hora=True):
+    """Aplica data_inicio/data_fim (AAAA-MM-DD) da query string sobre `coluna`.
+
+    Use com_hora=False para colunas DATE, que no SQLite são comparadas como texto.
+    """
+    inicio = request.args.get("data_inicio")
+    fim = request.args.get("data_fim")
+    if inicio:
+        params["di"] = datetime.date.fromisoformat(inicio)
+        filtros.append(f"{coluna} >= :di")
+    if fim:
+        params["df"] = datetime.date.fromisoformat(fim) + datetime.timedelta(days=1)
+        filtros.append(f"{coluna} < :df")
+    if com_hora:
+        for chave in ("di", "df"):
+            if chave in params:
+                params[chave] = datetime.datetime.combine(params[chave], datetime.time.min)
+
+@app.route("/exportar/membros.<formato>")
+@requer_lider
+def exportar_membros(formato):
+    if formato not in FORMATOS_EXPORTACAO:
+        flash("Formato de exportação inválido", "warning")
+        return redirect(url_for("painel_lider"))
+
+    with engine.connect() as conn:
+        params = {"evento": evento_lider(conn)}
+    filtros = _filtros_membros(
+        params,
+        prefixo=request.args.get("q", "").strip(),
+        grupo=request.args.get("grupo", "").strip(),
+        status=request.args.get("status", ""),
+    )
+    try:
+        _periodo(params, "p.data_checkin", filtros)
+    except ValueError:
+        flash("Data inválida no filtro de exportação", "warning")
+        return redirect(url_for("painel_lider"))
+
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    sql = f"{SQL_MEMBROS_PRESENCA} {where} ORDER BY m.nome_busca, m.id"
+    linhas = (
+        (m["nome"], m["grupo"], m["telefone"], m["email"], "Sim" if m["presente"] else "Não",
+         _formatar_data(m["data_checkin"]), m["checkin_latitude"], m["checkin_longitude"])
+        for m in _stream_consulta(sql, params)
+    )
+    cabecalho = ["Nome", "Grupo", "Telefone", "Email", "Presente", "Último check-in", "Latitude", "Longitude"]
+    return _resposta_exportacao("obreiros", formato, cabecalho, linhas)
+
+@app.route("/exportar/atas/presentes.<formato>")
+@app.route("/exportar/atas/<int:ata_id>/presentes.<formato>")
+@requer_lider
+def exportar_presentes_atas(formato, ata_id=None):
+    if formato not in FORMATOS_EXPORTACAO:
+        flash("Formato de exportação inválido", "warning")
+        return redirect(url_for("painel_lider"))
+
+    params = {}
+    filtros = []
+    if ata_id is not None:
+        params["id"] = ata_id
+        filtros.append("a.id = :id")
+    try:
+        _periodo(params, "a.data_reuniao", filtros, com_hora=False)
+    except ValueError:
+        flash("Data inválida no filtro de exportação", "warning")
+        return redirect(url_for("visualizar_atas_arquivadas"))
+    if request.args.get("grupo"):
+        params["g"] = normalizar_chave(request.args["grupo"])
+        filtros.append("ap.grupo_busca = :g")
+
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    sql = f"""
+        SELECT a.id, a.data_reuniao, a.tipo, a.departamento, a.tema, ap.nome, ap.grupo
+          FROM atas a JOIN ata_presentes ap ON ap.ata_id = a.id
+          {where}
+         ORDER BY a.data_reuniao, a.id, ap.nome
+    """
+    linhas = (
+        (p["id"], _formatar_data(p["data_reuniao"], "%d/%m/%Y"), p["tipo"], p["departamento"],
+         p["tema"], p["nome"], p["grupo"])
+        for p in _stream_consulta(sql, params)
+    )
+
+    cabecalho = ["Ata", "Data", "Tipo", "Departamento", "Tema", "Nome", "Grupo"]
+    nome_base = f"ata_{ata_id}_presentes" if ata_id is not None else "atas_presentes"
+    return _resposta_exportacao(nome_base, formato, cabecalho, linhas)
+
+# ------------------ Frequência (painel analítico) ------------------
+def resumo_frequencia(por_mes, por_grupo_mes, por_membro, tamanhos_grupo, limite=20):
+    """Pós-processamento vetorizado (pandas/NumPy) dos agregados de frequência.
+
+    Taxa do obreiro = presenças / eventos do período (da congregação
+    consultada); taxa do grupo no mês = presenças / (eventos do mês x
+    obreiros do grupo). A tendência é a
+    inclinação da reta de mínimos quadrados da taxa mensal de cada grupo.
+    """
+    import numpy as np
+    import pandas as pd
+
+    meses = pd.DataFrame(por_mes, columns=["mes", "eventos", "atas"]).set_index("mes").sort_index()
+    total_eventos = int(meses["eventos"].sum())
+    total_atas = int(meses["atas"].sum())
+
+    # Obreiros
+    membros = pd.DataFrame(por_membro, columns=["membro_id", "nome", "grupo", "presencas", "presencas_ata"])
+    membros["taxa"] = np.round(membros["presencas"] / total_eventos, 4) if total_eventos else 0.0
+    membros["taxa_atas"] = np.round(membros["presencas_ata"] / total_atas, 4) if total_atas else 0.0
+    membros = membros.sort_values(["taxa", "presencas_ata", "nome"], ascending=[False, False, True])
+
+    # Grupos: matriz mês x grupo
+    grupos = pd.DataFrame(por_grupo_mes, columns=["mes", "grupo_busca", "grupo", "presencas", "presencas_ata"])
+    rotulos = grupos.groupby("grupo_busca")["grupo"].max()
+    matriz = grupos.pivot_table(index="mes", columns="grupo_busca", values="presencas", aggfunc="sum", fill_value=0)
+    matriz = matriz.reindex(meses.index.union(matriz.index), fill_value=0)
+    eventos_mes = meses["eventos"].reindex(matriz.index, fill_value=0).to_numpy(dtype=float)
+    tamanhos = np.array([tamanhos_grupo.get(g, 0) for g in matriz.columns], dtype=float)
+
+    valores = matriz.to_numpy(dtype=float)
+    denominador = np.outer(eventos_mes, tamanhos)
+    taxas = np.divide(valores, denominador, out=np.zeros_like(valores), where=denominador > 0)
+    x = np.arange(len(matriz.index), dtype=float)
+    x -= x.mean() if len(x) else 0.0
+    variancia = float(x @ x)
+    tendencias = (x @ (taxas - taxas.mean(axis=0))) / variancia if variancia else np.zeros(len(matriz.columns))
+    totais_grupo = valores.sum(axis=0)
+    denominador_total = eventos_mes.sum() * tamanhos
+    taxa_total = np.divide(totais_grupo, denominador_total, out=np.zeros_like(totais_grupo), where=denominador_total > 0)
+
+    return {
+        "meses": list(matriz.index),
+        "totais": {"eventos": total_eventos, "atas": total_atas},
+        "grupos": [
+            {
+                "grupo": rotulos.get(g, g),
+                "obreiros": int(tamanhos[i]),
+                "presencas": int(totais_grupo[i]),
+                "taxa": round(float(taxa_total[i]), 4),
+                "tendencia": round(float(tendencias[i]), 4),
+                "serie": [round(float(t), 4) for t in taxas[:, i]],
+            }
+            for i, g in enumerate(matriz.columns)
+        ],
+        "membros": {
+            "mais_frequentes": membros.head(limite).to_dict(orient="records"),
+            "menos_frequentes": membros.tail(limite).iloc[::-1].to_dict(orient="records"),
+        },
+    }
+
+@app.route("/api/frequencia")
+@requer_lider_api
+def api_frequencia():
+    try:
+        meses = min(max(int(request.args.get("meses", 12)), 1), 120)
+        limite = min(max(int(request.args.get("limite", 20)), 1), 500)
+    except ValueError:
+        return jsonify({"erro": "Parâmetros inválidos"}), 400
+    hoje = datetime.date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - (meses - 1)
+    inicio = f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+    # Taxas por congregação: presenças e eventos dela, mais as atas (congregacao = '')
+    congregacao = request.args.get("congregacao", "").strip() or CONGREGACAO_PADRAO
+    params = {"inicio": inicio, "inicio_dia": f"{inicio}-01", "c": congregacao}
+    filtro_grupo = ""
+    if request.args.get("grupo"):
+        params["g"] = normalizar_chave(request.args["grupo"])
+        filtro_grupo = "AND grupo_busca = :g"
+
+    with engine.connect() as conn:
+        por_mes = conn.execute(
+            text("""
+                SELECT mes, SUM(eventos), SUM(atas) FROM freq_mes
+                 WHERE mes >= :inicio AND congregacao IN (:c, '')
+                 GROUP BY mes
+            """), params
+        ).fetchall()
+        por_grupo_mes = conn.execute(text(f"""
+            SELECT substr(dia, 1, 7) AS mes, grupo_busca, MAX(grupo) AS grupo,
+                   SUM(presencas) AS presencas, SUM(presencas_ata) AS presencas_ata
+              FROM freq_grupo_dia
+             WHERE dia >= :inicio_dia AND congregacao IN (:c, '') {filtro_grupo}
+             GROUP BY substr(dia, 1, 7), grupo_busca
+        """), params).fetchall()
+        por_membro = conn.execute(text(f"""
+            SELECT f.membro_id, m.nome, m.grupo,
+                   SUM(f.presencas) AS presencas, SUM(f.presencas_ata) AS presencas_ata
+              FROM freq_membro_mes f JOIN membros m ON m.id = f.membro_id
+             WHERE f.mes >= :inicio AND f.congregacao IN (:c, '') {filtro_grupo.replace("grupo_busca", "m.grupo_busca")}
+             GROUP BY f.membro_id, m.nome, m.grupo
+        """), params).fetchall()
+
+    # Tamanho de cada grupo sai do snapshot do painel (sem nova varredura de membros)
+    tamanhos = {g["grupo_busca"]: g["total"] for g in painel_snapshot.obter()["por_grupo"]}
+    resumo = resumo_frequencia(por_mes, por_grupo_mes, por_membro, tamanhos, limite=limite)
+    resumo["periodo"] = {"inicio": inicio, "meses": meses, "congregacao": congregacao}
+    return jsonify(resumo)
+
+def _job_reconstruir_frequencia():
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        reconstruir_frequencia(conn)
+    return {"segundos": round(time.perf_counter() - inicio, 3)}
+
+@app.route("/api/frequencia/reconstruir", methods=["POST"])
+@requer_lider_api
+def reconstruir_frequencia_route():
+    return _resposta_job(enfileirar_job("reconstruir_frequencia", _job_reconstruir_frequencia))
+
+@app.cli.command("reconstruir-frequencia")
+def reconstruir_frequencia_cli():
+    """Recalcula do zero os agregados de frequência."""
+    print(f"✅ Agregados recalculados em {_job_reconstruir_frequencia()['segundos']}s")
+
+@app.route("/api/auditoria/coordenadas")
+@requer_lider_api
+def api_auditoria_coordenadas():
+    """Check-ins com coordenadas fora das geocercas (ou muito longe do padrão)."""
+    params = {}
+    filtros = ["c.latitude IS NOT NULL", "c.longitude IS NOT NULL", "c.presente = TRUE"]
+    try:
+        if request.args.get("evento"):
+            params["e"] = int(request.args["evento"])
+            filtros.append("c.evento_id = :e")
+        _periodo(params, "c.data_checkin", filtros)
+        limite = min(max(int(request.args.get("limite", 200)), 1), 5000)
+    except ValueError:
+        return jsonify({"erro": "Parâmetros inválidos"}), 400
+
+    with engine.connect() as conn:
+        linhas = conn.execute(text(f"""
+            SELECT c.id, c.membro_id, m.nome, m.grupo, c.data_checkin, c.latitude, c.longitude
+              FROM checkins c JOIN membros m ON m.id = c.membro_id
+             WHERE {' AND '.join(filtros)}
+        """), params).fetchall()
+    auditoria = auditar_coordenadas(linhas)
+    auditoria["lista"] = auditoria["lista"][:limite]
+    return jsonify(auditoria)
+
 @app.route("/logout")
 def logout():
     session.clear()
@@ -587,6 +3990,23 @@ def logout():
     return redirect(url_for("index"))
 
 # ------------------ Inicialização ------------------
+_marcar_inicializacao("rotas")
+TEMPOS_INICIALIZACAO["total"] = round((time.perf_counter() - _INICIO_PROCESSO) * 1000, 1)
+print("⏱️ Inicialização em {total} ms (imports {imports}, config {config}, módulo {modulo}, "
+      "banco {banco}, rotas {rotas})".format(**TEMPOS_INICIALIZACAO))
+
+@app.before_request
+def _medir_primeira_requisicao():
+    if "primeira_requisicao" not in TEMPOS_INICIALIZACAO:
+        TEMPOS_INICIALIZACAO["primeira_requisicao"] = round((time.perf_counter() - _INICIO_PROCESSO) * 1000, 1)
+        print(f"⏱️ Primeira requisição {TEMPOS_INICIALIZACAO['primeira_requisicao']} ms após o início do processo")
+
+@app.route("/admin/inicializacao")
+@requer_lider_api
+def admin_inicializacao():
+    """Relatório de inicialização deste worker."""
+    return jsonify({"worker_pid": os.getpid(), "versao_schema": VERSAO_SCHEMA, "tempos_ms": TEMPOS_INICIALIZACAO})
+
 if __name__ == "__main__":
     port = 5000
     print(f"🚀 Servidor iniciado em http://localhost:{port}")
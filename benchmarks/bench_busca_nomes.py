@@ -0,0 +1,111 @@
+"""Benchmark da busca aproximada de nomes (IndiceNomes).
+
+Monta o índice de trigramas com obreiros sintéticos (nomes brasileiros
+combinados) e mede a latência das buscas com erros típicos de digitação:
+sem acento, sem o último sobrenome e com uma letra trocada. Mede também o
+custo de manter o índice (inserir e remover um obreiro).
+
+Os nomes sintéticos saem de poucas dezenas de palavras, então cada palavra
+aparece em milhares de obreiros: é um caso pior que um cadastro real. Tirar
+o último sobrenome deixa vários homônimos, por isso a coluna "sugerido"
+(obreiro certo entre as sugestões) importa mais que "1º lugar".
+
+Uso:
+    python benchmarks/bench_busca_nomes.py --membros 10000,50000 --buscas 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRENOMES = ["João", "José", "Antônio", "Francisco", "Carlos", "Paulo", "Pedro", "Lucas", "Luís", "Marcos",
+            "Maria", "Ana", "Francisca", "Antônia", "Adriana", "Juliana", "Márcia", "Fernanda", "Patrícia",
+            "Aline", "Sebastião", "Raimundo", "Cícero", "Damião", "Luzia", "Conceição", "Rosângela", "Débora"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+              "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes",
+              "Vieira", "Barbosa", "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques"]
+GRUPOS = ["Evangelismo", "Louvor", "Intercessão", "Diaconato", "Ensino"]
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def nomes(total, rnd):
+    vistos = set()
+    while len(vistos) < total:
+        partes = [rnd.choice(PRENOMES)] + rnd.sample(SOBRENOMES, rnd.randint(2, 3))
+        vistos.add(" ".join(partes))
+    return sorted(vistos)
+
+
+def digitar_mal(nome, rnd, app_mod):
+    """Variação do nome como alguém digita na porta."""
+    partes = app_mod.normalizar_chave(nome).split()
+    if len(partes) > 2 and rnd.random() < 0.5:
+        partes = partes[:-1]
+    texto = " ".join(partes)
+    if rnd.random() < 0.5:
+        i = rnd.randrange(len(texto))
+        texto = texto[:i] + rnd.choice("aeiou") + texto[i + 1:]
+    return texto
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--membros", default="1000,10000,50000")
+    parser.add_argument("--buscas", type=int, default=2000)
+    args = parser.parse_args()
+
+    # O índice não usa o banco, mas importar o app abre um: usa um SQLite descartável
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_nomes_'), 'bench.db')}"
+    sys.path.insert(0, RAIZ)
+    import app as app_mod
+
+    print(f"{'membros':>9}{'montagem s':>12}{'p50 µs':>9}{'p99 µs':>9}{'1º lugar':>10}{'sugerido':>10}{'inserir µs':>12}{'remover µs':>12}")
+    for total in [int(t) for t in args.membros.split(",")]:
+        rnd = random.Random(42)
+        lista = nomes(total, rnd)
+        indice = app_mod.IndiceNomes()
+
+        inicio = time.perf_counter()
+        for membro_id, nome in enumerate(lista):
+            indice.adicionar(membro_id, app_mod.normalizar_chave(nome), app_mod.normalizar_chave(GRUPOS[membro_id % 5]))
+        montagem = time.perf_counter() - inicio
+
+        latencias, acertos, sugeridos = [], 0, 0
+        for _ in range(args.buscas):
+            membro_id = rnd.randrange(total)
+            consulta = digitar_mal(lista[membro_id], rnd, app_mod)
+            inicio = time.perf_counter()
+            achados = indice.buscar(consulta, GRUPOS[membro_id % 5])
+            latencias.append((time.perf_counter() - inicio) * 1e6)
+            acertos += bool(achados) and achados[0][1] == membro_id
+            sugeridos += membro_id in [a[1] for a in achados]
+
+        manutencao = {"inserir": [], "remover": []}
+        for i in range(200):
+            novo = total + i
+            inicio = time.perf_counter()
+            indice.adicionar(novo, app_mod.normalizar_chave(f"Obreiro Novo {i}"), "louvor")
+            manutencao["inserir"].append((time.perf_counter() - inicio) * 1e6)
+            inicio = time.perf_counter()
+            indice.remover(novo)
+            manutencao["remover"].append((time.perf_counter() - inicio) * 1e6)
+
+        print(f"{total:>9}{montagem:>12.2f}{percentil(latencias, 50):>9.0f}{percentil(latencias, 99):>9.0f}"
+              f"{acertos / args.buscas:>10.1%}{sugeridos / args.buscas:>10.1%}{statistics.mean(manutencao['inserir']):>12.1f}"
+              f"{statistics.mean(manutencao['remover']):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
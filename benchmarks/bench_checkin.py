@@ -0,0 +1,191 @@
+"""Benchmark de carga do check-in (/checkin_obreiro).
+
+Simula a chegada simultânea de obreiros antes do culto: popula o banco com
+obreiros sintéticos e dispara N check-ins concorrentes pelo test client do
+Flask, medindo a latência p50/p99 por requisição. A rota responde toda falha
+com mensagem flash e redirect, então o desfecho de cada check-in sai da
+categoria da mensagem: obreiro cadastrado que não recebe "success" (erro de
+banco, nenhum culto aberto) conta como erro, assim como nome inexistente que
+não volta "não encontrado".
+
+Uso:
+    python benchmarks/bench_checkin.py --membros 5000 --checkins 2000 --concorrencia 50
+    python benchmarks/bench_checkin.py --postgres postgresql+psycopg2://postgres@localhost/checkin_bench
+
+Sem --postgres, roda apenas contra um SQLite temporário. Com --postgres (ou a
+variável BENCH_POSTGRES_URL), roda também contra o Postgres local, que precisa
+ser um banco descartável: o benchmark se recusa a rodar se o nome do banco não
+contiver "bench". Os obreiros sintéticos (grupos "bench-*"), o evento "Culto
+Bench" e os check-ins, avisos e agregados gerados são removidos ao final.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GRUPOS = ["bench-evangelismo", "bench-louvor", "bench-intercessao", "bench-diaconato", "bench-ensino"]
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def popular(app_mod, total):
+    """Insere `total` obreiros sintéticos e devolve a lista (nome, grupo)."""
+    from sqlalchemy import text
+
+    obreiros = [(f"Obreiro Bench {i:06d}", GRUPOS[i % len(GRUPOS)]) for i in range(total)]
+    limpar(app_mod)
+    with app_mod.engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO membros (nome, grupo, nome_busca, grupo_busca) VALUES (:n, :g, :nb, :gb)"),
+            [{"n": n, "g": g, "nb": app_mod.normalizar_chave(n), "gb": app_mod.normalizar_chave(g)}
+             for n, g in obreiros]
+        )
+        # Sem culto aberto todo check-in volta "Nenhum culto aberto"
+        if app_mod.evento_atual(conn) is None:
+            app_mod.abrir_evento(conn, "Culto Bench")
+    return obreiros
+
+
+def desfecho(resp):
+    """registrado, nao_encontrado ou erro, pela mensagem flash do cookie de sessão."""
+    from flask.sessions import session_json_serializer
+    from itsdangerous import URLSafeTimedSerializer
+
+    if resp.status_code == 200:
+        return "nao_encontrado"  # página com sugestões de nomes parecidos
+    if resp.status_code != 302:
+        return "erro"
+    cookie = next((c.split(";", 1)[0].split("=", 1)[1] for c in resp.headers.getlist("Set-Cookie")
+                   if c.startswith("session=")), None)
+    if cookie is None:
+        return "erro"
+    _, dados = URLSafeTimedSerializer("", salt="cookie-session", serializer=session_json_serializer).loads_unsafe(cookie)
+    categoria, mensagem = ((dados or {}).get("_flashes") or [("", "")])[-1]
+    if categoria == "success":
+        return "registrado"
+    return "nao_encontrado" if "não encontrado" in mensagem else "erro"
+
+
+def exigir_banco_descartavel(app_mod):
+    """Aborta se o nome do banco não indicar um banco só de benchmark."""
+    url = app_mod.engine.url
+    if "bench" not in os.path.basename(url.database or ""):
+        raise SystemExit(f"❌ {url.render_as_string(hide_password=True)} não parece um banco descartável: "
+                         f"o nome do banco precisa conter \"bench\"")
+
+
+def limpar(app_mod):
+    """Remove os obreiros sintéticos, o "Culto Bench" e tudo o que os check-ins gravaram."""
+    from sqlalchemy import text
+
+    bench = "SELECT id FROM membros WHERE grupo LIKE 'bench-%'"
+    evento = "SELECT id FROM eventos WHERE nome = 'Culto Bench'"
+    with app_mod.engine.begin() as conn:
+        for tabela in ("presencas", "checkins", "avisos_painel"):
+            conn.execute(text(f"DELETE FROM {tabela} WHERE evento_id IN ({evento}) OR membro_id IN ({bench})"))
+        conn.execute(text(f"DELETE FROM eventos WHERE id IN ({evento})"))
+        conn.execute(text("DELETE FROM membros WHERE grupo LIKE 'bench-%'"))
+        app_mod.publicar_alteracao_roster(conn)
+        app_mod.reconstruir_frequencia(conn)
+    app_mod.roster.invalidar()
+
+
+def executar(args):
+    """Roda o benchmark no banco definido em DATABASE_URL (processo filho)."""
+    sys.path.insert(0, RAIZ)
+    import app as app_mod
+
+    exigir_banco_descartavel(app_mod)
+    obreiros = popular(app_mod, args.membros)
+    rnd = random.Random(42)
+    alvos = [rnd.choice(obreiros) for _ in range(args.checkins)]
+    # Uma fração de nomes inexistentes, como acontece na porta
+    desconhecidos = int(args.checkins * args.desconhecidos)
+    for i in range(desconhecidos):
+        alvos[i] = (f"Visitante {i}", "bench-evangelismo")
+    esperado = {alvo: "nao_encontrado" for alvo in alvos[:desconhecidos]}
+    rnd.shuffle(alvos)
+
+    def checkin(alvo):
+        cliente = app_mod.app.test_client(use_cookies=False)
+        inicio = time.perf_counter()
+        resp = cliente.post("/checkin_obreiro", data={"nome": alvo[0], "grupo": alvo[1]})
+        fim = time.perf_counter()
+        return (fim - inicio) * 1000, desfecho(resp) == esperado.get(alvo, "registrado")
+
+    inicio_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as pool:
+        resultados = list(pool.map(checkin, alvos))
+    duracao = time.perf_counter() - inicio_total
+
+    limpar(app_mod)
+
+    latencias = [r[0] for r in resultados]
+    erros = sum(1 for r in resultados if not r[1])
+    return {
+        "backend": app_mod.engine.dialect.name,
+        "membros": args.membros,
+        "checkins": args.checkins,
+        "concorrencia": args.concorrencia,
+        "erros": erros,
+        "throughput_rps": round(len(resultados) / duracao, 1),
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "media_ms": round(statistics.mean(latencias), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--membros", type=int, default=5000)
+    parser.add_argument("--checkins", type=int, default=2000)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--desconhecidos", type=float, default=0.1, help="fração de nomes inexistentes")
+    parser.add_argument("--postgres", default=os.getenv("BENCH_POSTGRES_URL"))
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(executar(args)))
+        return
+
+    bancos = []
+    tmpdir = tempfile.mkdtemp(prefix="bench_checkin_")
+    bancos.append(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+    if args.postgres:
+        bancos.append(args.postgres)
+
+    repasse = [f"--membros={args.membros}", f"--checkins={args.checkins}",
+               f"--concorrencia={args.concorrencia}", f"--desconhecidos={args.desconhecidos}"]
+    print(f"{'backend':<12}{'membros':>9}{'checkins':>10}{'conc.':>7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'erros':>7}")
+    for url in bancos:
+        env = dict(os.environ, DATABASE_URL=url)
+        saida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--filho", *repasse],
+            env=env, capture_output=True, text=True, cwd=RAIZ
+        )
+        if saida.returncode != 0:
+            print(f"❌ Falha no benchmark com {url}:\n{saida.stderr}")
+            continue
+        r = json.loads(saida.stdout.strip().splitlines()[-1])
+        print(f"{r['backend']:<12}{r['membros']:>9}{r['checkins']:>10}{r['concorrencia']:>7}"
+              f"{r['throughput_rps']:>9}{r['p50_ms']:>9}{r['p99_ms']:>9}{r['erros']:>7}")
+
+
+if __name__ == "__main__":
+    main()
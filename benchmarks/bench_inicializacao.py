@@ -0,0 +1,71 @@
+"""Benchmark de inicialização a frio do app (tempo até a primeira requisição).
+
+Cada rodada é um processo Python novo que importa `app` e atende GET / pelo
+test client, como um worker do gunicorn recém-criado. A primeira rodada usa
+um banco vazio (aplica todas as migrações); as seguintes medem o boot normal,
+que só confere a versão do schema.
+
+Uso:
+    python benchmarks/bench_inicializacao.py --rodadas 10
+    python benchmarks/bench_inicializacao.py --postgres postgresql+psycopg2://postgres@localhost/checkin_bench
+
+Sem --postgres, roda contra um SQLite temporário. Com --postgres (ou a
+variável BENCH_POSTGRES_URL), o banco informado precisa estar vazio para a
+primeira rodada medir as migrações.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FILHO = """
+import json, time
+inicio = time.perf_counter()
+import app
+app.app.test_client().get("/")
+tempos = dict(app.TEMPOS_INICIALIZACAO)
+tempos["ate_primeira_resposta"] = round((time.perf_counter() - inicio) * 1000, 1)
+print(json.dumps(tempos))
+"""
+
+
+def rodar(url):
+    env = dict(os.environ, DATABASE_URL=url)
+    saida = subprocess.run([sys.executable, "-c", FILHO], env=env, capture_output=True, text=True, cwd=RAIZ)
+    if saida.returncode != 0:
+        raise RuntimeError(saida.stderr)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rodadas", type=int, default=10, help="boots normais medidos após o primeiro")
+    parser.add_argument("--postgres", default=os.getenv("BENCH_POSTGRES_URL"))
+    args = parser.parse_args()
+
+    bancos = [f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_init_'), 'bench.db')}"]
+    if args.postgres:
+        bancos.append(args.postgres)
+
+    etapas = ["imports", "config", "modulo", "banco", "rotas", "total", "ate_primeira_resposta"]
+    print(f"{'banco':<12}{'boot':<10}" + "".join(f"{e[:12]:>14}" for e in etapas))
+    for url in bancos:
+        nome = url.split(":", 1)[0].split("+")[0]
+        try:
+            primeiro = rodar(url)
+            normais = [rodar(url) for _ in range(args.rodadas)]
+        except RuntimeError as e:
+            print(f"❌ Falha no benchmark com {url}:\n{e}")
+            continue
+        mediana = {e: round(statistics.median(r[e] for r in normais), 1) for e in etapas}
+        print(f"{nome:<12}{'migração':<10}" + "".join(f"{primeiro[e]:>14}" for e in etapas))
+        print(f"{nome:<12}{'normal':<10}" + "".join(f"{mediana[e]:>14}" for e in etapas))
+
+
+if __name__ == "__main__":
+    main()
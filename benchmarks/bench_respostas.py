@@ -0,0 +1,128 @@
+"""Benchmark de bytes trafegados por página (cabeçalhos + corpo), antes e depois do cache HTTP.
+
+Simula um navegador com cache abrindo cada página várias vezes pelo test
+client. Dois perfis de navegador contra o mesmo servidor:
+
+- antes: o comportamento anterior ao cache HTTP. HTML e JSON sem compressão,
+  páginas sempre completas e arquivos estáticos pelas URLs sem ?v=, que o
+  Flask serve com "no-cache" (cada visita revalida cada arquivo).
+- depois: Accept-Encoding gzip/br, If-None-Match nas páginas e arquivos
+  estáticos versionados (?v=hash, immutable), que não são pedidos de novo.
+
+"1ª visita" é o navegador com cache vazio; "repetida" é a média das visitas
+seguintes sem nada alterado no banco. As requisições feitas também entram na
+tabela: em rede de celular cada ida e volta pesa tanto quanto os bytes.
+
+Uso:
+    python benchmarks/bench_respostas.py --membros 300 --atas 60 --visitas 5
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESTATICOS = re.compile(r"""(?:href|src)=["'](/static/[^"']+)["']""")
+
+
+class Navegador:
+    """Cache de navegador simplificado: guarda ETag/Cache-Control por URL."""
+
+    def __init__(self, cliente, cookies, otimizado):
+        self.cliente = cliente
+        self.cookies = cookies
+        self.otimizado = otimizado
+        self.cache = {}
+        self.bytes = 0
+        self.requisicoes = 0
+
+    def _get(self, url):
+        cabecalhos = {"Cookie": self.cookies} if self.cookies else {}
+        if self.otimizado:
+            cabecalhos["Accept-Encoding"] = "br, gzip"
+        guardado = self.cache.get(url)
+        if guardado is not None:
+            if "immutable" in guardado.get("Cache-Control", ""):
+                return None  # servido do cache, nem sai requisição
+            if guardado.get("ETag"):
+                cabecalhos["If-None-Match"] = guardado["ETag"]
+        resp = self.cliente.get(url, headers=cabecalhos)
+        corpo = resp.get_data()
+        self.requisicoes += 1
+        self.bytes += len(f"HTTP/1.1 {resp.status}\r\n") + len(corpo) + sum(
+            len(f"{k}: {v}\r\n") for k, v in resp.headers.items()
+        ) + 2
+        if resp.status_code == 200 and (self.otimizado or url.startswith("/static/")):
+            self.cache[url] = {k: resp.headers[k] for k in ("ETag", "Cache-Control") if k in resp.headers}
+        resp.close()
+        return resp.mimetype, corpo
+
+    def visitar(self, caminho):
+        resposta = self._get(caminho)
+        if resposta is None or resposta[0] != "text/html":
+            return
+        mimetype, corpo = resposta
+        if self.otimizado and corpo[:2] == b"\x1f\x8b":
+            import gzip
+            corpo = gzip.decompress(corpo)
+        for url in dict.fromkeys(ESTATICOS.findall(corpo.decode("utf-8", "replace"))):
+            if not self.otimizado:
+                url = url.split("?", 1)[0]  # URL sem versão, como os templates geravam antes
+            self._get(url.replace("&amp;", "&"))
+
+
+def medir(cliente, cookies, caminho, otimizado, visitas):
+    navegador = Navegador(cliente, cookies, otimizado)
+    navegador.visitar(caminho)
+    primeira = (navegador.bytes, navegador.requisicoes)
+    for _ in range(visitas):
+        navegador.visitar(caminho)
+    repetida = ((navegador.bytes - primeira[0]) / visitas, (navegador.requisicoes - primeira[1]) / visitas)
+    return primeira, repetida
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--membros", type=int, default=300)
+    parser.add_argument("--atas", type=int, default=60)
+    parser.add_argument("--presentes", type=int, default=40, help="presentes por ata")
+    parser.add_argument("--visitas", type=int, default=5, help="visitas repetidas por página")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_respostas_'), 'bench.db')}"
+    sys.path.insert(0, RAIZ)
+    sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+    import app as app_mod
+    from bench_suite import LIDER, popular
+
+    _, atas = popular(app_mod, args.membros, args.atas, args.presentes)
+    cliente = app_mod.app.test_client(use_cookies=False)
+    resp = cliente.post("/auth_lider", data=LIDER)
+    if resp.status_code != 302:
+        raise SystemExit(f"❌ login do líder falhou ({resp.status_code})")
+    cookies = "; ".join(c.split(";", 1)[0] for c in resp.headers.getlist("Set-Cookie"))
+
+    paginas = [
+        ("quiosque", "/", None),
+        ("painel_lider", "/painel_lider", cookies),
+        ("atas_arquivadas", "/visualizar_atas_arquivadas", cookies),
+        ("atas_busca", "/visualizar_atas_arquivadas?q=Tema", cookies),
+        ("pdf_ata", f"/gerar_ata_pdf/{atas[0]}", cookies),
+        ("sugestoes_json", "/api/obreiros/sugestoes?nome=Obreiro%20Bench%2000001", None),
+    ]
+    print(f"{'página':<18}{'antes 1ª':>11}{'depois 1ª':>11}{'antes rep.':>12}{'depois rep.':>13}{'req. antes':>12}{'req. depois':>13}")
+    totais = [0, 0, 0, 0]
+    for nome, caminho, cookies_pagina in paginas:
+        (antes_1, _), (antes_rep, req_antes) = medir(cliente, cookies_pagina, caminho, False, args.visitas)
+        (depois_1, _), (depois_rep, req_depois) = medir(cliente, cookies_pagina, caminho, True, args.visitas)
+        for i, valor in enumerate((antes_1, depois_1, antes_rep, depois_rep)):
+            totais[i] += valor
+        print(f"{nome:<18}{antes_1:>11,}{depois_1:>11,}{antes_rep:>12,.0f}{depois_rep:>13,.0f}"
+              f"{req_antes:>12.1f}{req_depois:>13.1f}")
+    print(f"{'total':<18}{totais[0]:>11,}{totais[1]:>11,}{totais[2]:>12,.0f}{totais[3]:>13,.0f}")
+    print(f"brotli: {'sim' if app_mod.brotli is not None else 'não instalado (só gzip)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""Suíte de carga do fluxo de check-in, com resultados comparáveis entre commits.
+
+Para cada banco (SQLite temporário e, se informado, um Postgres local) e cada
+tamanho de cadastro, um processo filho:
+
+  1. popula obreiros sintéticos (grupos "bench-*") e milhares de atas;
+  2. mede os cenários pelo test client do Flask (sem rede);
+  3. sobe um gunicorn local e mede os mesmos cenários por HTTP;
+  4. apaga os dados sintéticos.
+
+Cenários: checkin_obreiro, painel_lider, upload_obreiros, salvar_ata e
+gerar_ata_pdf. O resultado (req/s, latências p50/p95/p99 e erros por
+cenário) vai para um JSON em benchmarks/resultados/, nomeado pelo commit atual.
+As rotas de formulário respondem falhas com mensagem flash e redirect, então
+cada cenário confere o desfecho (categoria da mensagem, destino do redirect
+ou corpo JSON), não só o status HTTP.
+
+Uso:
+    python benchmarks/bench_suite.py                                   # 1k/10k/100k obreiros, SQLite
+    python benchmarks/bench_suite.py --tamanhos 1000 --requisicoes 200 --sem-gunicorn
+    python benchmarks/bench_suite.py --postgres postgresql+psycopg2://postgres@localhost/checkin_bench
+    python benchmarks/bench_suite.py --comparar resultados/abc1234.json resultados/def5678.json
+
+O Postgres informado (ou BENCH_POSTGRES_URL) deve ser um banco descartável:
+as tabelas são criadas pelas migrações do app.
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados")
+GRUPOS = ["bench-evangelismo", "bench-louvor", "bench-intercessao", "bench-diaconato", "bench-ensino"]
+LIDER = {"email": "lider@adfidelidade.com", "senha": "admin123"}
+CENARIOS = ["checkin_obreiro", "painel_lider", "upload_obreiros", "salvar_ata", "gerar_ata_pdf"]
+
+# status, Location e mensagens flash [(categoria, texto)] do cookie de sessão do visitante
+Resposta = collections.namedtuple("Resposta", "status local flashes")
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+# ------------------ Dados sintéticos ------------------
+def popular(app_mod, membros, atas, presentes_por_ata):
+    """Insere obreiros e atas sintéticos. Devolve (obreiros [(id, nome, grupo)], ids das atas)."""
+    from sqlalchemy import text
+
+    limpar(app_mod)
+    nomes = [(f"Obreiro Bench {i:06d}", GRUPOS[i % len(GRUPOS)]) for i in range(membros)]
+    with app_mod.engine.begin() as conn:
+        for inicio in range(0, membros, 5000):
+            conn.execute(
+                text("INSERT INTO membros (nome, grupo, nome_busca, grupo_busca) VALUES (:n, :g, :nb, :gb)"),
+                [{"n": n, "g": g, "nb": app_mod.normalizar_chave(n), "gb": app_mod.normalizar_chave(g)}
+                 for n, g in nomes[inicio:inicio + 5000]]
+            )
+        app_mod.publicar_alteracao_roster(conn)
+        obreiros = [tuple(r) for r in conn.execute(
+            text("SELECT id, nome, grupo FROM membros WHERE grupo LIKE 'bench-%' ORDER BY id")
+        )]
+
+        rnd = random.Random(7)
+        hoje = datetime.date.today()
+        for i in range(atas):
+            ata_id = conn.execute(
+                text("""
+                    INSERT INTO atas (data_reuniao, tipo, departamento, tema, local, observacoes, arquivada)
+                    VALUES (:d, 'bench', 'Bench', :t, 'Templo', :o, TRUE) RETURNING id
+                """),
+                {"d": (hoje - datetime.timedelta(days=i % 730)).isoformat(), "t": f"Tema {i}", "o": "Observação de teste. " * 20}
+            ).scalar()
+            escolhidos = rnd.sample(obreiros, min(presentes_por_ata, len(obreiros)))
+            conn.execute(
+                text("""
+                    INSERT INTO ata_presentes (ata_id, membro_id, nome, grupo, grupo_busca)
+                    VALUES (:a, :m, :n, :g, :gb)
+                """),
+                [{"a": ata_id, "m": m, "n": n, "g": g, "gb": app_mod.normalizar_chave(g)} for m, n, g in escolhidos]
+            )
+        ids_atas = list(conn.execute(text("SELECT id FROM atas WHERE tipo = 'bench'")).scalars())
+        # Sem culto aberto todo check-in volta "Nenhum culto aberto"
+        if app_mod.evento_atual(conn) is None:
+            app_mod.abrir_evento(conn, "Culto Bench")
+    app_mod.roster.invalidar()
+    return obreiros, ids_atas
+
+
+def limpar(app_mod):
+    from sqlalchemy import text
+
+    bench = "SELECT id FROM membros WHERE grupo LIKE 'bench-%'"
+    evento = "SELECT id FROM eventos WHERE nome = 'Culto Bench'"
+    with app_mod.engine.begin() as conn:
+        conn.execute(text("DELETE FROM ata_presentes WHERE ata_id IN (SELECT id FROM atas WHERE tipo = 'bench')"))
+        conn.execute(text("DELETE FROM atas WHERE tipo = 'bench'"))
+        for tabela in ("presencas", "checkins", "avisos_painel"):
+            conn.execute(text(f"DELETE FROM {tabela} WHERE evento_id IN ({evento}) OR membro_id IN ({bench})"))
+        conn.execute(text(f"DELETE FROM freq_membro_mes WHERE membro_id IN ({bench})"))
+        conn.execute(text("DELETE FROM freq_grupo_dia WHERE grupo_busca LIKE 'bench-%'"))
+        conn.execute(text(f"DELETE FROM eventos WHERE id IN ({evento})"))
+        conn.execute(text("DELETE FROM membros WHERE grupo LIKE 'bench-%'"))
+        app_mod.publicar_alteracao_roster(conn)
+        app_mod.reconstruir_frequencia(conn)
+    app_mod.roster.invalidar()
+
+
+def planilha(linhas, rodada):
+    """Bytes de um .xlsx no formato do modelo, com nomes inéditos por rodada."""
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "nome": [f"Importado Bench {rodada:03d}-{i:06d}" for i in range(linhas)],
+        "grupo": [GRUPOS[i % len(GRUPOS)] for i in range(linhas)],
+        "telefone": ["(11) 90000-0000"] * linhas,
+        "email": [""] * linhas,
+    })
+    saida = BytesIO()
+    df.to_excel(saida, index=False)
+    return saida.getvalue()
+
+
+# ------------------ Clientes (test client e HTTP) ------------------
+def flashes_do_cookie(valor):
+    """Mensagens flash guardadas no cookie de sessão assinado do Flask.
+
+    Só decodifica o conteúdo, sem conferir a assinatura: o gunicorn pode estar
+    com outra SECRET_KEY. Sessões de líder ficam no servidor e não aparecem aqui.
+    """
+    if not valor:
+        return []
+    from flask.sessions import session_json_serializer
+    from itsdangerous import URLSafeTimedSerializer
+
+    _, dados = URLSafeTimedSerializer("", salt="cookie-session", serializer=session_json_serializer).loads_unsafe(valor)
+    return list((dados or {}).get("_flashes", []))
+
+
+class ClienteTeste:
+    """Requisições pelo test client do Flask, sem rede; um cliente por thread."""
+
+    nome = "test_client"
+
+    def __init__(self, app_mod):
+        self.app_mod = app_mod
+        self._local = threading.local()
+        # Um login só (o limite de tentativas é por IP); os cookies vão no cabeçalho de cada requisição
+        resp = app_mod.app.test_client().post("/auth_lider", data=LIDER)
+        if resp.status_code != 302:
+            raise RuntimeError(f"login do líder falhou ({resp.status_code})")
+        self._cookies_lider = "; ".join(c.split(";", 1)[0] for c in resp.headers.getlist("Set-Cookie"))
+
+    def requisitar(self, metodo, caminho, lider=False, dados=None, arquivos=None, cabecalhos=None):
+        cliente = getattr(self._local, "cliente", None)
+        if cliente is None:
+            cliente = self._local.cliente = self.app_mod.app.test_client(use_cookies=False)
+        dados = dict(dados or {})
+        for campo, (nome_arquivo, conteudo) in (arquivos or {}).items():
+            dados[campo] = (BytesIO(conteudo), nome_arquivo)
+        cabecalhos = dict(cabecalhos or {})
+        if lider:
+            cabecalhos["Cookie"] = self._cookies_lider
+        resp = cliente.open(caminho, method=metodo, data=dados or None, headers=cabecalhos)
+        resp.get_data()
+        resp.close()
+        sessao = next((c.split(";", 1)[0].split("=", 1)[1] for c in resp.headers.getlist("Set-Cookie")
+                       if c.startswith("session=")), None)
+        return Resposta(resp.status_code, resp.headers.get("Location"), flashes_do_cookie(sessao))
+
+
+class ClienteHttp:
+    """Requisições HTTP contra um gunicorn local; uma sessão (cookies) por thread."""
+
+    nome = "gunicorn"
+
+    def __init__(self, base):
+        import requests
+
+        self.requests = requests
+        self.base = base
+        self._local = threading.local()
+        # Um login só (o limite de tentativas é por IP); o cookie é copiado para cada thread
+        sessao = requests.Session()
+        resp = sessao.post(f"{base}/auth_lider", data=LIDER, allow_redirects=False)
+        if resp.status_code != 302:
+            raise RuntimeError(f"login do líder falhou ({resp.status_code})")
+        self._cookies_lider = sessao.cookies.get_dict()
+
+    def _sessao(self, lider):
+        chave = "lider" if lider else "anonimo"
+        sessao = getattr(self._local, chave, None)
+        if sessao is None:
+            sessao = self.requests.Session()
+            if lider:
+                sessao.cookies.update(self._cookies_lider)
+            setattr(self._local, chave, sessao)
+        return sessao
+
+    def requisitar(self, metodo, caminho, lider=False, dados=None, arquivos=None, cabecalhos=None):
+        resp = self._sessao(lider).request(
+            metodo, f"{self.base}{caminho}", data=dados,
+            files={c: (n, conteudo) for c, (n, conteudo) in (arquivos or {}).items()} or None,
+            headers=cabecalhos, allow_redirects=False,
+        )
+        if not lider:
+            # O redirect não é seguido: sem isto as mensagens flash se acumulariam no cookie
+            self._sessao(lider).cookies.clear()
+        return Resposta(resp.status_code, resp.headers.get("Location"), flashes_do_cookie(resp.cookies.get("session")))
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def subir_gunicorn(workers, threads):
+    """Sobe `gunicorn app:app` com o DATABASE_URL atual e espera a porta abrir."""
+    porta = porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:app", "-b", f"127.0.0.1:{porta}",
+         "-w", str(workers), "--threads", str(threads), "--log-level", "warning"],
+        cwd=RAIZ, env=dict(os.environ, WEB_CONCURRENCY=str(workers)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"gunicorn terminou ao subir:\n{processo.stderr.read()}")
+        try:
+            with socket.create_connection(("127.0.0.1", porta), timeout=0.5):
+                return processo, f"http://127.0.0.1:{porta}"
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("gunicorn não abriu a porta em 60s")
+
+
+# ------------------ Cenários ------------------
+def medir(cliente, chamadas, concorrencia, sucesso=lambda r: r.status < 400):
+    """Executa as chamadas (funções sem argumento que devolvem uma Resposta) e resume.
+
+    `sucesso` diz se a Resposta é o desfecho esperado; as demais contam como erros.
+    """
+    def uma(chamada):
+        inicio = time.perf_counter()
+        try:
+            ok = sucesso(chamada())
+        except Exception:
+            ok = False
+        return (time.perf_counter() - inicio) * 1000, ok
+
+    inicio_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        resultados = list(pool.map(uma, chamadas))
+    duracao = time.perf_counter() - inicio_total
+    latencias = [r[0] for r in resultados]
+    return {
+        "requisicoes": len(resultados),
+        "concorrencia": concorrencia,
+        "erros": sum(1 for r in resultados if not r[1]),
+        "throughput_rps": round(len(resultados) / duracao, 2) if duracao else 0.0,
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p95_ms": round(percentil(latencias, 95), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "media_ms": round(statistics.mean(latencias), 2) if latencias else 0.0,
+    }
+
+
+def rodar_cenarios(cliente, obreiros, ids_atas, args):
+    rnd = random.Random(42)
+    n = args.requisicoes
+    resultados = {}
+
+    alvos = [rnd.choice(obreiros) for _ in range(n)]
+    resultados["checkin_obreiro"] = medir(cliente, [
+        (lambda o=o: cliente.requisitar("POST", "/checkin_obreiro", dados={"nome": o[1], "grupo": o[2]}))
+        for o in alvos
+    ], args.concorrencia, sucesso=lambda r: r.status == 302 and bool(r.flashes) and r.flashes[-1][0] == "success")
+
+    # Falha no painel redireciona para o login
+    resultados["painel_lider"] = medir(cliente, [
+        (lambda: cliente.requisitar("GET", "/painel_lider", lider=True)) for _ in range(max(1, n // 5))
+    ], args.concorrencia, sucesso=lambda r: r.status == 200)
+
+    # Importações são pesadas e raras: sequenciais, poucas rodadas, nomes novos a cada uma
+    planilhas = [planilha(args.upload_linhas, r) for r in range(args.upload_rodadas)]
+    resultados["upload_obreiros"] = medir(cliente, [
+        # Com Accept JSON o sucesso volta como relatório (200); falhas continuam flash + redirect
+        (lambda p=p: cliente.requisitar("POST", "/upload_obreiros", lider=True,
+                                        arquivos={"arquivo": ("obreiros.xlsx", p)},
+                                        cabecalhos={"Accept": "application/json"}))
+        for p in planilhas
+    ], 1, sucesso=lambda r: r.status == 200)
+    resultados["upload_obreiros"]["linhas_por_upload"] = args.upload_linhas
+
+    def ata():
+        presentes = [str(o[0]) for o in rnd.sample(obreiros, min(args.presentes_por_ata, len(obreiros)))]
+        return cliente.requisitar("POST", "/ata", lider=True, dados={
+            "data_reuniao": datetime.date.today().isoformat(), "tipo": "bench", "departamento": "Bench",
+            "tema": "Benchmark", "local": "Templo", "observacoes": "", "presentes": presentes,
+        })
+    # Ata salva volta ao painel; com erro, ao formulário
+    resultados["salvar_ata"] = medir(cliente, [ata for _ in range(max(1, n // 10))], min(args.concorrencia, 5),
+                                     sucesso=lambda r: r.status == 302 and (r.local or "").endswith("/painel_lider"))
+
+    pdfs = [rnd.choice(ids_atas) for _ in range(max(1, n // 5))]
+    resultados["gerar_ata_pdf"] = medir(cliente, [
+        (lambda a=a: cliente.requisitar("GET", f"/gerar_ata_pdf/{a}", lider=True)) for a in pdfs
+    ], args.concorrencia, sucesso=lambda r: r.status == 200)
+    return resultados
+
+
+def executar(args):
+    """Processo filho: popula o banco de DATABASE_URL e mede com cada cliente."""
+    sys.path.insert(0, RAIZ)
+    import app as app_mod
+    from sqlalchemy import text
+
+    inicio = time.perf_counter()
+    obreiros, ids_atas = popular(app_mod, args.membros, args.atas, args.presentes_por_ata)
+    saida = {
+        "backend": app_mod.engine.dialect.name,
+        "membros": args.membros,
+        "atas": len(ids_atas),
+        "populacao_s": round(time.perf_counter() - inicio, 2),
+        "clientes": {},
+    }
+    try:
+        saida["clientes"]["test_client"] = rodar_cenarios(ClienteTeste(app_mod), obreiros, ids_atas, args)
+        if not args.sem_gunicorn:
+            # Check-ins da rodada anterior ficariam como "já presente": zera a presença dos sintéticos
+            with app_mod.engine.begin() as conn:
+                conn.execute(text("DELETE FROM presencas WHERE membro_id IN "
+                                  "(SELECT id FROM membros WHERE grupo LIKE 'bench-%')"))
+            processo, base = subir_gunicorn(args.workers, args.threads)
+            try:
+                saida["clientes"]["gunicorn"] = rodar_cenarios(ClienteHttp(base), obreiros, ids_atas, args)
+                saida["gunicorn"] = {"workers": args.workers, "threads": args.threads}
+            finally:
+                processo.terminate()
+                processo.wait(10)
+    finally:
+        limpar(app_mod)
+    return saida
+
+
+# ------------------ Resultados ------------------
+def commit_atual():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ,
+                              capture_output=True, text=True).stdout.strip()
+        return f"{commit}-sujo" if sujo else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "sem-git"
+
+
+def imprimir(execucao):
+    print(f"{'backend':<10}{'membros':>9}  {'cliente':<12}{'cenário':<17}{'req/s':>9}{'p50 ms':>9}"
+          f"{'p95 ms':>9}{'p99 ms':>9}{'erros':>7}")
+    for r in execucao:
+        for cliente, cenarios in r["clientes"].items():
+            for cenario, m in cenarios.items():
+                print(f"{r['backend']:<10}{r['membros']:>9}  {cliente:<12}{cenario:<17}{m['throughput_rps']:>9}"
+                      f"{m['p50_ms']:>9}{m['p95_ms']:>9}{m['p99_ms']:>9}{m['erros']:>7}")
+
+
+def comparar(base_arquivo, novo_arquivo, tolerancia):
+    """Mostra a variação do p95 e do throughput; retorna 1 se houver regressão além da tolerância."""
+    with open(base_arquivo, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(novo_arquivo, encoding="utf-8") as f:
+        novo = json.load(f)
+
+    def indexar(dados):
+        return {(r["backend"], r["membros"], c, cen): m
+                for r in dados["resultados"] for c, cens in r["clientes"].items() for cen, m in cens.items()}
+
+    antes, depois = indexar(base), indexar(novo)
+    regressoes = 0
+    print(f"{base['commit']} -> {novo['commit']}")
+    print(f"{'backend':<10}{'membros':>9}  {'cliente':<12}{'cenário':<17}{'Δ p95':>9}{'Δ req/s':>10}")
+    for chave in sorted(antes.keys() & depois.keys()):
+        a, d = antes[chave], depois[chave]
+        dp95 = (d["p95_ms"] - a["p95_ms"]) / a["p95_ms"] if a["p95_ms"] else 0.0
+        drps = (d["throughput_rps"] - a["throughput_rps"]) / a["throughput_rps"] if a["throughput_rps"] else 0.0
+        pior = dp95 > tolerancia or drps < -tolerancia or d["erros"] > a["erros"]
+        regressoes += pior
+        print(f"{chave[0]:<10}{chave[1]:>9}  {chave[2]:<12}{chave[3]:<17}{dp95:>+9.1%}{drps:>+10.1%}"
+              f"{'  ❌' if pior else ''}")
+    print(f"{regressoes} regressão(ões) acima de {tolerancia:.0%}")
+    return 1 if regressoes else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", default="1000,10000,100000", help="obreiros sintéticos por rodada")
+    parser.add_argument("--atas", type=int, default=2000)
+    parser.add_argument("--presentes-por-ata", type=int, default=50)
+    parser.add_argument("--requisicoes", type=int, default=500, help="check-ins por cenário (demais são frações)")
+    parser.add_argument("--concorrencia", type=int, default=20)
+    parser.add_argument("--upload-linhas", type=int, default=1000)
+    parser.add_argument("--upload-rodadas", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2, help="workers do gunicorn")
+    parser.add_argument("--threads", type=int, default=4, help="threads por worker do gunicorn")
+    parser.add_argument("--sem-gunicorn", action="store_true", help="mede só pelo test client")
+    parser.add_argument("--postgres", default=os.getenv("BENCH_POSTGRES_URL"))
+    parser.add_argument("--saida", help="arquivo JSON de resultados (padrão: benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NOVO"), help="compara dois arquivos de resultados")
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="variação aceita no --comparar")
+    parser.add_argument("--membros", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.comparar:
+        sys.exit(comparar(*args.comparar, args.tolerancia))
+    if args.filho:
+        print(json.dumps(executar(args)))
+        return
+
+    bancos = [f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_suite_'), 'bench.db')}"]
+    if args.postgres:
+        bancos.append(args.postgres)
+    repasse = [f"--atas={args.atas}", f"--presentes-por-ata={args.presentes_por_ata}",
+               f"--requisicoes={args.requisicoes}", f"--concorrencia={args.concorrencia}",
+               f"--upload-linhas={args.upload_linhas}", f"--upload-rodadas={args.upload_rodadas}",
+               f"--workers={args.workers}", f"--threads={args.threads}"]
+    if args.sem_gunicorn:
+        repasse.append("--sem-gunicorn")
+
+    execucao = []
+    for url in bancos:
+        for membros in [int(t) for t in args.tamanhos.split(",")]:
+            env = {k: v for k, v in os.environ.items() if not k.startswith("GEOCERCA")}
+            env.update(DATABASE_URL=url, PDF_CACHE_DIR=tempfile.mkdtemp(prefix="bench_pdf_"))
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--filho", f"--membros={membros}", *repasse],
+                env=env, capture_output=True, text=True, cwd=RAIZ
+            )
+            if saida.returncode != 0:
+                print(f"❌ Falha com {url} ({membros} obreiros):\n{saida.stderr}")
+                continue
+            execucao.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+            imprimir(execucao[-1:])
+
+    commit = commit_atual()
+    arquivo = args.saida or os.path.join(RESULTADOS, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "parametros": {k: v for k, v in vars(args).items() if k not in ("filho", "membros", "comparar")},
+            "resultados": execucao,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"✅ Resultados em {arquivo}")
+
+
+if __name__ == "__main__":
+    main()